@@ -0,0 +1,97 @@
+"""
+Compare the sync ``AuthController`` with ``AsyncAuthController`` under ASGI.
+
+Both controllers are mounted side by side and driven concurrently through
+Django's ASGI request handler, which is where sync views get pushed through
+``sync_to_async``. For each route the benchmark reports throughput, per-request
+latency and the peak number of live threads during the run.
+
+    python -m benchmarks.auth_async --requests 2000 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import threading
+import time
+
+from benchmarks import Timer, print_table, setup_django, summarize
+
+setup_django()
+
+from django.conf import settings  # noqa: E402
+from django.test import AsyncClient  # noqa: E402
+from django.urls import path  # noqa: E402
+from ninja_extra import NinjaExtraAPI  # noqa: E402
+
+from users.api import AsyncAuthController, AuthController  # noqa: E402
+from users.services import SocialAuthService  # noqa: E402
+from users.tests.factories import UserAccountFactory  # noqa: E402
+
+sync_api = NinjaExtraAPI(urls_namespace="sync")
+sync_api.register_controllers(AuthController)
+async_api = NinjaExtraAPI(urls_namespace="async")
+async_api.register_controllers(AsyncAuthController)
+
+urlpatterns = [
+    path("sync/", sync_api.urls),
+    path("async/", async_api.urls),
+]
+
+
+async def sample_threads(stop: asyncio.Event, peak: list[int]) -> None:
+    while not stop.is_set():
+        peak[0] = max(peak[0], threading.active_count())
+        await asyncio.sleep(0.001)
+
+
+async def run(client, method, url, total, concurrency, **kwargs) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            response = await getattr(client, method)(url, **kwargs)
+            latencies.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.content
+
+    stop, peak = asyncio.Event(), [threading.active_count()]
+    sampler = asyncio.create_task(sample_threads(stop, peak))
+    with Timer() as timer:
+        await asyncio.gather(*(one() for _ in range(total)))
+    stop.set()
+    await sampler
+
+    return {**summarize(latencies, timer.elapsed), "peak threads": peak[0]}
+
+
+async def main(tokens: dict, total: int, concurrency: int) -> None:
+    client = AsyncClient()
+
+    auth_headers = {"Authorization": f"Bearer {tokens['access']}"}
+
+    rows = []
+    for variant in ("sync", "async"):
+        for route, method, kwargs in (
+            ("me", "get", {"headers": auth_headers}),
+            ("refresh", "post", {}),
+        ):
+            client.cookies[settings.REFRESH_COOKIE] = tokens["refresh"]
+            url = f"/{variant}/auth/{route}"
+            # Warm up the URL resolver and connection before measuring
+            await run(client, method, url, 10, 1, **kwargs)
+            result = await run(client, method, url, total, concurrency, **kwargs)
+            rows.append({"route": url, **result})
+
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    settings.ROOT_URLCONF = __name__
+    tokens = SocialAuthService.generate_jwt_tokens(UserAccountFactory())
+    asyncio.run(main(tokens, args.requests, args.concurrency))
@@ -0,0 +1,79 @@
+"""
+Rejections per second of the login throttle on one core.
+
+Compares a full /auth/login request that is rejected with 429 against one
+that gets through to the password check, and reports the cost of the
+throttle check alone. The cache backend is whatever CACHES configures
+(LocMemCache unless REDIS_URL is set).
+
+    python -m benchmarks.auth_throttle --seconds 3
+"""
+
+import argparse
+import logging
+
+from benchmarks import Timer, print_table, setup_django
+
+setup_django()
+# Every rejection is logged as a warning, which would dominate the timings
+logging.disable(logging.WARNING)
+
+from django.test import override_settings  # noqa: E402
+from ninja_extra.testing import TestClient  # noqa: E402
+
+from users.api import AuthController  # noqa: E402
+from users.models import UserAccount  # noqa: E402
+from users.throttling import TokenBucketThrottle  # noqa: E402
+
+PAYLOAD = {"email": "bench@example.com", "password": "wrong"}
+
+
+def run(seconds: float, request) -> dict:
+    count = 0
+    with Timer() as timer:
+        while timer.elapsed < seconds:
+            request()
+            count += 1
+    return {"requests": count, "per second": count / timer.elapsed}
+
+
+def main(seconds: float) -> None:
+    UserAccount.objects.create_user(email=PAYLOAD["email"], password="password")
+    client = TestClient(AuthController)
+
+    def login(expected_status):
+        def request():
+            response = client.post("/login", json=PAYLOAD)
+            assert response.status_code == expected_status, response.content
+
+        return request
+
+    rows = []
+    with override_settings(AUTH_THROTTLE_IP_RATE="1/day"):
+        # Drain the bucket, then every attempt is rejected
+        client.post("/login", json=PAYLOAD)
+        rows.append({"case": "rejected login (429)", **run(seconds, login(429))})
+
+        throttle = TokenBucketThrottle("login")
+        request = client._build_request("POST", "/login", {}, {"json": PAYLOAD})
+        request.body = b'{"email": "bench@example.com", "password": "wrong"}'
+
+        def check():
+            assert not throttle.allow_request(request)
+
+        rows.append({"case": "throttle check alone", **run(seconds, check)})
+
+    with override_settings(
+        AUTH_THROTTLE_IP_RATE="1000000/s", AUTH_THROTTLE_EMAIL_RATE="1000000/s"
+    ):
+        rows.append({"case": "hashed login (401)", **run(seconds, login(401))})
+
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=3)
+    args = parser.parse_args()
+
+    main(args.seconds)
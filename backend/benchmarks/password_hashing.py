@@ -0,0 +1,114 @@
+"""
+Login throughput per core for each password hasher and cost setting.
+
+For every configuration the benchmark reports sequential /auth/login requests
+per second (one core) and raw password checks per second when the hashing
+executor runs with PASSWORD_HASHING_WORKERS threads. Argon2 rows are skipped
+when argon2-cffi is not installed.
+
+    python -m benchmarks.password_hashing --seconds 3
+"""
+
+import argparse
+import importlib.util
+from concurrent.futures import wait
+
+from benchmarks import Timer, print_table, setup_django
+
+setup_django()
+
+from django.conf import settings  # noqa: E402
+from django.test import override_settings  # noqa: E402
+from ninja_extra.testing import TestClient  # noqa: E402
+
+from users import hashers  # noqa: E402
+from users.api import AuthController  # noqa: E402
+from users.models import UserAccount  # noqa: E402
+
+PBKDF2 = "users.hashers.TunablePBKDF2PasswordHasher"
+ARGON2 = "users.hashers.TunableArgon2PasswordHasher"
+
+# Every login comes from one client, so lift the login throttle
+UNTHROTTLED = {
+    "AUTH_THROTTLE_IP_RATE": "1000000/s",
+    "AUTH_THROTTLE_EMAIL_RATE": "1000000/s",
+}
+
+CONFIGURATIONS = [
+    ("pbkdf2 (Django default)", PBKDF2, {"PBKDF2_ITERATIONS": 0}),
+    ("pbkdf2 600k", PBKDF2, {"PBKDF2_ITERATIONS": 600_000}),
+    ("pbkdf2 310k", PBKDF2, {"PBKDF2_ITERATIONS": 310_000}),
+    ("argon2 (Django default)", ARGON2, {}),
+    (
+        "argon2 t=2 m=19MiB p=1",
+        ARGON2,
+        {"ARGON2_TIME_COST": 2, "ARGON2_MEMORY_COST": 19456, "ARGON2_PARALLELISM": 1},
+    ),
+]
+
+
+def logins_per_second(email: str, seconds: float) -> float:
+    client = TestClient(AuthController)
+    count = 0
+    with Timer() as timer:
+        while True:
+            response = client.post(
+                "/login", json={"email": email, "password": "password"}
+            )
+            assert response.status_code == 200, response.content
+            count += 1
+            if timer.elapsed >= seconds:
+                break
+    return count / timer.elapsed
+
+
+def checks_per_second(encoded: str, total: int) -> float:
+    with Timer() as timer:
+        futures = [
+            hashers.executor.submit(
+                hashers.hashers.verify_password, "password", encoded
+            )
+            for _ in range(total)
+        ]
+        wait(futures)
+    return total / timer.elapsed
+
+
+def main(seconds: float) -> None:
+    has_argon2 = importlib.util.find_spec("argon2") is not None
+    workers = settings.PASSWORD_HASHING_WORKERS
+
+    rows = []
+    for index, (name, hasher, costs) in enumerate(CONFIGURATIONS):
+        if hasher == ARGON2 and not has_argon2:
+            print(f"skipping {name}: argon2-cffi is not installed")
+            continue
+
+        others = [h for h in settings.PASSWORD_HASHERS if h != hasher]
+        with override_settings(
+            PASSWORD_HASHERS=[hasher, *others], **UNTHROTTLED, **costs
+        ):
+            user = UserAccount.objects.create_user(
+                email=f"bench{index}@example.com", password="password"
+            )
+            login_rate = logins_per_second(user.email, seconds)
+            check_rate = checks_per_second(user.password, int(login_rate * workers))
+
+        rows.append(
+            {
+                "hasher": name,
+                "logins/s (1 core)": login_rate,
+                f"checks/s ({workers} workers)": check_rate,
+                "checks/s per worker": check_rate / workers,
+            }
+        )
+
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=3)
+    args = parser.parse_args()
+
+    main(args.seconds)
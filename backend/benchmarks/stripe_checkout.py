@@ -0,0 +1,153 @@
+"""
+Compare the sync ``PaymentsController`` with ``AsyncPaymentsController``.
+
+Both controllers are mounted side by side and driven concurrently through
+Django's ASGI request handler, with Stripe replaced by a local stub that
+answers after ``--latency`` seconds. Every request asks for a new checkout
+session (distinct success URLs, so none is reused). For each variant the
+benchmark reports throughput, per-request latency and the peak number of live
+threads during the run, and which async Stripe client was in use (httpx, or
+worker threads should it fail to import).
+
+    python -m benchmarks.stripe_checkout --requests 200 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks import Timer, print_table, setup_django, summarize
+
+setup_django()
+
+import stripe  # noqa: E402
+from django.conf import settings  # noqa: E402
+from django.test import AsyncClient  # noqa: E402
+from django.urls import path  # noqa: E402
+from ninja_extra import NinjaExtraAPI  # noqa: E402
+
+from payments import services  # noqa: E402
+from payments.api import AsyncPaymentsController, PaymentsController  # noqa: E402
+from payments.tests.factories import PlanFactory, StripeCustomerFactory  # noqa: E402
+from users.services import SocialAuthService  # noqa: E402
+
+sync_api = NinjaExtraAPI(urls_namespace="sync")
+sync_api.register_controllers(PaymentsController)
+async_api = NinjaExtraAPI(urls_namespace="async")
+async_api.register_controllers(AsyncPaymentsController)
+
+urlpatterns = [
+    path("sync/", sync_api.urls),
+    path("async/", async_api.urls),
+]
+
+numbers = itertools.count()
+
+
+def start_stripe_stub(latency: float) -> ThreadingHTTPServer:
+    """Answer checkout session creation after ``latency`` seconds"""
+    counter = itertools.count(1)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(latency)
+            session_id = f"cs_{next(counter)}"
+            payload = json.dumps(
+                {
+                    "id": session_id,
+                    "object": "checkout.session",
+                    "url": f"https://checkout.stripe.com/{session_id}",
+                }
+            ).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def sample_threads(stop: asyncio.Event, peak: list[int]) -> None:
+    while not stop.is_set():
+        peak[0] = max(peak[0], threading.active_count())
+        await asyncio.sleep(0.001)
+
+
+async def run(client, url, total, concurrency, plan_id, headers) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(number):
+        # A new success URL per request, so no open session is reused
+        data = {
+            "plan_id": plan_id,
+            "success_url": f"https://example.com/success?n={number}",
+            "cancel_url": "https://example.com/cancel",
+        }
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post(
+                url, data, content_type="application/json", headers=headers
+            )
+            latencies.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.content
+
+    stop, peak = asyncio.Event(), [threading.active_count()]
+    sampler = asyncio.create_task(sample_threads(stop, peak))
+    with Timer() as timer:
+        await asyncio.gather(*(one(next(numbers)) for _ in range(total)))
+    stop.set()
+    await sampler
+
+    return {**summarize(latencies, timer.elapsed), "peak threads": peak[0]}
+
+
+async def main(total: int, concurrency: int, plan_id: int, headers: dict) -> None:
+    client = AsyncClient()
+    async_client = "httpx" if services.stripe_async_client else "worker threads"
+
+    rows = []
+    for variant in ("sync", "async"):
+        url = f"/{variant}/payments/checkout"
+        # Warm up the URL resolver and connections before measuring
+        await run(client, url, 5, 1, plan_id, headers)
+        result = await run(client, url, total, concurrency, plan_id, headers)
+        stripe_client = "requests" if variant == "sync" else async_client
+        rows.append({"route": url, "stripe client": stripe_client, **result})
+
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument(
+        "--latency", type=float, default=0.3, help="Stripe stub delay in seconds"
+    )
+    args = parser.parse_args()
+
+    settings.ROOT_URLCONF = __name__
+    server = start_stripe_stub(args.latency)
+    stripe.api_base = f"http://127.0.0.1:{server.server_port}"
+    stripe.api_key = "sk_test_benchmark"
+
+    plan = PlanFactory()
+    user = StripeCustomerFactory().user
+    access_token = SocialAuthService.generate_jwt_tokens(user)["access"]
+    headers = {"Authorization": f"Bearer {access_token}"}
+    asyncio.run(main(args.requests, args.concurrency, plan.id, headers))
@@ -0,0 +1,104 @@
+"""
+Throughput of the Stripe webhook inbox worker for a billing-run burst.
+
+Stores ``--events`` customer.subscription.updated events spread over
+``--subscriptions`` subscriptions, then drains the inbox once one event at a
+time and once with ``--coalesce``, and reports events per second.
+
+    python -m benchmarks.stripe_webhooks --events 5000 --subscriptions 500
+"""
+
+import argparse
+from datetime import timedelta
+
+from benchmarks import Timer, print_table, setup_django
+
+setup_django()
+
+from django.utils import timezone  # noqa: E402
+
+from payments.inbox import StripeEventInbox  # noqa: E402
+from payments.models import Plan, StripeEvent, Subscription  # noqa: E402
+from users.models import UserAccount  # noqa: E402
+
+
+def create_subscriptions(count: int) -> list[str]:
+    plan = Plan.objects.create(name="pro", stripe_price_id="price_pro", price=9.99)
+    users = UserAccount.objects.bulk_create(
+        UserAccount(email=f"bench{i}@example.com") for i in range(count)
+    )
+    now = timezone.now()
+    Subscription.objects.bulk_create(
+        Subscription(
+            user=user,
+            plan=plan,
+            stripe_subscription_id=f"sub_{i}",
+            status="active",
+            current_period_start=now,
+            current_period_end=now + timedelta(days=30),
+        )
+        for i, user in enumerate(users)
+    )
+    return [f"sub_{i}" for i in range(count)]
+
+
+def store_events(subscription_ids: list[str], count: int) -> None:
+    StripeEvent.objects.all().delete()
+    start = int(timezone.now().timestamp())
+    StripeEvent.objects.bulk_create(
+        StripeEvent(
+            stripe_event_id=f"evt_{i}",
+            type="customer.subscription.updated",
+            payload={
+                "id": f"evt_{i}",
+                "type": "customer.subscription.updated",
+                "created": start + i,
+                "data": {
+                    "object": {
+                        "id": subscription_ids[i % len(subscription_ids)],
+                        "status": "active",
+                        "current_period_start": start,
+                        "current_period_end": start + 30 * 24 * 3600,
+                        "cancel_at_period_end": i % 2 == 0,
+                        "metadata": {},
+                    }
+                },
+            },
+        )
+        for i in range(count)
+    )
+
+
+def drain(batch_size: int, coalesce: bool) -> dict:
+    events = 0
+    with Timer() as timer:
+        while count := StripeEventInbox.process_batch(batch_size, coalesce=coalesce):
+            events += count
+    assert not StripeEvent.objects.exclude(status=StripeEvent.PROCESSED).exists()
+    return {
+        "events": events,
+        "seconds": timer.elapsed,
+        "events/s": events / timer.elapsed,
+    }
+
+
+def main(events: int, subscriptions: int, batch_size: int) -> None:
+    subscription_ids = create_subscriptions(subscriptions)
+
+    rows = []
+    for coalesce in (False, True):
+        store_events(subscription_ids, events)
+        mode = "coalesced" if coalesce else "one at a time"
+        rows.append({"mode": mode, **drain(batch_size, coalesce)})
+
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--subscriptions", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    main(args.events, args.subscriptions, args.batch_size)
@@ -0,0 +1,10 @@
+import pytest
+from django.core.cache import cache
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    from payments.catalog import bump_catalog_version
+
+    cache.clear()
+    bump_catalog_version()
@@ -1,15 +1,28 @@
+from django.conf import settings
 from ninja.errors import ValidationError
 from ninja_extra import NinjaExtraAPI
-from ninja_jwt.controller import NinjaJWTDefaultController
 
-from payments.api import PaymentsController, WebhooksController
-from users.api import AuthController
+from core.introspection import IntrospectionController
+from core.metrics import MetricsController
+from payments.api import (
+    AsyncPaymentsController,
+    FinanceController,
+    PaymentsController,
+    WebhooksController,
+)
+from users.api import AsyncAuthController, AuthController
 
 api = NinjaExtraAPI()
-api.register_controllers(AuthController)
-api.register_controllers(PaymentsController)
+api.register_controllers(
+    AsyncAuthController if settings.AUTH_ASYNC_ROUTES else AuthController
+)
+api.register_controllers(
+    AsyncPaymentsController if settings.PAYMENTS_ASYNC_ROUTES else PaymentsController
+)
 api.register_controllers(WebhooksController)
-api.register_controllers(NinjaJWTDefaultController)
+api.register_controllers(FinanceController)
+api.register_controllers(MetricsController)
+api.register_controllers(IntrospectionController)
 
 
 @api.exception_handler(ValidationError)
@@ -0,0 +1,92 @@
+from django.db import NotSupportedError, migrations, models
+
+
+class ConcurrentOperationMixin:
+    """
+    Build indexes without blocking writes on PostgreSQL.
+
+    PostgreSQL's CREATE INDEX CONCURRENTLY cannot run in a transaction, so
+    migrations using these operations need ``atomic = False``. Other
+    databases build the index the usual way.
+    """
+
+    atomic = False
+
+    def _concurrently(self, schema_editor) -> bool:
+        if schema_editor.connection.vendor != "postgresql":
+            return False
+        if schema_editor.connection.in_atomic_block:
+            raise NotSupportedError(
+                f"{self.__class__.__name__} cannot run inside a transaction "
+                "(set atomic = False on the migration)."
+            )
+        return True
+
+
+class AddIndexConcurrently(ConcurrentOperationMixin, migrations.AddIndex):
+    def describe(self):
+        return f"Concurrently create index {self.index.name} on {self.model_name}"
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            if self._concurrently(schema_editor):
+                schema_editor.add_index(model, self.index, concurrently=True)
+            else:
+                schema_editor.add_index(model, self.index)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            if self._concurrently(schema_editor):
+                schema_editor.remove_index(model, self.index, concurrently=True)
+            else:
+                schema_editor.remove_index(model, self.index)
+
+
+class AddUniqueConstraintConcurrently(
+    ConcurrentOperationMixin, migrations.AddConstraint
+):
+    """
+    Add a conditional ``UniqueConstraint``, which PostgreSQL stores as a
+    partial unique index, with CREATE UNIQUE INDEX CONCURRENTLY.
+    """
+
+    def __init__(self, model_name, constraint):
+        if not (
+            isinstance(constraint, models.UniqueConstraint) and constraint.condition
+        ):
+            raise ValueError("Only conditional UniqueConstraints are index-backed")
+        super().__init__(model_name, constraint)
+
+    def describe(self):
+        return (
+            f"Concurrently create constraint {self.constraint.name} "
+            f"on {self.model_name}"
+        )
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        if not self._concurrently(schema_editor):
+            schema_editor.add_constraint(model, self.constraint)
+            return
+        statement = self.constraint.create_sql(model, schema_editor)
+        statement.template = statement.template.replace(
+            "CREATE UNIQUE INDEX", "CREATE UNIQUE INDEX CONCURRENTLY", 1
+        )
+        schema_editor.execute(statement, params=None)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        if not self._concurrently(schema_editor):
+            schema_editor.remove_constraint(model, self.constraint)
+            return
+        schema_editor.execute(
+            schema_editor._delete_index_sql(
+                model, self.constraint.name, concurrently=True
+            )
+        )
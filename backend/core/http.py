@@ -0,0 +1,268 @@
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from core import metrics
+
+try:
+    import httpx
+except ImportError:  # async callers fall back to threads, see payments.services
+    httpx = None
+
+AsyncBaseTransport = httpx.AsyncBaseTransport if httpx else object
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised instead of calling a host whose circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for one host.
+
+    After ``failure_threshold`` failures in a row the circuit opens and calls
+    fail immediately. Once ``reset_timeout`` seconds have passed a single
+    trial call is let through: success closes the circuit, failure opens it
+    for another ``reset_timeout``.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial_running or self.state == "open":
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+class HostStats:
+    """Request, error and latency counters for one host"""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def record(self, seconds: float, error: bool) -> None:
+        self.requests += 1
+        self.errors += error
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def as_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "rejected": self.rejected,
+            "mean_ms": self.total_seconds / self.requests * 1000
+            if self.requests
+            else 0.0,
+            "max_ms": self.max_seconds * 1000,
+        }
+
+
+class ResilientAdapter(HTTPAdapter):
+    """
+    ``HTTPAdapter`` with a circuit breaker and statistics per host.
+
+    Connection errors, timeouts and 5xx responses count as failures. The
+    underlying urllib3 pool manager keeps a keep-alive pool per host.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float, **kwargs):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._hosts: dict[str, tuple[CircuitBreaker, HostStats]] = {}
+        self._hosts_lock = threading.Lock()
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        host = urlsplit(request.url).netloc
+        breaker, stats = self._host(host)
+
+        if not breaker.allow():
+            stats.rejected += 1
+            raise CircuitOpenError(f"Circuit open for {host}", request=request)
+
+        start = time.perf_counter()
+        try:
+            response = super().send(request, **kwargs)
+        except Exception:
+            breaker.record_failure()
+            stats.record(time.perf_counter() - start, error=True)
+            raise
+
+        failed = response.status_code >= 500
+        if failed:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        stats.record(time.perf_counter() - start, error=failed)
+        return response
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        return self._host(host)[0]
+
+    def stats(self) -> dict:
+        return {
+            host: {**stats.as_dict(), "circuit": breaker.state}
+            for host, (breaker, stats) in list(self._hosts.items())
+        }
+
+    def _host(self, host: str) -> tuple[CircuitBreaker, HostStats]:
+        entry = self._hosts.get(host)
+        if entry is None:
+            with self._hosts_lock:
+                entry = self._hosts.setdefault(
+                    host,
+                    (
+                        CircuitBreaker(self.failure_threshold, self.reset_timeout),
+                        HostStats(),
+                    ),
+                )
+        return entry
+
+
+class ResilientAsyncTransport(AsyncBaseTransport):
+    """
+    httpx transport that goes through a ``ResilientAdapter``'s per-host
+    circuit breakers and statistics, so sync and async calls to a host trip
+    and report the same circuit.
+    """
+
+    def __init__(self, adapter: ResilientAdapter, transport):
+        self.adapter = adapter
+        self._transport = transport
+
+    async def handle_async_request(self, request):
+        host = request.url.netloc.decode()
+        breaker, stats = self.adapter._host(host)
+
+        if not breaker.allow():
+            stats.rejected += 1
+            raise CircuitOpenError(f"Circuit open for {host}")
+
+        start = time.perf_counter()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except Exception:
+            breaker.record_failure()
+            stats.record(time.perf_counter() - start, error=True)
+            raise
+
+        failed = response.status_code >= 500
+        if failed:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        stats.record(time.perf_counter() - start, error=failed)
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class HTTPClient:
+    """
+    Shared client for all outbound HTTP calls (Google, Stripe).
+
+    Wraps one ``requests.Session`` so connections are reused across calls.
+    Every call gets a deadline: ``timeout`` bounds connecting and each wait
+    for data, defaulting to HTTP_CLIENT_TIMEOUT. ``async_client()`` gives
+    async code an httpx client behind the same circuit breakers.
+    """
+
+    def __init__(
+        self,
+        timeout: float,
+        pool_maxsize: int,
+        failure_threshold: int,
+        reset_timeout: float,
+    ):
+        self.timeout = timeout
+        self.pool_maxsize = pool_maxsize
+        self.adapter = ResilientAdapter(
+            failure_threshold=failure_threshold,
+            reset_timeout=reset_timeout,
+            pool_maxsize=pool_maxsize,
+        )
+        self.session = requests.Session()
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+
+    def request(self, method: str, url: str, timeout: float | None = None, **kwargs):
+        return self.session.request(
+            method, url, timeout=timeout or self.timeout, **kwargs
+        )
+
+    def get(self, url: str, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def async_client(self, **transport_options):
+        """
+        New ``httpx.AsyncClient`` sharing this client's breakers and stats.
+
+        ``transport_options`` (e.g. ``verify``) go to the underlying
+        ``httpx.AsyncHTTPTransport``. Raises ImportError without httpx.
+        """
+        if httpx is None:
+            raise ImportError("httpx is required for async HTTP calls")
+        transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(max_keepalive_connections=self.pool_maxsize),
+            **transport_options,
+        )
+        return httpx.AsyncClient(
+            transport=ResilientAsyncTransport(self.adapter, transport),
+            timeout=self.timeout,
+        )
+
+    def stats(self) -> dict:
+        return self.adapter.stats()
+
+
+http_client = HTTPClient(
+    timeout=settings.HTTP_CLIENT_TIMEOUT,
+    pool_maxsize=settings.HTTP_CLIENT_POOL_MAXSIZE,
+    failure_threshold=settings.HTTP_CLIENT_FAILURE_THRESHOLD,
+    reset_timeout=settings.HTTP_CLIENT_RESET_TIMEOUT,
+)
+metrics.register("http_client", http_client.stats)
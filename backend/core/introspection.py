@@ -0,0 +1,119 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Exists, OuterRef
+from django.utils.crypto import constant_time_compare
+from ninja import Field, Schema
+from ninja_extra import api_controller, route
+from ninja_extra.security import HttpBearer
+from ninja_jwt.exceptions import AuthenticationFailed, InvalidToken
+from ninja_jwt.settings import api_settings
+
+from core import metrics
+from core.cache import TTLCache
+from payments.models import Subscription
+from users.authentication import CachedJWTAuth
+
+User = get_user_model()
+
+# Introspection results by token digest
+result_cache = TTLCache(settings.AUTH_CACHE_MAXSIZE, settings.INTROSPECTION_CACHE_TTL)
+metrics.register("introspection_cache", result_cache.stats)
+
+
+class ServiceTokenAuth(HttpBearer):
+    """Bearer auth against INTERNAL_API_TOKENS for service-to-service routes"""
+
+    def authenticate(self, request, token):
+        for service_token in settings.INTERNAL_API_TOKENS:
+            if constant_time_compare(token, service_token):
+                return token
+        return None
+
+
+class IntrospectSchema(Schema):
+    tokens: list[str] = Field(..., max_length=settings.INTROSPECTION_MAX_TOKENS)
+
+
+class TokenInfoSchema(Schema):
+    valid: bool
+    user_id: int | None = None
+    exp: int | None = None
+    has_active_subscription: bool = False
+
+
+class IntrospectionService:
+    """Validate access tokens in bulk for internal services"""
+
+    @staticmethod
+    def introspect(raw_tokens: list[str]) -> list[dict]:
+        """
+        Return one result per token, in order.
+
+        Signatures are checked per token (sharing CachedJWTAuth's token
+        cache); users and their subscription status are then loaded for all
+        tokens with a single query. Results are cached for at most
+        INTROSPECTION_CACHE_TTL seconds, so deactivation or a lapsed
+        subscription may take that long to show up.
+        """
+        digests = [hashlib.sha256(token.encode()).digest() for token in raw_tokens]
+        results = {}
+        pending = {}  # digest -> validated token
+        for raw_token, digest in zip(raw_tokens, digests, strict=True):
+            if digest in results or digest in pending:
+                continue
+
+            cached = result_cache.get(digest)
+            if cached is not None:
+                results[digest] = cached
+                continue
+
+            try:
+                pending[digest] = CachedJWTAuth.get_validated_token(raw_token)
+            except (InvalidToken, AuthenticationFailed):
+                results[digest] = {"valid": False}
+
+        user_ids = {token[api_settings.USER_ID_CLAIM] for token in pending.values()}
+        users = {}  # active user id -> has an active subscription
+        if user_ids:
+            users = dict(
+                User.objects.filter(id__in=user_ids, is_active=True)
+                .annotate(
+                    has_active_subscription=Exists(
+                        Subscription.objects.filter(
+                            user=OuterRef("pk"),
+                            status__in=Subscription.ACTIVE_STATUSES,
+                        )
+                    )
+                )
+                .values_list("id", "has_active_subscription")
+            )
+
+        now = time.time()
+        for digest, token in pending.items():
+            user_id = int(token[api_settings.USER_ID_CLAIM])
+            if user_id in users:
+                result = {
+                    "valid": True,
+                    "user_id": user_id,
+                    "exp": token["exp"],
+                    "has_active_subscription": users[user_id],
+                }
+            else:
+                result = {"valid": False}
+            results[digest] = result
+            result_cache.set(digest, result, ttl=token["exp"] - now)
+
+        return [results[digest] for digest in digests]
+
+
+@api_controller("/internal", tags=["Internal"], auth=ServiceTokenAuth())
+class IntrospectionController:
+    @route.post(
+        "/introspect", response=list[TokenInfoSchema], operation_id="introspect"
+    )
+    def introspect(self, request, data: IntrospectSchema):
+        """Check up to INTROSPECTION_MAX_TOKENS access tokens in one call"""
+        return IntrospectionService.introspect(data.tokens)
@@ -0,0 +1,36 @@
+from collections.abc import Callable
+
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
+from ninja_extra import api_controller, route
+from ninja_extra.security import HttpBearer
+
+_collectors: dict[str, Callable[[], dict]] = {}
+
+
+def register(name: str, collector: Callable[[], dict]) -> None:
+    """Expose the dict returned by ``collector`` under ``name`` on /metrics"""
+    _collectors[name] = collector
+
+
+def collect() -> dict:
+    return {name: collector() for name, collector in _collectors.items()}
+
+
+class MetricsTokenAuth(HttpBearer):
+    """Bearer auth against METRICS_TOKEN; the endpoint is closed when it is unset"""
+
+    def authenticate(self, request, token):
+        if settings.METRICS_TOKEN and constant_time_compare(
+            token, settings.METRICS_TOKEN
+        ):
+            return token
+        return None
+
+
+@api_controller("/metrics", tags=["Metrics"], auth=MetricsTokenAuth())
+class MetricsController:
+    @route.get("", response=dict, operation_id="metrics")
+    def get_metrics(self, request):
+        """Per-process counters (cache hit/miss etc.) for scraping"""
+        return collect()
@@ -64,6 +64,8 @@ MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
+    # Body-hash ETags and 304s for GET routes without an @etag validator
+    "django.middleware.http.ConditionalGetMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
@@ -128,6 +130,31 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing
+# https://docs.djangoproject.com/en/4.2/topics/auth/passwords/
+# PASSWORD_HASHER selects the hasher for new and upgraded hashes: "pbkdf2" or
+# "argon2" (requires argon2-cffi, e.g. `uv add "django[argon2]"`). Existing
+# hashes made with another hasher or cost are upgraded on the next login.
+PASSWORD_HASHER = getenv("PASSWORD_HASHER", "pbkdf2")
+# 0 keeps Django's default iteration count
+PBKDF2_ITERATIONS = int(getenv("PBKDF2_ITERATIONS", "0"))
+ARGON2_TIME_COST = int(getenv("ARGON2_TIME_COST", "2"))
+ARGON2_MEMORY_COST = int(getenv("ARGON2_MEMORY_COST", "102400"))  # KiB
+ARGON2_PARALLELISM = int(getenv("ARGON2_PARALLELISM", "8"))
+# Size of the thread pool that hashes and checks passwords off the request path
+PASSWORD_HASHING_WORKERS = int(
+    getenv("PASSWORD_HASHING_WORKERS", str(os.cpu_count() or 1))
+)
+
+PASSWORD_HASHERS = [
+    "users.hashers.TunablePBKDF2PasswordHasher",
+    "users.hashers.TunableArgon2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+if PASSWORD_HASHER == "argon2":
+    PASSWORD_HASHERS[0], PASSWORD_HASHERS[1] = PASSWORD_HASHERS[1], PASSWORD_HASHERS[0]
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
@@ -182,6 +209,79 @@ NINJA_JWT = {
     "AUTH_COOKIE_REFRESH": REFRESH_COOKIE,
 }
 
+# Sign tokens with the ES256/EdDSA keys in this directory (<kid>.pem each)
+# instead of HS256 with SECRET_KEY; public keys are served at
+# /api/auth/jwks.json. JWT_SIGNING_KID picks the signing key; it is required
+# once the directory holds more than one key.
+JWT_KEYS_DIR = getenv("JWT_KEYS_DIR")
+JWT_SIGNING_KID = getenv("JWT_SIGNING_KID")
+JWT_JWKS_MAX_AGE = int(getenv("JWT_JWKS_MAX_AGE", "300"))
+
+# Per-process caches of verified tokens and users used by CachedJWTAuth
+AUTH_CACHE_MAXSIZE = int(getenv("AUTH_CACHE_MAXSIZE", "10000"))
+AUTH_CACHE_TTL = int(getenv("AUTH_CACHE_TTL", "60"))
+
+# Bearer token required to scrape /api/metrics; the endpoint is closed if unset
+METRICS_TOKEN = getenv("METRICS_TOKEN")
+
+# Embed email, first_name and last_name as claims in access tokens so that
+# /auth/me (see users.authentication.ClaimsJWTAuth) answers without a query.
+# Staleness bound: claims are read from the database whenever an access token
+# is issued, including on /auth/refresh, so a profile change or deactivation
+# becomes visible to claims-backed routes within ACCESS_TOKEN_LIFETIME.
+AUTH_USER_CLAIMS = getenv("AUTH_USER_CLAIMS", "False") == "True"
+
+# Serve the /auth routes from AsyncAuthController (ASGI deployments only)
+AUTH_ASYNC_ROUTES = getenv("AUTH_ASYNC_ROUTES", "False") == "True"
+
+# Revoked refresh tokens: each process keeps a Bloom filter of the blacklist,
+# re-synced every REFRESH_REVOCATION_SYNC_INTERVAL seconds
+REFRESH_REVOCATION_SYNC_INTERVAL = int(getenv("REFRESH_REVOCATION_SYNC_INTERVAL", "30"))
+REFRESH_REVOCATION_CAPACITY = int(getenv("REFRESH_REVOCATION_CAPACITY", "100000"))
+REFRESH_REVOCATION_ERROR_RATE = float(getenv("REFRESH_REVOCATION_ERROR_RATE", "0.001"))
+
+# Token-bucket limits for login/register, as "<requests>/<s|min|hour|day>";
+# the bucket holds <requests> tokens and refills at that rate
+AUTH_THROTTLE_IP_RATE = getenv("AUTH_THROTTLE_IP_RATE", "30/min")
+AUTH_THROTTLE_EMAIL_RATE = getenv("AUTH_THROTTLE_EMAIL_RATE", "10/min")
+AUTH_THROTTLE_CACHE = "default"
+# Reverse proxies in front of the app. Throttles take the client IP from
+# X-Forwarded-For as appended by the outermost of them; with 0 they use
+# REMOTE_ADDR and ignore the client-controlled header
+NINJA_NUM_PROXIES = int(getenv("NUM_PROXIES", "0"))
+
+# Shared cache for throttling; set REDIS_URL when running several workers,
+# otherwise each process has its own cache
+if getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": getenv("REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Outbound HTTP (Google, Stripe): per-call timeout in seconds, connections
+# kept per host, and consecutive failures before a host's circuit opens for
+# HTTP_CLIENT_RESET_TIMEOUT seconds
+HTTP_CLIENT_TIMEOUT = float(getenv("HTTP_CLIENT_TIMEOUT", "10"))
+HTTP_CLIENT_POOL_MAXSIZE = int(getenv("HTTP_CLIENT_POOL_MAXSIZE", "10"))
+HTTP_CLIENT_FAILURE_THRESHOLD = int(getenv("HTTP_CLIENT_FAILURE_THRESHOLD", "5"))
+HTTP_CLIENT_RESET_TIMEOUT = float(getenv("HTTP_CLIENT_RESET_TIMEOUT", "30"))
+
+# Bearer tokens accepted by internal service-to-service routes
+INTERNAL_API_TOKENS = [
+    token for token in getenv("INTERNAL_API_TOKENS", "").split(",") if token
+]
+# Batch token introspection: tokens per request and result cache lifetime
+INTROSPECTION_MAX_TOKENS = int(getenv("INTROSPECTION_MAX_TOKENS", "100"))
+INTROSPECTION_CACHE_TTL = int(getenv("INTROSPECTION_CACHE_TTL", "5"))
+
 CORS_ALLOWED_ORIGINS = os.getenv(
     "CORS_ALLOWED_ORIGINS", "http://localhost:3000,http://127.0.0.1:3000"
 ).split(",")
@@ -198,7 +298,7 @@ SITE_ID = 1
 
 # Authentication backends
 AUTHENTICATION_BACKENDS = [
-    "django.contrib.auth.backends.ModelBackend",
+    "users.backends.HashingExecutorBackend",
     "allauth.account.auth_backends.AuthenticationBackend",
 ]
 
@@ -239,8 +339,51 @@ SOCIALACCOUNT_PROVIDERS = {
 # Google OAuth2 settings
 GOOGLE_OAUTH2_CLIENT_ID = getenv("GOOGLE_OAUTH2_CLIENT_ID")
 GOOGLE_OAUTH2_CLIENT_SECRET = getenv("GOOGLE_OAUTH2_CLIENT_SECRET")
+# Public keys used to verify Google ID tokens locally
+GOOGLE_OAUTH2_CERTS_URL = getenv(
+    "GOOGLE_OAUTH2_CERTS_URL", "https://www.googleapis.com/oauth2/v3/certs"
+)
+
+# Large admin changelists (payments.admin.LargeTableAdmin) show PostgreSQL's
+# row estimate instead of running COUNT(*) from this many rows on
+ADMIN_ESTIMATED_COUNT_THRESHOLD = int(
+    getenv("ADMIN_ESTIMATED_COUNT_THRESHOLD", "100000")
+)
 
 # Stripe settings
 STRIPE_PUBLISHABLE_KEY = getenv("STRIPE_PUBLISHABLE_KEY")
 STRIPE_SECRET_KEY = getenv("STRIPE_SECRET_KEY")
 STRIPE_WEBHOOK_SECRET = getenv("STRIPE_WEBHOOK_SECRET")
+# Create the Stripe customer in the background right after sign-up, so that
+# checkout does not have to (payments.provisioning)
+STRIPE_PROVISION_CUSTOMERS = getenv("STRIPE_PROVISION_CUSTOMERS", "True") == "True"
+STRIPE_PROVISIONING_WORKERS = int(getenv("STRIPE_PROVISIONING_WORKERS", "2"))
+# How long checkout sessions stay open (Stripe allows 30 minutes to 24 hours);
+# repeated identical checkout requests get the open session back
+STRIPE_CHECKOUT_SESSION_TTL = int(getenv("STRIPE_CHECKOUT_SESSION_TTL", "3600"))
+# Reused sessions older than this (seconds) are checked with Stripe first, in
+# case they were completed and the worker's cache delete did not reach us
+STRIPE_CHECKOUT_VERIFY_AFTER = int(getenv("STRIPE_CHECKOUT_VERIFY_AFTER", "5"))
+# Serve checkout, cancel and portal from AsyncPaymentsController (ASGI
+# deployments only); Stripe calls are awaited on a shared httpx client.
+PAYMENTS_ASYNC_ROUTES = getenv("PAYMENTS_ASYNC_ROUTES", "False") == "True"
+
+# Webhook inbox worker (manage.py process_stripe_events). Failed events are
+# retried after RETRY_DELAY * 2^(attempt - 1) seconds, capped at
+# RETRY_MAX_DELAY, and marked dead after MAX_ATTEMPTS.
+STRIPE_EVENT_BATCH_SIZE = int(getenv("STRIPE_EVENT_BATCH_SIZE", "50"))
+STRIPE_EVENT_POLL_INTERVAL = float(getenv("STRIPE_EVENT_POLL_INTERVAL", "1"))
+STRIPE_EVENT_MAX_ATTEMPTS = int(getenv("STRIPE_EVENT_MAX_ATTEMPTS", "8"))
+STRIPE_EVENT_RETRY_DELAY = int(getenv("STRIPE_EVENT_RETRY_DELAY", "30"))
+STRIPE_EVENT_RETRY_MAX_DELAY = int(getenv("STRIPE_EVENT_RETRY_MAX_DELAY", "3600"))
+
+# Cache-Control max-age of the public plan catalog (GET /payments/plans)
+PLAN_CATALOG_MAX_AGE = int(getenv("PLAN_CATALOG_MAX_AGE", "300"))
+# How often each process checks the Plan table for catalog changes (seconds)
+PLAN_CATALOG_VERSION_TTL = float(getenv("PLAN_CATALOG_VERSION_TTL", "5"))
+
+# Per-user plan entitlements (payments.entitlements): how long a process
+# trusts its local copy, and how long the shared cache keeps it (capped at the
+# local TTL when the default cache is LocMem, as refreshes are not shared)
+ENTITLEMENT_CACHE_TTL = int(getenv("ENTITLEMENT_CACHE_TTL", "60"))
+ENTITLEMENT_SHARED_CACHE_TTL = int(getenv("ENTITLEMENT_SHARED_CACHE_TTL", "3600"))
@@ -0,0 +1,23 @@
+from django.db import connection
+
+
+def explain(queryset) -> str:
+    """
+    ``EXPLAIN (COSTS OFF)`` of ``queryset`` on PostgreSQL.
+
+    Sequential scans are switched off for the transaction first. Test tables
+    are tiny, so the planner would otherwise scan them even when a usable
+    index exists. With the switch off, a Seq Scan that is still chosen means
+    no index fits the query. Must run inside a transaction, as
+    ``django_db`` tests do.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SET LOCAL enable_seqscan = off")
+    return queryset.explain(costs=False)
+
+
+def assert_no_seq_scan(queryset) -> str:
+    """Fail with the captured plan when ``queryset`` needs a sequential scan"""
+    plan = explain(queryset)
+    assert "Seq Scan" not in plan, f"Query plan uses a sequential scan:\n{plan}"
+    return plan
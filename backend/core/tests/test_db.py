@@ -0,0 +1,44 @@
+import pytest
+from django.db import NotSupportedError, connection, models
+from django.db.migrations.loader import MigrationLoader
+
+from core.db import AddUniqueConstraintConcurrently
+
+CONSTRAINT = models.UniqueConstraint(
+    fields=["user"],
+    condition=models.Q(status__in=("active", "trialing")),
+    name="test_one_active",
+)
+
+
+def forwards(operation):
+    from_state = MigrationLoader(connection).project_state(("payments", "0001_initial"))
+    to_state = from_state.clone()
+    operation.state_forwards("payments", to_state)
+    editor = connection.schema_editor(collect_sql=True, atomic=False)
+    operation.database_forwards("payments", editor, from_state, to_state)
+    return editor.collected_sql
+
+
+@pytest.mark.django_db
+class TestAddUniqueConstraintConcurrently:
+    def test_builds_the_index_concurrently_on_postgresql(self, monkeypatch):
+        monkeypatch.setattr(connection, "vendor", "postgresql")
+        monkeypatch.setattr(connection, "in_atomic_block", False)
+
+        sql = forwards(AddUniqueConstraintConcurrently("subscription", CONSTRAINT))
+
+        assert sql[0].startswith('CREATE UNIQUE INDEX CONCURRENTLY "test_one_active"')
+        assert "WHERE" in sql[0]
+
+    def test_refuses_to_run_in_a_transaction(self, monkeypatch):
+        monkeypatch.setattr(connection, "vendor", "postgresql")
+
+        with pytest.raises(NotSupportedError, match="atomic = False"):
+            forwards(AddUniqueConstraintConcurrently("subscription", CONSTRAINT))
+
+    def test_requires_a_conditional_unique_constraint(self):
+        with pytest.raises(ValueError):
+            AddUniqueConstraintConcurrently(
+                "subscription", models.UniqueConstraint(fields=["user"], name="u")
+            )
@@ -0,0 +1,125 @@
+import pytest
+from asgiref.sync import sync_to_async
+from ninja_extra import api_controller, route
+from ninja_extra.testing import TestAsyncClient, TestClient
+
+from core.etag import etag
+from payments.api import PaymentsController, subscription_etag
+from payments.tests.factories import SubscriptionFactory
+from users.api import AsyncAuthController, AuthController
+from users.authentication import AsyncCachedJWTAuth, token_cache, user_cache
+from users.services import SocialAuthService
+from users.tests.factories import UserAccountFactory
+
+
+@api_controller("/etag", auth=AsyncCachedJWTAuth())
+class AsyncSubscriptionController:
+    @route.get("/subscription")
+    @etag(subscription_etag)
+    async def subscription(self, request):
+        return {"ok": True}
+
+
+# ninja's test client copies header names into META without upper-casing them
+IF_NONE_MATCH = "IF-NONE-MATCH"
+
+
+@pytest.fixture(autouse=True)
+def clear_auth_caches():
+    token_cache.clear()
+    user_cache.clear()
+
+
+def auth_header(user, **headers):
+    access_token = SocialAuthService.generate_jwt_tokens(user)["access"]
+    return {"Authorization": f"Bearer {access_token}", **headers}
+
+
+@pytest.mark.django_db
+class TestMeETag:
+    def test_matching_etag_returns_304(self, django_assert_num_queries):
+        client = TestClient(AuthController)
+        user = UserAccountFactory()
+        first = client.get("/me", headers=auth_header(user))
+
+        with django_assert_num_queries(0):
+            second = client.get(
+                "/me", headers=auth_header(user, **{IF_NONE_MATCH: first["ETag"]})
+            )
+
+        assert first.status_code == 200
+        assert second.status_code == 304
+        assert second.content == b""
+
+    def test_profile_change_changes_etag(self):
+        client = TestClient(AuthController)
+        user = UserAccountFactory()
+        etag = client.get("/me", headers=auth_header(user))["ETag"]
+
+        user.first_name = "Renamed"
+        user.save()
+        response = client.get("/me", headers=auth_header(user, **{IF_NONE_MATCH: etag}))
+
+        assert response.status_code == 200
+        assert response.json()["first_name"] == "Renamed"
+        assert response["ETag"] != etag
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_async_route(self):
+        client = TestAsyncClient(AsyncAuthController)
+        user = await sync_to_async(UserAccountFactory)()
+        first = await client.get("/me", headers=auth_header(user))
+
+        second = await client.get(
+            "/me", headers=auth_header(user, **{IF_NONE_MATCH: first["ETag"]})
+        )
+
+        assert second.status_code == 304
+
+
+@pytest.mark.django_db
+class TestSubscriptionETag:
+    def test_304_skips_loading_the_subscription(self, django_assert_num_queries):
+        client = TestClient(PaymentsController)
+        subscription = SubscriptionFactory()
+        headers = auth_header(subscription.user)
+        first = client.get("/subscription", headers=headers)
+
+        # Only the validator query runs; the user comes from the auth cache
+        with django_assert_num_queries(1):
+            second = client.get(
+                "/subscription",
+                headers={**headers, IF_NONE_MATCH: first["ETag"]},
+            )
+
+        assert first.json()["has_active_subscription"] is True
+        assert second.status_code == 304
+
+    def test_subscription_change_changes_etag(self):
+        client = TestClient(PaymentsController)
+        subscription = SubscriptionFactory()
+        headers = auth_header(subscription.user)
+        etag = client.get("/subscription", headers=headers)["ETag"]
+
+        subscription.status = "canceled"
+        subscription.save()
+        response = client.get("/subscription", headers={**headers, IF_NONE_MATCH: etag})
+
+        assert response.status_code == 200
+        assert response.json()["has_active_subscription"] is False
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_orm_validator_on_async_route(self):
+        client = TestAsyncClient(AsyncSubscriptionController)
+        subscription = await sync_to_async(SubscriptionFactory)()
+        headers = await sync_to_async(auth_header)(subscription.user)
+        first = await client.get("/subscription", headers=headers)
+
+        second = await client.get(
+            "/subscription", headers={**headers, IF_NONE_MATCH: first["ETag"]}
+        )
+
+        assert first.status_code == 200
+        assert second.status_code == 304
@@ -0,0 +1,143 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+import stripe
+
+from core.http import CircuitOpenError, HTTPClient, http_client
+from payments import services  # noqa: F401  (configures stripe.default_http_client)
+
+
+@pytest.fixture
+def stub_server():
+    """Local HTTP/1.1 server; ``state`` controls the status and delay"""
+    state = {"status": 200, "delay": 0, "requests": 0, "clients": set()}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            state["requests"] += 1
+            state["clients"].add(self.client_address)
+            time.sleep(state["delay"])
+            body = json.dumps({"id": "cus_1", "object": "customer"}).encode()
+            self.send_response(state["status"])
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    state["host"] = f"127.0.0.1:{server.server_port}"
+    state["url"] = f"http://{state['host']}"
+    yield state
+    server.shutdown()
+
+
+@pytest.fixture
+def client():
+    return HTTPClient(timeout=1, pool_maxsize=2, failure_threshold=3, reset_timeout=0.2)
+
+
+class TestHTTPClient:
+    def test_connections_are_reused(self, client, stub_server):
+        for _ in range(5):
+            assert client.get(stub_server["url"]).status_code == 200
+
+        assert len(stub_server["clients"]) == 1
+
+    def test_records_per_host_stats(self, client, stub_server):
+        client.get(stub_server["url"])
+        stub_server["status"] = 503
+        client.get(stub_server["url"])
+
+        stats = client.stats()[stub_server["host"]]
+        assert stats["requests"] == 2
+        assert stats["errors"] == 1
+        assert stats["circuit"] == "closed"
+
+    def test_deadline_is_enforced(self, client, stub_server):
+        stub_server["delay"] = 1
+
+        start = time.monotonic()
+        with pytest.raises(requests.Timeout):
+            client.get(stub_server["url"], timeout=0.1)
+
+        assert time.monotonic() - start < 0.5
+
+    def test_circuit_opens_and_fails_fast(self, client, stub_server):
+        stub_server["status"] = 500
+        for _ in range(3):
+            client.get(stub_server["url"])
+
+        with pytest.raises(CircuitOpenError):
+            client.get(stub_server["url"])
+
+        assert stub_server["requests"] == 3
+        assert client.stats()[stub_server["host"]]["rejected"] == 1
+
+    def test_half_open_trial_closes_circuit(self, client, stub_server):
+        stub_server["status"] = 500
+        for _ in range(3):
+            client.get(stub_server["url"])
+        stub_server["status"] = 200
+        time.sleep(0.25)
+
+        assert client.get(stub_server["url"]).status_code == 200
+        assert client.adapter.breaker(stub_server["host"]).state == "closed"
+
+    @pytest.mark.asyncio
+    async def test_async_client_shares_the_circuit(self, client, stub_server):
+        stub_server["status"] = 500
+        async with client.async_client() as async_client:
+            for _ in range(3):
+                await async_client.get(stub_server["url"])
+
+            with pytest.raises(CircuitOpenError):
+                await async_client.get(stub_server["url"])
+
+        with pytest.raises(CircuitOpenError):
+            client.get(stub_server["url"])
+        assert stub_server["requests"] == 3
+        assert client.stats()[stub_server["host"]]["errors"] == 3
+
+    def test_failed_trial_reopens_circuit(self, client, stub_server):
+        stub_server["status"] = 500
+        for _ in range(3):
+            client.get(stub_server["url"])
+        time.sleep(0.25)
+
+        client.get(stub_server["url"])
+
+        with pytest.raises(CircuitOpenError):
+            client.get(stub_server["url"])
+
+
+def test_stripe_uses_shared_client(stub_server, monkeypatch):
+    monkeypatch.setattr(stripe, "api_base", stub_server["url"])
+    monkeypatch.setattr(stripe, "api_key", "sk_test_123")
+
+    customer = stripe.Customer.retrieve("cus_1")
+
+    assert customer.id == "cus_1"
+    assert stub_server["host"] in http_client.stats()
+
+
+@pytest.mark.asyncio
+async def test_async_stripe_calls_use_shared_breakers(stub_server, monkeypatch):
+    monkeypatch.setattr(stripe, "api_base", stub_server["url"])
+    monkeypatch.setattr(stripe, "api_key", "sk_test_123")
+
+    customer = await stripe.Customer.retrieve_async("cus_1")
+
+    assert customer.id == "cus_1"
+    assert stub_server["host"] in http_client.stats()
@@ -0,0 +1,110 @@
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+from ninja_extra.testing import TestClient
+
+from core.introspection import IntrospectionController, result_cache
+from payments.models import Plan, Subscription
+from users.authentication import token_cache
+from users.services import SocialAuthService
+from users.tests.factories import UserAccountFactory
+
+SERVICE_HEADERS = {"Authorization": "Bearer service-secret"}
+
+
+@pytest.fixture
+def client(settings):
+    settings.INTERNAL_API_TOKENS = ["service-secret"]
+    result_cache.clear()
+    token_cache.clear()
+    return TestClient(IntrospectionController)
+
+
+def access_token(user):
+    return SocialAuthService.generate_jwt_tokens(user)["access"]
+
+
+def subscribe(user):
+    plan = Plan.objects.create(name="pro", stripe_price_id="price_pro", price=10)
+    now = timezone.now()
+    Subscription.objects.create(
+        user=user,
+        plan=plan,
+        stripe_subscription_id=f"sub_{user.id}",
+        status="active",
+        current_period_start=now,
+        current_period_end=now + timedelta(days=30),
+    )
+
+
+@pytest.mark.django_db
+class TestIntrospection:
+    def test_requires_service_token(self, client):
+        response = client.post(
+            "/introspect",
+            json={"tokens": []},
+            headers={"Authorization": "Bearer nope"},
+        )
+
+        assert response.status_code == 401
+
+    def test_batch_resolves_users_in_one_query(self, client, django_assert_num_queries):
+        subscriber, other = UserAccountFactory(), UserAccountFactory()
+        subscribe(subscriber)
+        tokens = [
+            access_token(subscriber),
+            access_token(other),
+            access_token(subscriber),
+            "garbage",
+        ]
+
+        with django_assert_num_queries(1):
+            response = client.post(
+                "/introspect", json={"tokens": tokens}, headers=SERVICE_HEADERS
+            )
+
+        assert response.status_code == 200
+        results = response.json()
+        assert results[0]["valid"] and results[0]["has_active_subscription"]
+        assert results[0]["user_id"] == subscriber.id
+        assert results[0]["exp"] > timezone.now().timestamp()
+        assert results[1]["valid"] and not results[1]["has_active_subscription"]
+        assert results[2]["user_id"] == subscriber.id
+        assert results[3] == {
+            "valid": False,
+            "user_id": None,
+            "exp": None,
+            "has_active_subscription": False,
+        }
+
+    def test_inactive_user_is_invalid(self, client):
+        user = UserAccountFactory(is_active=False)
+
+        response = client.post(
+            "/introspect",
+            json={"tokens": [access_token(user)]},
+            headers=SERVICE_HEADERS,
+        )
+
+        assert response.json()[0]["valid"] is False
+
+    def test_results_are_cached(self, client, django_assert_num_queries):
+        tokens = [access_token(UserAccountFactory())]
+        client.post("/introspect", json={"tokens": tokens}, headers=SERVICE_HEADERS)
+
+        with django_assert_num_queries(0):
+            response = client.post(
+                "/introspect", json={"tokens": tokens}, headers=SERVICE_HEADERS
+            )
+
+        assert response.json()[0]["valid"] is True
+
+    def test_batch_size_is_limited(self, client, settings):
+        response = client.post(
+            "/introspect",
+            json={"tokens": ["t"] * (settings.INTROSPECTION_MAX_TOKENS + 1)},
+            headers=SERVICE_HEADERS,
+        )
+
+        assert response.status_code == 422
@@ -48,6 +48,22 @@ def run_api(args):
     )
 
 
+@docker_run.command(
+    context_settings={
+        "ignore_unknown_options": True,
+    },
+)
+@click.argument("args", nargs=-1, type=click.UNPROCESSED)
+def run_worker(args):
+    """Process stored Stripe webhook events; run alongside run-api."""
+    click.echo("Starting Stripe event worker.")
+    click.echo(f"Additional arguments: {args}")
+    result = subprocess.run(
+        ["python", "manage.py", "process_stripe_events"] + list(args)
+    )
+    sys.exit(result.returncode)
+
+
 def _create_default_admin():
     click.echo("Creating default admin user (if necessary).")
     start_time = time.time()
@@ -127,7 +143,9 @@ def test_integration():
 def _migration():
     click.echo("Running migrations.")
     start_time = time.time()
-    subprocess.run(["python", "manage.py", "migrate", "--noinput"])
+    # --fake-initial: databases whose payments tables were created with
+    # --run-syncdb already have what payments 0001_initial would create
+    subprocess.run(["python", "manage.py", "migrate", "--noinput", "--fake-initial"])
     click.echo(f"Migrations completed in {time.time() - start_time} seconds.")
 
 
@@ -1,11 +1,134 @@
+import json
+
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .models import (
+    DailyRollup,
+    Payment,
+    Plan,
+    PlanRollup,
+    StripeCustomer,
+    StripeEvent,
+    Subscription,
+)
+
+# Query string parameter holding the last primary key of the previous page
+CURSOR_VAR = "after"
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that takes the row count from PostgreSQL's planner estimate
+    (EXPLAIN, which reads the table statistics) instead of running COUNT(*),
+    once the estimate reaches ADMIN_ESTIMATED_COUNT_THRESHOLD. Smaller
+    results and other databases are counted exactly.
+    """
+
+    @cached_property
+    def count(self) -> int:
+        estimate = self.estimated_count()
+        if (
+            estimate is not None
+            and estimate >= settings.ADMIN_ESTIMATED_COUNT_THRESHOLD
+        ):
+            return estimate
+        return super().count
+
+    def estimated_count(self) -> int | None:
+        connection = connections[self.object_list.db]
+        if connection.vendor != "postgresql":
+            return None
+        sql, params = self.object_list.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class KeysetChangeList(ChangeList):
+    """
+    Changelist that pages by primary key instead of OFFSET.
+
+    With the default newest-first ordering, the next page is requested as
+    ``?after=<last pk>`` and loaded with ``pk < after ... LIMIT``, which costs
+    the same on every page. Sorting by a column falls back to numbered pages.
+    """
+
+    def __init__(self, request, *args, **kwargs):
+        self.cursor = request.GET.get(CURSOR_VAR)
+        self.next_cursor = None
+        super().__init__(request, *args, **kwargs)
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # Changing filters, search or ordering starts from the first page
+        return super().get_query_string(
+            {CURSOR_VAR: None, **(new_params or {})}, remove
+        )
+
+    @property
+    def keyset_pagination(self) -> bool:
+        return list(self.queryset.query.order_by) in (
+            ["-pk"],
+            [f"-{self.lookup_opts.pk.attname}"],
+        )
+
+    def get_results(self, request):
+        super().get_results(request)
+        if not self.keyset_pagination or (self.show_all and self.can_show_all):
+            return
+
+        queryset = self.queryset
+        if self.cursor:
+            try:
+                queryset = queryset.filter(pk__lt=self.cursor)
+            except (TypeError, ValueError):
+                queryset = queryset.none()
+        self.result_list = queryset[: self.list_per_page]
+        if len(self.result_list) == self.list_per_page:
+            self.next_cursor = self.result_list[self.list_per_page - 1].pk
+        self.multi_page = bool(self.cursor or self.next_cursor)
+
+    def first_page_url(self) -> str:
+        return self.get_query_string()
+
+    def next_page_url(self) -> str:
+        return self.get_query_string({CURSOR_VAR: self.next_cursor})
+
 
-from .models import Payment, Plan, StripeCustomer, Subscription
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Changelist for tables too large to count or page through with OFFSET.
+
+    Counts come from EstimatedCountPaginator, the unfiltered total is not
+    counted at all, and pages are keyset-paginated (KeysetChangeList). Set
+    ``list_select_related`` for the foreign keys in ``list_display``, and
+    index the ``date_hierarchy`` field.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
 
 
 @admin.register(StripeCustomer)
 class StripeCustomerAdmin(admin.ModelAdmin):
     list_display = ("user", "stripe_customer_id", "created_at")
+    list_select_related = ("user",)
     search_fields = ("user__email", "stripe_customer_id")
     readonly_fields = ("stripe_customer_id", "created_at", "updated_at")
 
@@ -19,7 +142,7 @@ class PlanAdmin(admin.ModelAdmin):
 
 
 @admin.register(Subscription)
-class SubscriptionAdmin(admin.ModelAdmin):
+class SubscriptionAdmin(LargeTableAdmin):
     list_display = (
         "user",
         "plan",
@@ -29,15 +152,67 @@ class SubscriptionAdmin(admin.ModelAdmin):
         "cancel_at_period_end",
     )
     list_filter = ("status", "cancel_at_period_end", "plan")
+    list_select_related = ("user", "plan")
     search_fields = ("user__email", "stripe_subscription_id")
     readonly_fields = ("stripe_subscription_id", "created_at", "updated_at")
     date_hierarchy = "created_at"
 
 
 @admin.register(Payment)
-class PaymentAdmin(admin.ModelAdmin):
+class PaymentAdmin(LargeTableAdmin):
     list_display = ("user", "amount", "currency", "status", "created_at")
     list_filter = ("status", "currency")
+    list_select_related = ("user",)
     search_fields = ("user__email", "stripe_payment_intent_id")
     readonly_fields = ("stripe_payment_intent_id", "created_at", "updated_at")
     date_hierarchy = "created_at"
+
+
+@admin.register(StripeEvent)
+class StripeEventAdmin(admin.ModelAdmin):
+    list_display = ("stripe_event_id", "type", "status", "attempts", "created_at")
+    list_filter = ("status", "type")
+    search_fields = ("stripe_event_id",)
+    readonly_fields = ("stripe_event_id", "type", "payload", "created_at")
+    actions = ("retry",)
+
+    @admin.action(description="Retry selected events")
+    def retry(self, request, queryset):
+        queryset.update(
+            status=StripeEvent.PENDING, attempts=0, next_attempt_at=timezone.now()
+        )
+
+
+class RollupAdmin(admin.ModelAdmin):
+    """Read-only: rows are maintained by payments.rollups"""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DailyRollup)
+class DailyRollupAdmin(RollupAdmin):
+    list_display = (
+        "day",
+        "plan",
+        "currency",
+        "revenue",
+        "payments",
+        "new_subscriptions",
+        "canceled_subscriptions",
+    )
+    list_filter = ("plan", "currency")
+    date_hierarchy = "day"
+    ordering = ("-day", "plan")
+
+
+@admin.register(PlanRollup)
+class PlanRollupAdmin(RollupAdmin):
+    list_display = ("plan", "currency", "active_subscriptions", "mrr")
+    ordering = ("plan",)
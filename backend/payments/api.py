@@ -1,12 +1,20 @@
+import json
+from datetime import date
+
 import stripe
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.http import HttpResponse
 from ninja_extra import api_controller, route
 from ninja_extra.exceptions import APIException
-from ninja_jwt.authentication import JWTAuth
+from ninja_extra.permissions import IsAdminUser
+
+from core.etag import etag
+from users.authentication import AsyncCachedJWTAuth, CachedJWTAuth
 
-from .models import Plan
+from .catalog import plan_catalog
+from .inbox import StripeEventInbox
+from .models import DailyRollup, Plan, PlanRollup
 from .schemas import (
     CancelSubscriptionResponseSchema,
     CancelSubscriptionSchema,
@@ -14,6 +22,8 @@ from .schemas import (
     CreateCheckoutSessionSchema,
     CustomerPortalResponseSchema,
     CustomerPortalSchema,
+    DailyRollupSchema,
+    PlanRollupSchema,
     PlanSchema,
     SubscriptionSchema,
     UserSubscriptionSchema,
@@ -23,20 +33,36 @@ from .services import StripeService
 User = get_user_model()
 
 
+def plans_etag(request) -> str:
+    return plan_catalog.get()[1]
+
+
+def subscription_etag(request) -> str:
+    """Validator for /payments/subscription; the route reuses the lookup"""
+    subscription = StripeService.get_user_subscription(request.user)
+    if subscription is None:
+        return "none"
+    return f"{subscription.pk}:{subscription.updated_at}:{subscription.plan.updated_at}"
+
+
 @api_controller("/payments", tags=["Payments"])
 class PaymentsController:
     @route.get("/plans", response=list[PlanSchema], auth=None, operation_id="get_plans")
+    @etag(plans_etag)
     def get_plans(self, request):
         """Get all available subscription plans"""
-        plans = Plan.objects.filter(is_active=True)
-        return [PlanSchema.from_orm(plan) for plan in plans]
+        body, _ = plan_catalog.get()
+        response = HttpResponse(body, content_type="application/json")
+        response["Cache-Control"] = plan_catalog.cache_control()
+        return response
 
     @route.get(
         "/subscription",
         response=UserSubscriptionSchema,
-        auth=JWTAuth(),
+        auth=CachedJWTAuth(),
         operation_id="get_user_subscription",
     )
+    @etag(subscription_etag)
     def get_user_subscription(self, request):
         """Get user's current subscription status"""
         subscription = StripeService.get_user_subscription(request.user)
@@ -55,16 +81,11 @@ class PaymentsController:
     @route.post(
         "/checkout",
         response=CheckoutSessionResponseSchema,
-        auth=JWTAuth(),
+        auth=CachedJWTAuth(),
         operation_id="create_checkout_session",
     )
     def create_checkout_session(self, request, data: CreateCheckoutSessionSchema):
         """Create a Stripe checkout session for subscription"""
-        try:
-            plan = Plan.objects.get(id=data.plan_id, is_active=True)
-        except Plan.DoesNotExist:
-            raise APIException(detail="Plan not found", code=404) from None
-
         # Check if user already has active subscription
         existing_subscription = StripeService.get_user_subscription(request.user)
         if existing_subscription:
@@ -72,6 +93,18 @@ class PaymentsController:
                 detail="User already has an active subscription", code=400
             )
 
+        # Repeated requests get the session that is still open
+        open_session = StripeService.get_open_checkout_session(
+            request.user, data.plan_id, data.success_url, data.cancel_url
+        )
+        if open_session:
+            return CheckoutSessionResponseSchema(**open_session)
+
+        try:
+            plan = Plan.objects.get(id=data.plan_id, is_active=True)
+        except Plan.DoesNotExist:
+            raise APIException(detail="Plan not found", code=404) from None
+
         try:
             session_data = StripeService.create_checkout_session(
                 user=request.user,
@@ -90,7 +123,7 @@ class PaymentsController:
     @route.post(
         "/cancel",
         response=CancelSubscriptionResponseSchema,
-        auth=JWTAuth(),
+        auth=CachedJWTAuth(),
         operation_id="cancel_subscription",
     )
     def cancel_subscription(self, request, data: CancelSubscriptionSchema):
@@ -105,7 +138,7 @@ class PaymentsController:
     @route.post(
         "/portal",
         response=CustomerPortalResponseSchema,
-        auth=JWTAuth(),
+        auth=CachedJWTAuth(),
         operation_id="create_customer_portal",
     )
     def create_customer_portal(self, request, data: CustomerPortalSchema):
@@ -123,6 +156,117 @@ class PaymentsController:
             ) from e
 
 
+@api_controller("/payments", tags=["Payments"])
+class AsyncPaymentsController(PaymentsController):
+    """
+    Async variant of ``PaymentsController`` for ASGI deployments.
+
+    The routes that call Stripe (checkout, cancel, portal) await it through
+    ``StripeService``'s async methods and use the async ORM, so a slow Stripe
+    response holds a coroutine instead of a thread. Paths, payloads and
+    operation ids are unchanged; only one of the two controllers is
+    registered (see ``PAYMENTS_ASYNC_ROUTES``).
+    """
+
+    @route.post(
+        "/checkout",
+        response=CheckoutSessionResponseSchema,
+        auth=AsyncCachedJWTAuth(),
+        operation_id="create_checkout_session",
+    )
+    async def create_checkout_session(self, request, data: CreateCheckoutSessionSchema):
+        """Create a Stripe checkout session for subscription"""
+        if await StripeService.aget_user_subscription(request.user):
+            raise APIException(
+                detail="User already has an active subscription", code=400
+            )
+
+        open_session = await StripeService.aget_open_checkout_session(
+            request.user, data.plan_id, data.success_url, data.cancel_url
+        )
+        if open_session:
+            return CheckoutSessionResponseSchema(**open_session)
+
+        try:
+            plan = await Plan.objects.aget(id=data.plan_id, is_active=True)
+        except Plan.DoesNotExist:
+            raise APIException(detail="Plan not found", code=404) from None
+
+        try:
+            session_data = await StripeService.acreate_checkout_session(
+                user=request.user,
+                plan=plan,
+                success_url=data.success_url,
+                cancel_url=data.cancel_url,
+            )
+
+            return CheckoutSessionResponseSchema(**session_data)
+
+        except Exception as e:
+            raise APIException(
+                detail=f"Error creating checkout session: {str(e)}", code=500
+            ) from e
+
+    @route.post(
+        "/cancel",
+        response=CancelSubscriptionResponseSchema,
+        auth=AsyncCachedJWTAuth(),
+        operation_id="cancel_subscription",
+    )
+    async def cancel_subscription(self, request, data: CancelSubscriptionSchema):
+        """Cancel user's subscription"""
+        result = await StripeService.acancel_subscription(
+            request.user, data.subscription_id
+        )
+
+        if result["success"]:
+            return CancelSubscriptionResponseSchema(**result)
+        else:
+            raise APIException(detail=result["message"], code=400)
+
+    @route.post(
+        "/portal",
+        response=CustomerPortalResponseSchema,
+        auth=AsyncCachedJWTAuth(),
+        operation_id="create_customer_portal",
+    )
+    async def create_customer_portal(self, request, data: CustomerPortalSchema):
+        """Create a Stripe customer portal session"""
+        try:
+            portal_data = await StripeService.acreate_customer_portal_session(
+                user=request.user, return_url=data.return_url
+            )
+
+            return CustomerPortalResponseSchema(**portal_data)
+
+        except Exception as e:
+            raise APIException(
+                detail=f"Error creating customer portal: {str(e)}", code=500
+            ) from e
+
+
+@api_controller(
+    "/payments/metrics",
+    tags=["Finance"],
+    auth=CachedJWTAuth(),
+    permissions=[IsAdminUser],
+)
+class FinanceController:
+    """Finance dashboard metrics, served from the rollup tables"""
+
+    @route.get("/daily", response=list[DailyRollupSchema], operation_id="daily_metrics")
+    def get_daily(self, request, start: date, end: date):
+        """Revenue and subscription flows per day, plan and currency"""
+        return DailyRollup.objects.filter(day__range=(start, end)).order_by(
+            "day", "plan", "currency"
+        )
+
+    @route.get("/plans", response=list[PlanRollupSchema], operation_id="plan_metrics")
+    def get_plans(self, request):
+        """Current active subscriptions and MRR per plan"""
+        return PlanRollup.objects.order_by("plan", "currency")
+
+
 @api_controller("/payments/webhooks", tags=["Webhooks"])
 class WebhooksController:
     @route.post("/stripe", auth=None, operation_id="stripe_webhook")
@@ -132,7 +276,7 @@ class WebhooksController:
         sig_header = request.META.get("HTTP_STRIPE_SIGNATURE")
 
         try:
-            event = stripe.Webhook.construct_event(
+            stripe.Webhook.construct_event(
                 payload, sig_header, settings.STRIPE_WEBHOOK_SECRET
             )
         except ValueError:
@@ -142,41 +286,7 @@ class WebhooksController:
             # Invalid signature
             return HttpResponse(status=400)
 
-        # Handle the event
-        try:
-            if event["type"] == "checkout.session.completed":
-                # session = event['data']['object']
-                # Handle successful payment
-                # The subscription will be created via subscription.created event
-                pass
-
-            elif event["type"] == "customer.subscription.created":
-                subscription = event["data"]["object"]
-                StripeService.handle_subscription_created(subscription)
-
-            elif event["type"] == "customer.subscription.updated":
-                subscription = event["data"]["object"]
-                StripeService.handle_subscription_updated(subscription)
-
-            elif event["type"] == "customer.subscription.deleted":
-                subscription = event["data"]["object"]
-                StripeService.handle_subscription_deleted(subscription)
-
-            elif event["type"] == "invoice.payment_succeeded":
-                # invoice = event['data']['object']
-                # Handle successful payment
-                pass
-
-            elif event["type"] == "invoice.payment_failed":
-                # invoice = event['data']['object']
-                # Handle failed payment
-                pass
-
-            else:
-                print(f"Unhandled event type: {event['type']}")
-
-        except Exception as e:
-            print(f"Error handling webhook: {str(e)}")
-            return HttpResponse(status=500)
-
+        # Stored for process_stripe_events, exactly as Stripe sent it (now
+        # verified); Stripe only needs the ack
+        StripeEventInbox.store(json.loads(payload))
         return HttpResponse(status=200)
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Count, Max
+from ninja.responses import NinjaJSONEncoder
+
+from .models import Plan
+from .schemas import PlanSchema
+
+
+class CatalogVersion:
+    """
+    Version of the plan catalog, derived from the Plan table itself: its row
+    count and latest ``updated_at``.
+
+    Every process re-reads it at most every PLAN_CATALOG_VERSION_TTL seconds,
+    so a change made anywhere (another worker, ``manage.py create_plans``, the
+    admin) reaches all processes within that time, with no shared cache
+    involved. ``QuerySet.update()`` must set ``updated_at`` to be noticed.
+    """
+
+    def __init__(self):
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> str:
+        now = time.monotonic()
+        if (
+            self._version is None
+            or now - self._checked_at >= settings.PLAN_CATALOG_VERSION_TTL
+        ):
+            with self._lock:
+                row = Plan.objects.aggregate(
+                    count=Count("id"), updated=Max("updated_at")
+                )
+                updated = row["updated"].timestamp() if row["updated"] else 0
+                self._version = f"{row['count']}-{updated:.6f}"
+                self._checked_at = now
+        return self._version
+
+    def expire(self) -> None:
+        self._version = None
+
+
+_catalog_version = CatalogVersion()
+
+
+def catalog_version() -> str:
+    return _catalog_version.get()
+
+
+def bump_catalog_version() -> None:
+    """
+    Pick up a Plan change in this process right away; called on Plan
+    changes. Other processes follow within PLAN_CATALOG_VERSION_TTL.
+    """
+    _catalog_version.expire()
+
+
+class PlanCatalog:
+    """
+    Serialized active plans, rebuilt only when the catalog version changes.
+
+    ``get()`` makes no query while the version is fresh; the JSON body and
+    its ETag are computed once per version and process.
+    """
+
+    def __init__(self):
+        self._version = None
+        self._body = b""
+        self._etag = ""
+        self._lock = threading.Lock()
+
+    def get(self) -> tuple[bytes, str]:
+        """Return ``(json_body, etag)`` for the active plans"""
+        version = catalog_version()
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._build(version)
+        return self._body, self._etag
+
+    def _build(self, version: str) -> None:
+        plans = Plan.objects.filter(is_active=True).order_by("id")
+        body = json.dumps(
+            [PlanSchema.from_orm(plan).model_dump() for plan in plans],
+            cls=NinjaJSONEncoder,
+        ).encode()
+        self._body = body
+        self._etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        self._version = version
+
+    def cache_control(self) -> str:
+        return f"public, max-age={settings.PLAN_CATALOG_MAX_AGE}"
+
+
+plan_catalog = PlanCatalog()
@@ -0,0 +1,220 @@
+import functools
+import inspect
+import re
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.text import slugify
+from ninja_extra.exceptions import PermissionDenied
+
+from core import metrics
+from core.cache import TTLCache, is_shared
+
+from .catalog import catalog_version
+from .models import Plan, Subscription
+
+# Features that routes can require, matched against Plan.features by slug
+# ("API access" -> "api_access"). Append only: the position is the bit.
+FEATURES = (
+    "basic_features",
+    "limited_usage",
+    "community_support",
+    "advanced_analytics",
+    "priority_support",
+    "custom_integrations",
+    "api_access",
+    "white_label_options",
+    "dedicated_support",
+    "custom_development",
+    "sla_guarantee",
+    "team_collaboration",
+)
+FEATURE_BITS = {feature: 1 << index for index, feature in enumerate(FEATURES)}
+
+# "All pro features" grants everything the pro plan has
+INCLUDE_PLAN = re.compile(r"^all_(\w+)_features$")
+
+
+def feature_key(name: str) -> str:
+    return slugify(name).replace("-", "_")
+
+
+def compile_plans(plans: dict[str, list[str]]) -> dict[str, int]:
+    """Feature bitset per plan name; unknown feature names are ignored"""
+    compiled = {}
+
+    def bits(name, seen):
+        if name in compiled:
+            return compiled[name]
+        result = 0
+        for feature in plans.get(name, ()):
+            key = feature_key(feature)
+            if key in FEATURE_BITS:
+                result |= FEATURE_BITS[key]
+            elif (match := INCLUDE_PLAN.match(key)) and match[1] not in seen:
+                result |= bits(match[1], seen | {match[1]})
+        return result
+
+    for name in plans:
+        compiled[name] = bits(name, {name})
+    return compiled
+
+
+class Entitlement:
+    """What a user may use: their active plan and its feature bits"""
+
+    def __init__(self, plan: str | None = None, features: int = 0, period_end=None):
+        self.plan = plan
+        self.features = features
+        # Unix timestamp; access ends here even if no webhook arrives
+        self.period_end = period_end
+
+    def has(self, bit: int) -> bool:
+        return bool(self.features & bit) and time.time() < self.period_end
+
+
+class EntitlementStore:
+    """
+    Per-user entitlements, cached in process and in the default cache.
+
+    A check is a lookup in the process-local cache. On a local miss the
+    shared cache is read, and only then the database (one query). The
+    ``handle_subscription_*`` webhook handlers call ``refresh``, which
+    updates the shared cache and this process right away; other processes
+    pick the change up within ENTITLEMENT_CACHE_TTL. Shared entries are keyed
+    by the plan catalog version, so editing a plan invalidates them all.
+
+    When the default cache is per process (LocMem), a refresh by the webhook
+    worker never reaches the web processes, so shared entries then live no
+    longer than ENTITLEMENT_CACHE_TTL too.
+    """
+
+    def __init__(self):
+        self._local = TTLCache(
+            settings.AUTH_CACHE_MAXSIZE, settings.ENTITLEMENT_CACHE_TTL
+        )
+        self._plans_version = None
+        self._plan_bits = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Entitlement:
+        entitlement = self._local.get(user_id)
+        if entitlement is None:
+            key = self._key(user_id)
+            entitlement = cache.get(key)
+            if entitlement is None:
+                entitlement = self._load(user_id)
+                cache.set(key, entitlement, self._shared_ttl())
+            self._remember(user_id, entitlement)
+        return entitlement
+
+    async def aget(self, user_id: int) -> Entitlement:
+        entitlement = self._local.get(user_id)
+        if entitlement is None:
+            entitlement = await sync_to_async(self.get)(user_id)
+        return entitlement
+
+    def refresh(self, user_id: int) -> Entitlement:
+        """Reload a user's entitlement after their subscription changed"""
+        entitlement = self._load(user_id)
+        cache.set(self._key(user_id), entitlement, self._shared_ttl())
+        self._remember(user_id, entitlement)
+        return entitlement
+
+    def invalidate(self, user_ids) -> None:
+        """Drop cached entitlements; cheaper than ``refresh`` for many users"""
+        version = catalog_version()
+        cache.delete_many([self._key(user_id, version) for user_id in user_ids])
+        for user_id in user_ids:
+            self._local.delete(user_id)
+
+    def clear(self) -> None:
+        self._local.clear()
+
+    def _key(self, user_id: int, version: str | None = None) -> str:
+        version = catalog_version() if version is None else version
+        return f"payments:entitlements:{version}:{user_id}"
+
+    def _shared_ttl(self) -> int:
+        if is_shared():
+            return settings.ENTITLEMENT_SHARED_CACHE_TTL
+        return min(
+            settings.ENTITLEMENT_SHARED_CACHE_TTL, settings.ENTITLEMENT_CACHE_TTL
+        )
+
+    def _remember(self, user_id: int, entitlement: Entitlement) -> None:
+        ttl = None
+        if entitlement.period_end is not None:
+            ttl = max(entitlement.period_end - time.time(), 0)
+        self._local.set(user_id, entitlement, ttl=ttl)
+
+    def _load(self, user_id: int) -> Entitlement:
+        row = (
+            Subscription.objects.filter(
+                user_id=user_id, status__in=Subscription.ACTIVE_STATUSES
+            )
+            .values_list("plan__name", "current_period_end")
+            .first()
+        )
+        if row is None:
+            return Entitlement()
+        plan, period_end = row
+        return Entitlement(
+            plan, self._compiled_plans().get(plan, 0), period_end.timestamp()
+        )
+
+    def _compiled_plans(self) -> dict[str, int]:
+        version = catalog_version()
+        if version != self._plans_version:
+            with self._lock:
+                if version != self._plans_version:
+                    self._plan_bits = compile_plans(
+                        dict(Plan.objects.values_list("name", "features"))
+                    )
+                    self._plans_version = version
+        return self._plan_bits
+
+
+entitlements = EntitlementStore()
+metrics.register("entitlements", entitlements._local.stats)
+
+
+def requires_feature(feature: str):
+    """
+    Allow a controller route only for users whose plan includes ``feature``.
+
+    Place it below ``@route`` so it runs after authentication. Answers 403
+    otherwise.
+    """
+    if feature not in FEATURE_BITS:
+        raise ImproperlyConfigured(f"Unknown feature {feature!r}, see FEATURES")
+    bit = FEATURE_BITS[feature]
+
+    def forbidden():
+        return PermissionDenied(f"Your plan does not include {feature}")
+
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(self, request, *args, **kwargs):
+                entitlement = await entitlements.aget(request.user.pk)
+                if not entitlement.has(bit):
+                    raise forbidden()
+                return await func(self, request, *args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(self, request, *args, **kwargs):
+            if not entitlements.get(request.user.pk).has(bit):
+                raise forbidden()
+            return func(self, request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
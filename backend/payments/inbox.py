@@ -0,0 +1,123 @@
+import traceback
+from datetime import timedelta
+from typing import Any
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import StripeEvent
+from .rollups import Rollups
+from .services import StripeService
+
+
+class StripeEventInbox:
+    """
+    Durable inbox between the Stripe webhook and the subscription handlers.
+
+    The webhook only stores the verified event, so Stripe gets its 200 right
+    away; ``manage.py process_stripe_events`` applies events later. Workers
+    claim batches with ``SELECT ... FOR UPDATE SKIP LOCKED``, so any number of
+    them can run side by side without handling an event twice. A failed
+    event is retried with exponential backoff and marked dead after
+    STRIPE_EVENT_MAX_ATTEMPTS attempts.
+    """
+
+    @staticmethod
+    def store(event: dict[str, Any]) -> None:
+        """Append a verified event; redeliveries of a stored event are ignored"""
+        StripeEvent.objects.bulk_create(
+            [
+                StripeEvent(
+                    stripe_event_id=event["id"], type=event["type"], payload=event
+                )
+            ],
+            ignore_conflicts=True,
+        )
+
+    @staticmethod
+    def backoff(attempts: int) -> timedelta:
+        delay = settings.STRIPE_EVENT_RETRY_DELAY * 2 ** (attempts - 1)
+        return timedelta(seconds=min(delay, settings.STRIPE_EVENT_RETRY_MAX_DELAY))
+
+    @staticmethod
+    def process_batch(batch_size: int | None = None, coalesce: bool = False) -> int:
+        """
+        Claim and process up to ``batch_size`` due events; returns the count.
+
+        With ``coalesce``, the subscription events of the batch are applied
+        together by ``StripeService.sync_subscriptions``, which keeps only
+        the newest state per subscription. If that fails, they are processed
+        one by one as usual. Rollup increments are applied once, at the end
+        of the batch.
+        """
+        batch_size = batch_size or settings.STRIPE_EVENT_BATCH_SIZE
+        with transaction.atomic(), Rollups.deferred():
+            events = list(
+                StripeEvent.objects.select_for_update(skip_locked=True)
+                .filter(status=StripeEvent.PENDING, next_attempt_at__lte=timezone.now())
+                .order_by("next_attempt_at", "id")[:batch_size]
+            )
+            remaining = events
+            if coalesce:
+                remaining = StripeEventInbox._process_coalesced(events)
+            for event in remaining:
+                StripeEventInbox._process(event)
+        return len(events)
+
+    @staticmethod
+    def _process_coalesced(events: list[StripeEvent]) -> list[StripeEvent]:
+        """Bulk-apply subscription events; returns the events still to process"""
+        bulk = [e for e in events if e.type in StripeService.SUBSCRIPTION_EVENTS]
+        others = [e for e in events if e.type not in StripeService.SUBSCRIPTION_EVENTS]
+        if not bulk:
+            return others
+
+        try:
+            with transaction.atomic(), Rollups.deferred():
+                unapplied = StripeService.sync_subscriptions(
+                    [event.payload for event in bulk]
+                )
+        except Exception:
+            return events
+
+        unapplied_ids = {payload["id"] for payload in unapplied}
+        StripeEvent.objects.filter(
+            pk__in=[e.pk for e in bulk if e.stripe_event_id not in unapplied_ids]
+        ).update(
+            status=StripeEvent.PROCESSED,
+            attempts=F("attempts") + 1,
+            processed_at=timezone.now(),
+            last_error="",
+        )
+        return [e for e in events if e.stripe_event_id in unapplied_ids] + others
+
+    @staticmethod
+    def _process(event: StripeEvent) -> None:
+        event.attempts += 1
+        try:
+            # Savepoint, so a failing handler leaves the rest of the batch alone
+            with transaction.atomic(), Rollups.deferred():
+                StripeService.handle_event(event.payload)
+        except Exception:
+            event.last_error = traceback.format_exc()
+            if event.attempts >= settings.STRIPE_EVENT_MAX_ATTEMPTS:
+                event.status = StripeEvent.DEAD
+            else:
+                event.next_attempt_at = timezone.now() + StripeEventInbox.backoff(
+                    event.attempts
+                )
+        else:
+            event.status = StripeEvent.PROCESSED
+            event.processed_at = timezone.now()
+            event.last_error = ""
+        event.save(
+            update_fields=[
+                "status",
+                "attempts",
+                "next_attempt_at",
+                "last_error",
+                "processed_at",
+            ]
+        )
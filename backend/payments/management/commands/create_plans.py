@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 
+from payments.catalog import bump_catalog_version
 from payments.models import Plan
 
 
@@ -58,6 +59,7 @@ class Command(BaseCommand):
             else:
                 self.stdout.write(self.style.WARNING(f"Updated plan: {plan.name}"))
 
+        bump_catalog_version()
         self.stdout.write(self.style.SUCCESS("Successfully created/updated all plans"))
 
         self.stdout.write(
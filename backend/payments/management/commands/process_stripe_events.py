@@ -0,0 +1,41 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from payments.inbox import StripeEventInbox
+
+
+class Command(BaseCommand):
+    help = "Process stored Stripe webhook events; run as many workers as needed"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Process the events that are due and exit",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=settings.STRIPE_EVENT_BATCH_SIZE
+        )
+        parser.add_argument(
+            "--coalesce",
+            action="store_true",
+            help="Apply each batch's subscription events in bulk, keeping only "
+            "the newest state per subscription (for billing-run bursts)",
+        )
+
+    def handle(self, *args, **options):
+        processed = 0
+        while True:
+            count = StripeEventInbox.process_batch(
+                options["batch_size"], coalesce=options["coalesce"]
+            )
+            processed += count
+            if count:
+                continue
+            if options["once"]:
+                break
+            time.sleep(settings.STRIPE_EVENT_POLL_INTERVAL)
+
+        self.stdout.write(f"Handled {processed} Stripe events")
@@ -0,0 +1,19 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from payments.rollups import Rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the finance rollup tables from payments and subscriptions"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--start", type=date.fromisoformat, help="First day (YYYY-MM-DD)"
+        )
+        parser.add_argument("--end", type=date.fromisoformat, help="Last day")
+
+    def handle(self, *args, **options):
+        rows = Rollups.rebuild(options["start"], options["end"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} daily rollup rows"))
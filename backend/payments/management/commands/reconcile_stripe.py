@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from payments.reconcile import Checkpoint, StripeReconciler
+
+
+class Command(BaseCommand):
+    help = "Repair local Stripe customers and subscriptions from the Stripe API"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report the rows that differ without writing anything",
+        )
+        parser.add_argument("--chunk-size", type=int, default=100)
+        parser.add_argument(
+            "--checkpoint",
+            help="JSON file recording progress; an interrupted run resumes from it",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Ignore an existing checkpoint and start from the beginning",
+        )
+
+    def handle(self, *args, **options):
+        checkpoint = Checkpoint(options["checkpoint"])
+        if options["restart"]:
+            checkpoint.clear()
+            checkpoint = Checkpoint(options["checkpoint"])
+
+        reconciler = StripeReconciler(
+            chunk_size=options["chunk_size"],
+            dry_run=options["dry_run"],
+            checkpoint=checkpoint,
+            report=self.stdout.write,
+        )
+        stats = reconciler.run()
+
+        for phase, counts in stats.items():
+            summary = ", ".join(f"{count} {name}" for name, count in counts.items())
+            self.stdout.write(self.style.SUCCESS(f"{phase}: {summary}"))
+        if options["dry_run"]:
+            self.stdout.write(self.style.WARNING("Dry run, nothing was written"))
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.5 on 2026-10-18 13:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+from core.db import AddIndexConcurrently, AddUniqueConstraintConcurrently
+
+
+class Migration(migrations.Migration):
+    # Indexes are built concurrently on PostgreSQL, so writes continue
+    atomic = False
+
+    dependencies = [
+        ("payments", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="payment",
+            index=models.Index(
+                fields=["user", "-created_at"], name="payment_user_created"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="subscription",
+            index=models.Index(
+                fields=["user", "status"], name="subscription_user_status"
+            ),
+        ),
+        AddUniqueConstraintConcurrently(
+            model_name="subscription",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("status__in", ("active", "trialing"))),
+                fields=("user",),
+                name="one_active_subscription_per_user",
+            ),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.5 on 2026-10-18 13:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("payments", "0003_stripeevent"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="subscription",
+            name="last_event_created",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.1.5 on 2026-10-18 13:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("payments", "0004_subscription_last_event_created"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="subscription",
+            name="canceled_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name="DailyRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("plan", models.CharField(blank=True, max_length=50)),
+                ("currency", models.CharField(max_length=3)),
+                (
+                    "revenue",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                ("payments", models.PositiveIntegerField(default=0)),
+                ("new_subscriptions", models.PositiveIntegerField(default=0)),
+                ("canceled_subscriptions", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("day", "plan", "currency"), name="daily_rollup_key"
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="PlanRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("plan", models.CharField(max_length=50)),
+                ("currency", models.CharField(max_length=3)),
+                ("active_subscriptions", models.IntegerField(default=0)),
+                (
+                    "mrr",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("plan", "currency"), name="plan_rollup_key"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.5 on 2026-10-18 13:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+from core.db import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # Indexes are built concurrently on PostgreSQL, so writes continue
+    atomic = False
+
+    dependencies = [
+        ("payments", "0005_rollups"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="payment",
+            index=models.Index(fields=["created_at"], name="payment_created"),
+        ),
+        AddIndexConcurrently(
+            model_name="subscription",
+            index=models.Index(fields=["created_at"], name="subscription_created"),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.utils import timezone
 
 User = get_user_model()
 
@@ -45,6 +46,8 @@ class Subscription(models.Model):
         ("incomplete_expired", "Incomplete Expired"),
         ("trialing", "Trialing"),
     ]
+    # Statuses that grant access to the plan
+    ACTIVE_STATUSES = ("active", "trialing")
 
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     stripe_subscription_id = models.CharField(max_length=255, unique=True)
@@ -53,9 +56,29 @@ class Subscription(models.Model):
     current_period_start = models.DateTimeField()
     current_period_end = models.DateTimeField()
     cancel_at_period_end = models.BooleanField(default=False)
+    # Stripe "created" time of the newest webhook event applied; older
+    # events arriving late are ignored
+    last_event_created = models.DateTimeField(null=True, blank=True)
+    canceled_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # StripeService.get_user_subscription, entitlements
+            models.Index(fields=["user", "status"], name="subscription_user_status"),
+            # Admin date_hierarchy drilldowns
+            models.Index(fields=["created_at"], name="subscription_created"),
+        ]
+        constraints = [
+            # At most one subscription in ACTIVE_STATUSES per user
+            models.UniqueConstraint(
+                fields=["user"],
+                condition=models.Q(status__in=("active", "trialing")),
+                name="one_active_subscription_per_user",
+            ),
+        ]
+
     def __str__(self):
         return f"{self.user.email} - {self.plan.name} ({self.status})"
 
@@ -87,7 +110,97 @@ class Payment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # A user's payments, newest first
+            models.Index(fields=["user", "-created_at"], name="payment_user_created"),
+            # Admin date_hierarchy drilldowns
+            models.Index(fields=["created_at"], name="payment_created"),
+        ]
+
     def __str__(self):
         return (
             f"Payment {self.stripe_payment_intent_id} - {self.amount} {self.currency}"
         )
+
+
+class DailyRollup(models.Model):
+    """
+    Per-day revenue and subscription flows, see payments.rollups.
+
+    ``plan`` is the plan name ("" for payments without a subscription) so the
+    history survives plan changes.
+    """
+
+    day = models.DateField()
+    plan = models.CharField(max_length=50, blank=True)
+    currency = models.CharField(max_length=3)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    payments = models.PositiveIntegerField(default=0)
+    new_subscriptions = models.PositiveIntegerField(default=0)
+    canceled_subscriptions = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "plan", "currency"], name="daily_rollup_key"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.plan or '-'} {self.currency}"
+
+
+class PlanRollup(models.Model):
+    """Current active subscriptions and MRR per plan, see payments.rollups"""
+
+    plan = models.CharField(max_length=50)
+    currency = models.CharField(max_length=3)
+    active_subscriptions = models.IntegerField(default=0)
+    mrr = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["plan", "currency"], name="plan_rollup_key"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.plan} {self.currency}"
+
+
+class StripeEvent(models.Model):
+    """Verified Stripe webhook event waiting to be (or already) processed"""
+
+    PENDING = "pending"
+    PROCESSED = "processed"
+    DEAD = "dead"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (PROCESSED, "Processed"),
+        (DEAD, "Dead"),
+    ]
+
+    stripe_event_id = models.CharField(max_length=255, unique=True)
+    type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Claim query of process_stripe_events
+            models.Index(
+                fields=["next_attempt_at"],
+                condition=models.Q(status="pending"),
+                name="stripe_event_pending",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.type} {self.stripe_event_id} ({self.status})"
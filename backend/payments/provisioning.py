@@ -0,0 +1,37 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+
+from .services import StripeService
+
+logger = logging.getLogger(__name__)
+User = get_user_model()
+
+# Provisioning is best effort: checkout still creates the customer itself
+# when it is missing
+executor = ThreadPoolExecutor(
+    max_workers=settings.STRIPE_PROVISIONING_WORKERS,
+    thread_name_prefix="stripe-provisioning",
+)
+
+
+def provision_customer(user_id: int) -> None:
+    """Create the Stripe customer of a new user; runs on the executor"""
+    try:
+        user = User.objects.filter(pk=user_id).first()
+        if user is not None:
+            StripeService.get_or_create_customer(user)
+    except Exception:
+        logger.exception("Provisioning the Stripe customer of user %s failed", user_id)
+    finally:
+        # Executor threads outlive requests; don't leak their connections
+        connection.close()
+
+
+def schedule_customer_provisioning(user_id: int) -> None:
+    """Provision the Stripe customer off the request path once committed"""
+    if settings.STRIPE_PROVISION_CUSTOMERS and settings.STRIPE_SECRET_KEY:
+        transaction.on_commit(lambda: executor.submit(provision_customer, user_id))
@@ -0,0 +1,278 @@
+import json
+from itertools import batched
+from pathlib import Path
+from typing import Any
+
+import stripe
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from .entitlements import entitlements
+from .models import Plan, StripeCustomer, Subscription
+
+User = get_user_model()
+
+SUBSCRIPTION_FIELDS = (
+    "user_id",
+    "plan_id",
+    "status",
+    "current_period_start",
+    "current_period_end",
+    "cancel_at_period_end",
+)
+
+
+class Checkpoint:
+    """
+    Progress of a reconciliation run, saved as JSON after every chunk.
+
+    Holds the last Stripe id written per phase (passed back to Stripe as
+    ``starting_after``) and the phases that are done. Without a path nothing
+    is persisted.
+    """
+
+    def __init__(self, path: str | None = None):
+        self.path = Path(path) if path else None
+        self.state = {"done": [], "last_id": {}}
+        if self.path and self.path.exists():
+            self.state = json.loads(self.path.read_text())
+
+    def is_done(self, phase: str) -> bool:
+        return phase in self.state["done"]
+
+    def last_id(self, phase: str) -> str | None:
+        return self.state["last_id"].get(phase)
+
+    def advance(self, phase: str, last_id: str) -> None:
+        self.state["last_id"][phase] = last_id
+        self._save()
+
+    def finish(self, phase: str) -> None:
+        self.state["done"].append(phase)
+        self._save()
+
+    def clear(self) -> None:
+        if self.path:
+            self.path.unlink(missing_ok=True)
+
+    def _save(self) -> None:
+        if self.path:
+            self.path.write_text(json.dumps(self.state))
+
+
+class StripeReconciler:
+    """
+    Repair StripeCustomer and Subscription rows from Stripe's own records.
+
+    Customers and then subscriptions are streamed page by page and handled
+    ``chunk_size`` at a time, so memory stays bounded. Each chunk
+    is compared with the local rows in one or two queries; only rows that are
+    missing or differ are reported (through ``report``) and upserted with
+    ``bulk_create(update_conflicts=True)``. Objects that cannot be tied to a
+    local user or plan are counted as skipped. Entitlements of users whose
+    subscription was written are invalidated.
+    """
+
+    def __init__(self, chunk_size=100, dry_run=False, checkpoint=None, report=print):
+        self.chunk_size = chunk_size
+        # Stripe returns at most 100 objects per page
+        self.page_size = min(chunk_size, 100)
+        self.dry_run = dry_run
+        self.checkpoint = checkpoint or Checkpoint()
+        self.report = report
+        self.stats = {}
+        self.plans = None  # stripe price id -> plan id
+
+    def run(self) -> dict:
+        for phase, resource, params, reconcile_chunk in (
+            ("customers", stripe.Customer, {}, self._reconcile_customers),
+            (
+                "subscriptions",
+                stripe.Subscription,
+                {"status": "all"},
+                self._reconcile_subscriptions,
+            ),
+        ):
+            self.stats[phase] = dict.fromkeys(
+                ("seen", "created", "updated", "unchanged", "skipped"), 0
+            )
+            if self.checkpoint.is_done(phase):
+                continue
+            starting_after = self.checkpoint.last_id(phase)
+            pages = self._list(resource, starting_after, **params)
+            for chunk in batched(pages, self.chunk_size):
+                # When the chunk's first page was requested from Stripe
+                fetched_at = chunk[0][0]
+                objects = [obj for _, obj in chunk]
+                self.stats[phase]["seen"] += len(objects)
+                reconcile_chunk(objects, fetched_at)
+                if not self.dry_run:
+                    self.checkpoint.advance(phase, objects[-1]["id"])
+            if not self.dry_run:
+                self.checkpoint.finish(phase)
+
+        if not self.dry_run:
+            self.checkpoint.clear()
+        return self.stats
+
+    def _list(self, resource, starting_after, **params):
+        """Yield ``(fetched_at, object)``, noting when each page was requested"""
+        while True:
+            if starting_after:
+                params["starting_after"] = starting_after
+            fetched_at = timezone.now()
+            page = resource.list(limit=self.page_size, **params)
+            for obj in page.data:
+                yield fetched_at, obj
+            if not page.has_more or not page.data:
+                return
+            starting_after = page.data[-1]["id"]
+
+    def _reconcile_customers(self, chunk, fetched_at) -> None:
+        stats = self.stats["customers"]
+        wanted = {}  # stripe id -> user id
+        for customer in chunk:
+            user_id = (customer.get("metadata") or {}).get("user_id")
+            if user_id:
+                wanted[customer["id"]] = int(user_id)
+            else:
+                stats["skipped"] += 1
+
+        users = set(
+            User.objects.filter(id__in=wanted.values()).values_list("id", flat=True)
+        )
+        existing = dict(
+            StripeCustomer.objects.filter(stripe_customer_id__in=wanted).values_list(
+                "stripe_customer_id", "user_id"
+            )
+        )
+
+        rows = []
+        for customer_id, user_id in wanted.items():
+            if user_id not in users:
+                stats["skipped"] += 1
+            elif customer_id not in existing:
+                self.report(f"customer {customer_id}: missing, user {user_id}")
+                stats["created"] += 1
+                rows.append(
+                    StripeCustomer(stripe_customer_id=customer_id, user_id=user_id)
+                )
+            elif existing[customer_id] != user_id:
+                self.report(
+                    f"customer {customer_id}: user {existing[customer_id]} -> {user_id}"
+                )
+                stats["updated"] += 1
+                rows.append(
+                    StripeCustomer(stripe_customer_id=customer_id, user_id=user_id)
+                )
+            else:
+                stats["unchanged"] += 1
+
+        if rows and not self.dry_run:
+            StripeCustomer.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=["stripe_customer_id"],
+                update_fields=["user", "updated_at"],
+            )
+
+    def _reconcile_subscriptions(self, chunk, fetched_at) -> None:
+        stats = self.stats["subscriptions"]
+        if self.plans is None:
+            self.plans = dict(Plan.objects.values_list("stripe_price_id", "id"))
+        customers = dict(
+            StripeCustomer.objects.filter(
+                stripe_customer_id__in={s["customer"] for s in chunk}
+            ).values_list("stripe_customer_id", "user_id")
+        )
+        existing = {
+            row["stripe_subscription_id"]: row
+            for row in Subscription.objects.filter(
+                stripe_subscription_id__in=[s["id"] for s in chunk]
+            ).values("stripe_subscription_id", *SUBSCRIPTION_FIELDS)
+        }
+
+        rows = []
+        user_ids = set()
+        for stripe_subscription in chunk:
+            wanted = self._map_subscription(stripe_subscription, customers, self.plans)
+            if wanted is None:
+                stats["skipped"] += 1
+                continue
+
+            subscription_id = stripe_subscription["id"]
+            current = existing.get(subscription_id)
+            if current is None:
+                self.report(f"subscription {subscription_id}: missing")
+                stats["created"] += 1
+            else:
+                changes = [
+                    f"{field} {current[field]} -> {wanted[field]}"
+                    for field in SUBSCRIPTION_FIELDS
+                    if current[field] != wanted[field]
+                ]
+                if not changes:
+                    stats["unchanged"] += 1
+                    continue
+                self.report(f"subscription {subscription_id}: {', '.join(changes)}")
+                stats["updated"] += 1
+                user_ids.add(current["user_id"])
+
+            user_ids.add(wanted["user_id"])
+            # Webhook events created before the page was read are now stale;
+            # later ones may be newer than what Stripe returned
+            rows.append(
+                Subscription(
+                    stripe_subscription_id=subscription_id,
+                    last_event_created=fetched_at,
+                    **wanted,
+                )
+            )
+
+        if rows and not self.dry_run:
+            Subscription.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=["stripe_subscription_id"],
+                update_fields=[
+                    field.removesuffix("_id") for field in SUBSCRIPTION_FIELDS
+                ]
+                + ["last_event_created", "updated_at"],
+            )
+            transaction.on_commit(lambda: entitlements.invalidate(user_ids))
+
+    @staticmethod
+    def _map_subscription(
+        stripe_subscription, customers: dict, plans: dict
+    ) -> dict[str, Any] | None:
+        """Local field values for a Stripe subscription, None if unresolvable"""
+        metadata = stripe_subscription.get("metadata") or {}
+        items = (stripe_subscription.get("items") or {}).get("data") or [{}]
+        item = items[0]
+
+        # The customers phase has already linked customers to users
+        user_id = customers.get(stripe_subscription["customer"])
+        plan_id = plans.get((item.get("price") or {}).get("id"))
+        if plan_id is None and metadata.get("plan_id", "").isdigit():
+            plan_id = int(metadata["plan_id"])
+            if plan_id not in plans.values():
+                plan_id = None
+        if not user_id or not plan_id:
+            return None
+
+        def period(key):
+            # Newer API versions only report billing periods per item
+            timestamp = stripe_subscription.get(key) or item.get(key)
+            return timezone.datetime.fromtimestamp(timestamp, tz=timezone.timezone.utc)
+
+        return {
+            "user_id": user_id,
+            "plan_id": plan_id,
+            "status": stripe_subscription["status"],
+            "current_period_start": period("current_period_start"),
+            "current_period_end": period("current_period_end"),
+            "cancel_at_period_end": stripe_subscription.get(
+                "cancel_at_period_end", False
+            ),
+        }
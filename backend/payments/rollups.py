@@ -0,0 +1,219 @@
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import date
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import DailyRollup, Payment, Plan, PlanRollup, Subscription
+
+
+class _Pending(threading.local):
+    def __init__(self):
+        # One {(model, key): deltas} per open ``Rollups.deferred()`` block
+        self.stack = []
+
+
+_pending = _Pending()
+
+
+class Rollups:
+    """
+    Finance metrics kept in DailyRollup and PlanRollup.
+
+    Payments and subscription changes increment the rollup rows as they are
+    recorded, so dashboards read a handful of rows instead of aggregating
+    Payment and Subscription. The increments use the same definitions as
+    ``rebuild``, which recomputes a date range from the source tables:
+
+    - revenue and payments: succeeded payments, by the day they were recorded;
+    - new_subscriptions: subscriptions by the day they were first seen;
+    - canceled_subscriptions: subscriptions by ``canceled_at``;
+    - active_subscriptions and mrr: subscriptions in ACTIVE_STATUSES now, at
+      their plan's price.
+
+    Writes that bypass StripeService (e.g. reconcile_stripe) are not
+    counted; run ``manage.py rebuild_rollups`` after them.
+
+    Inside ``deferred()`` the increments are summed in memory and written
+    when the block ends, so a long transaction locks the rollup rows only
+    at its very end.
+    """
+
+    @staticmethod
+    @contextmanager
+    def deferred():
+        """
+        Collect increments and apply them, sorted by row, when the outermost
+        block exits. Sorting makes concurrent batches lock the rows in the
+        same order. Increments of a block that raises are dropped, like the
+        writes of the savepoint around it.
+        """
+        _pending.stack.append(defaultdict(Counter))
+        try:
+            yield
+        except BaseException:
+            _pending.stack.pop()
+            raise
+        increments = _pending.stack.pop()
+        if _pending.stack:
+            for row, deltas in increments.items():
+                _pending.stack[-1][row].update(deltas)
+            return
+        for (model, key), deltas in sorted(
+            increments.items(), key=lambda item: (item[0][0]._meta.label, item[0][1])
+        ):
+            Rollups._apply(model, dict(key), deltas)
+
+    @staticmethod
+    def record_payment(payment: Payment, plan: str) -> None:
+        Rollups._increment(
+            DailyRollup,
+            day=timezone.localdate(payment.created_at),
+            plan=plan,
+            currency=payment.currency,
+            revenue=payment.amount,
+            payments=1,
+        )
+
+    @staticmethod
+    def record_subscriptions(changes: list[tuple[Subscription, str | None]]) -> None:
+        """
+        Count saved subscription changes, given as ``(subscription,
+        previous_status)`` pairs; the previous status is None for new rows.
+        """
+        changes = [(s, previous) for s, previous in changes if s.status != previous]
+        if not changes:
+            return
+
+        plans = Plan.objects.in_bulk({s.plan_id for s, _ in changes})
+        daily = defaultdict(Counter)
+        current = defaultdict(Counter)
+        for subscription, previous_status in changes:
+            plan = plans[subscription.plan_id]
+            if previous_status is None:
+                day = timezone.localdate(subscription.created_at)
+                daily[day, plan.name, plan.currency]["new_subscriptions"] += 1
+            if subscription.status == "canceled" and previous_status != "canceled":
+                day = timezone.localdate(subscription.canceled_at)
+                daily[day, plan.name, plan.currency]["canceled_subscriptions"] += 1
+
+            was_active = previous_status in Subscription.ACTIVE_STATUSES
+            is_active = subscription.status in Subscription.ACTIVE_STATUSES
+            if was_active != is_active:
+                sign = 1 if is_active else -1
+                current[plan.name, plan.currency]["active_subscriptions"] += sign
+                current[plan.name, plan.currency]["mrr"] += sign * plan.price
+
+        for (day, plan, currency), deltas in daily.items():
+            Rollups._increment(
+                DailyRollup, day=day, plan=plan, currency=currency, **deltas
+            )
+        for (plan, currency), deltas in current.items():
+            Rollups._increment(PlanRollup, plan=plan, currency=currency, **deltas)
+
+    @staticmethod
+    def _increment(model, **values) -> None:
+        key = {
+            field: values.pop(field)
+            for field in ("day", "plan", "currency")
+            if field in values
+        }
+        if _pending.stack:
+            _pending.stack[-1][model, tuple(key.items())].update(values)
+        else:
+            Rollups._apply(model, key, values)
+
+    @staticmethod
+    def _apply(model, key: dict, values: dict) -> None:
+        deltas = {field: delta for field, delta in values.items() if delta}
+        if not deltas:
+            return
+
+        updates = {field: F(field) + delta for field, delta in deltas.items()}
+        if model.objects.filter(**key).update(**updates):
+            return
+        try:
+            with transaction.atomic():
+                model.objects.create(**key, **deltas)
+        except IntegrityError:
+            # Created concurrently
+            model.objects.filter(**key).update(**updates)
+
+    @staticmethod
+    @transaction.atomic
+    def rebuild(start: date | None = None, end: date | None = None) -> int:
+        """
+        Recompute DailyRollup for ``start``..``end`` (inclusive, open-ended
+        when None) and all of PlanRollup; returns the number of daily rows.
+        """
+
+        def in_range(field):
+            condition = Q()
+            if start:
+                condition &= Q(**{f"{field}__date__gte": start})
+            if end:
+                condition &= Q(**{f"{field}__date__lte": end})
+            return condition
+
+        rows = defaultdict(Counter)
+        payments = (
+            Payment.objects.filter(in_range("created_at"), status="succeeded")
+            .annotate(
+                day=TruncDate("created_at"),
+                plan=Coalesce(F("subscription__plan__name"), Value("")),
+            )
+            .values("day", "plan", "currency")
+            .annotate(revenue=Sum("amount"), payments=Count("id"))
+        )
+        for row in payments:
+            key = (row["day"], row["plan"], row["currency"])
+            rows[key]["revenue"] += row["revenue"]
+            rows[key]["payments"] += row["payments"]
+
+        for field, counter in (
+            ("created_at", "new_subscriptions"),
+            ("canceled_at", "canceled_subscriptions"),
+        ):
+            subscriptions = (
+                Subscription.objects.filter(
+                    in_range(field), **{f"{field}__isnull": False}
+                )
+                .annotate(day=TruncDate(field))
+                .values("day", "plan__name", "plan__currency")
+                .annotate(count=Count("id"))
+            )
+            for row in subscriptions:
+                key = (row["day"], row["plan__name"], row["plan__currency"])
+                rows[key][counter] += row["count"]
+
+        daily = DailyRollup.objects.all()
+        if start:
+            daily = daily.filter(day__gte=start)
+        if end:
+            daily = daily.filter(day__lte=end)
+        daily.delete()
+        DailyRollup.objects.bulk_create(
+            DailyRollup(day=day, plan=plan, currency=currency, **values)
+            for (day, plan, currency), values in rows.items()
+        )
+
+        PlanRollup.objects.all().delete()
+        PlanRollup.objects.bulk_create(
+            PlanRollup(
+                plan=row["plan__name"],
+                currency=row["plan__currency"],
+                active_subscriptions=row["active_subscriptions"],
+                mrr=row["mrr"] or Decimal(0),
+            )
+            for row in Subscription.objects.filter(
+                status__in=Subscription.ACTIVE_STATUSES
+            )
+            .values("plan__name", "plan__currency")
+            .annotate(active_subscriptions=Count("id"), mrr=Sum("plan__price"))
+        )
+        return len(rows)
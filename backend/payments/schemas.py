@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import date, datetime
 from decimal import Decimal
 
 from ninja import Schema
@@ -57,6 +57,23 @@ class CustomerPortalResponseSchema(Schema):
     session_url: str
 
 
+class DailyRollupSchema(Schema):
+    day: date
+    plan: str
+    currency: str
+    revenue: Decimal
+    payments: int
+    new_subscriptions: int
+    canceled_subscriptions: int
+
+
+class PlanRollupSchema(Schema):
+    plan: str
+    currency: str
+    active_subscriptions: int
+    mrr: Decimal
+
+
 class WebhookEventSchema(Schema):
     """Schema for Stripe webhook events"""
 
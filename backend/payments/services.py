@@ -1,11 +1,23 @@
+import hashlib
+import ssl
+import time
+from datetime import datetime
+from decimal import Decimal
 from typing import Any
 
 import stripe
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
 from django.utils import timezone
 
-from .models import Plan, StripeCustomer, Subscription
+from core.http import http_client
+
+from .entitlements import entitlements
+from .models import Payment, Plan, StripeCustomer, Subscription
+from .rollups import Rollups
 
 User = get_user_model()
 
@@ -13,102 +25,504 @@ User = get_user_model()
 stripe.api_key = settings.STRIPE_SECRET_KEY
 
 
+class StripeAsyncClient(stripe.HTTPXClient):
+    """Stripe's httpx client, sending through the shared circuit breakers"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        verify = False
+        if self._verify_ssl_certs:
+            verify = ssl.create_default_context(cafile=stripe.ca_bundle_path)
+        # Replaces the plain httpx.AsyncClient the SDK created
+        self._client_async = http_client.async_client(verify=verify)
+
+
+# Async routes await Stripe through one shared httpx client. httpx is a
+# dependency; should it be missing anyway, their calls run in worker threads.
+# An open circuit surfaces as a retryable APIConnectionError here; the
+# retries are rejected without touching the network.
+try:
+    stripe_async_client = StripeAsyncClient(timeout=settings.HTTP_CLIENT_TIMEOUT)
+except ImportError:
+    stripe_async_client = None
+# Route Stripe calls through the shared pooled, circuit-broken session. An
+# open circuit is not a ConnectionError, so Stripe does not retry it.
+stripe.default_http_client = stripe.RequestsClient(
+    session=http_client.session,
+    timeout=settings.HTTP_CLIENT_TIMEOUT,
+    async_fallback_client=stripe_async_client,
+)
+
+
+async def call_stripe(resource, method: str, *args, **params):
+    """
+    Await ``resource.method(*args, **params)``, e.g. ``stripe.Customer``
+    and ``"create"``, without blocking the event loop.
+
+    Uses the SDK's ``<method>_async`` variant on the shared httpx client.
+    Only if httpx cannot be imported does the sync method run in a worker
+    thread instead.
+    """
+    if stripe_async_client is None:
+        return await sync_to_async(getattr(resource, method), thread_sensitive=False)(
+            *args, **params
+        )
+    return await getattr(resource, f"{method}_async")(*args, **params)
+
+
 class StripeService:
     """Service class for handling Stripe operations"""
 
+    SUBSCRIPTION_EVENTS = (
+        "customer.subscription.created",
+        "customer.subscription.updated",
+        "customer.subscription.deleted",
+    )
+
     @staticmethod
     def get_or_create_customer(user: User) -> StripeCustomer:
-        """Get or create a Stripe customer for the user"""
+        """
+        Get or create a Stripe customer for the user.
+
+        Goes through the ``user.stripecustomer`` relation, which Django caches
+        on the instance (misses included), so a request looks it up once.
+        """
         try:
-            stripe_customer = StripeCustomer.objects.get(user=user)
-            return stripe_customer
+            return user.stripecustomer
         except StripeCustomer.DoesNotExist:
-            # Create customer in Stripe
-            customer = stripe.Customer.create(
-                email=user.email,
-                name=f"{user.first_name} {user.last_name}",
-                metadata={
-                    "user_id": user.id,
-                },
-            )
+            # Create customer in Stripe. The idempotency key makes a checkout
+            # racing the sign-up provisioning get the same customer back.
+            customer = stripe.Customer.create(**StripeService._customer_params(user))
+
+            # Create local customer record; this also fills user.stripecustomer
+            try:
+                with transaction.atomic():
+                    return StripeCustomer.objects.create(
+                        user=user, stripe_customer_id=customer.id
+                    )
+            except IntegrityError:
+                return StripeCustomer.objects.get(user=user)
 
-            # Create local customer record
-            stripe_customer = StripeCustomer.objects.create(
-                user=user, stripe_customer_id=customer.id
+    @staticmethod
+    async def aget_or_create_customer(user: User) -> StripeCustomer:
+        """Async variant of ``get_or_create_customer``"""
+        try:
+            return await StripeCustomer.objects.aget(user=user)
+        except StripeCustomer.DoesNotExist:
+            customer = await call_stripe(
+                stripe.Customer, "create", **StripeService._customer_params(user)
             )
+            try:
+                return await StripeCustomer.objects.acreate(
+                    user=user, stripe_customer_id=customer.id
+                )
+            except IntegrityError:
+                return await StripeCustomer.objects.aget(user=user)
+
+    @staticmethod
+    def _customer_params(user: User) -> dict[str, Any]:
+        return {
+            "email": user.email,
+            "name": f"{user.first_name} {user.last_name}",
+            "metadata": {
+                "user_id": user.id,
+            },
+            "idempotency_key": f"customer-{user.id}",
+        }
+
+    @staticmethod
+    def checkout_cache_key(user_id, plan_id, success_url: str, cancel_url: str) -> str:
+        digest = hashlib.sha256(
+            f"{user_id}\n{plan_id}\n{success_url}\n{cancel_url}".encode()
+        ).hexdigest()
+        return f"payments:checkout:{digest}"
+
+    @staticmethod
+    def get_open_checkout_session(
+        user: User, plan_id: int, success_url: str, cancel_url: str
+    ) -> dict[str, Any] | None:
+        """
+        The session a previous identical checkout request created, if still open.
+
+        The cache entry is dropped when the session completes, but that runs
+        in the event worker and may not reach this process. So an entry older
+        than STRIPE_CHECKOUT_VERIFY_AFTER seconds is checked with Stripe
+        before it is handed out again.
+        """
+        key = StripeService.checkout_cache_key(
+            user.id, plan_id, success_url, cancel_url
+        )
+        entry = cache.get(key)
+        if entry is None:
+            return None
+        if StripeService._needs_verification(entry):
+            try:
+                session = stripe.checkout.Session.retrieve(entry["session_id"])
+            except stripe.StripeError:
+                return None
+            if session.status != "open":
+                cache.delete(key)
+                return None
+        return StripeService._session_data(entry)
+
+    @staticmethod
+    async def aget_open_checkout_session(
+        user: User, plan_id: int, success_url: str, cancel_url: str
+    ) -> dict[str, Any] | None:
+        """Async variant of ``get_open_checkout_session``"""
+        key = StripeService.checkout_cache_key(
+            user.id, plan_id, success_url, cancel_url
+        )
+        entry = await cache.aget(key)
+        if entry is None:
+            return None
+        if StripeService._needs_verification(entry):
+            try:
+                session = await call_stripe(
+                    stripe.checkout.Session, "retrieve", entry["session_id"]
+                )
+            except stripe.StripeError:
+                return None
+            if session.status != "open":
+                await cache.adelete(key)
+                return None
+        return StripeService._session_data(entry)
 
-            return stripe_customer
+    @staticmethod
+    def _needs_verification(entry: dict[str, Any]) -> bool:
+        age = time.time() - entry.get("cached_at", 0)
+        return age > settings.STRIPE_CHECKOUT_VERIFY_AFTER
+
+    @staticmethod
+    def _session_data(entry: dict[str, Any]) -> dict[str, Any]:
+        return {"session_id": entry["session_id"], "session_url": entry["session_url"]}
 
     @staticmethod
     def create_checkout_session(
         user: User, plan: Plan, success_url: str, cancel_url: str
     ) -> dict[str, Any]:
-        """Create a Stripe checkout session for subscription"""
+        """
+        Create a Stripe checkout session for subscription.
+
+        The session is kept open for STRIPE_CHECKOUT_SESSION_TTL seconds and
+        cached until shortly before then, so that repeated requests (double
+        clicks, retries) get it back from ``get_open_checkout_session``.
+        """
         stripe_customer = StripeService.get_or_create_customer(user)
 
         session = stripe.checkout.Session.create(
-            customer=stripe_customer.stripe_customer_id,
-            payment_method_types=["card"],
-            line_items=[
+            **StripeService._checkout_params(
+                stripe_customer, user, plan, success_url, cancel_url
+            )
+        )
+
+        session_data = {
+            "session_id": session.id,
+            "session_url": session.url,
+        }
+        cache.set(
+            StripeService.checkout_cache_key(user.id, plan.id, success_url, cancel_url),
+            {**session_data, "cached_at": time.time()},
+            # Never hand out a session that is about to expire
+            timeout=settings.STRIPE_CHECKOUT_SESSION_TTL - 300,
+        )
+        return session_data
+
+    @staticmethod
+    async def acreate_checkout_session(
+        user: User, plan: Plan, success_url: str, cancel_url: str
+    ) -> dict[str, Any]:
+        """Async variant of ``create_checkout_session``"""
+        stripe_customer = await StripeService.aget_or_create_customer(user)
+
+        session = await call_stripe(
+            stripe.checkout.Session,
+            "create",
+            **StripeService._checkout_params(
+                stripe_customer, user, plan, success_url, cancel_url
+            ),
+        )
+
+        session_data = {
+            "session_id": session.id,
+            "session_url": session.url,
+        }
+        await cache.aset(
+            StripeService.checkout_cache_key(user.id, plan.id, success_url, cancel_url),
+            {**session_data, "cached_at": time.time()},
+            timeout=settings.STRIPE_CHECKOUT_SESSION_TTL - 300,
+        )
+        return session_data
+
+    @staticmethod
+    def _checkout_params(
+        stripe_customer: StripeCustomer,
+        user: User,
+        plan: Plan,
+        success_url: str,
+        cancel_url: str,
+    ) -> dict[str, Any]:
+        return {
+            "customer": stripe_customer.stripe_customer_id,
+            "payment_method_types": ["card"],
+            "line_items": [
                 {
                     "price": plan.stripe_price_id,
                     "quantity": 1,
                 }
             ],
-            mode="subscription",
-            success_url=success_url,
-            cancel_url=cancel_url,
-            metadata={
+            "mode": "subscription",
+            "success_url": success_url,
+            "cancel_url": cancel_url,
+            "expires_at": int(time.time()) + settings.STRIPE_CHECKOUT_SESSION_TTL,
+            "metadata": {
                 "user_id": user.id,
                 "plan_id": plan.id,
             },
-        )
-
-        return {
-            "session_id": session.id,
-            "session_url": session.url,
         }
 
+    @staticmethod
+    def handle_checkout_session_completed(
+        session: dict[str, Any], event_created: datetime | None = None
+    ) -> None:
+        """Handle checkout.session.completed webhook: stop reusing the session"""
+        metadata = session.get("metadata") or {}
+        if "user_id" not in metadata or "plan_id" not in metadata:
+            return  # Not created by create_checkout_session
+        cache.delete(
+            StripeService.checkout_cache_key(
+                metadata["user_id"],
+                metadata["plan_id"],
+                session.get("success_url"),
+                session.get("cancel_url"),
+            )
+        )
+
     @staticmethod
     def handle_subscription_created(
-        stripe_subscription: dict[str, Any],
+        stripe_subscription: dict[str, Any], event_created: datetime | None = None
     ) -> Subscription:
         """Handle subscription.created webhook"""
-        user_id = stripe_subscription["metadata"].get("user_id")
-        plan_id = stripe_subscription["metadata"].get("plan_id")
-
-        if not user_id or not plan_id:
-            raise ValueError("Missing user_id or plan_id in metadata")
-
-        user = User.objects.get(id=user_id)
-        plan = Plan.objects.get(id=plan_id)
-
-        subscription = Subscription.objects.create(
-            user=user,
-            stripe_subscription_id=stripe_subscription["id"],
-            plan=plan,
-            status=stripe_subscription["status"],
-            current_period_start=timezone.datetime.fromtimestamp(
-                stripe_subscription["current_period_start"], tz=timezone.timezone.utc
-            ),
-            current_period_end=timezone.datetime.fromtimestamp(
-                stripe_subscription["current_period_end"], tz=timezone.timezone.utc
-            ),
-            cancel_at_period_end=stripe_subscription.get("cancel_at_period_end", False),
+        return StripeService.sync_subscription(stripe_subscription, event_created)
+
+    @staticmethod
+    def handle_subscription_updated(
+        stripe_subscription: dict[str, Any], event_created: datetime | None = None
+    ) -> Subscription:
+        """Handle subscription.updated webhook"""
+        return StripeService.sync_subscription(stripe_subscription, event_created)
+
+    @staticmethod
+    def handle_subscription_deleted(
+        stripe_subscription: dict[str, Any], event_created: datetime | None = None
+    ) -> Subscription:
+        """Handle subscription.deleted webhook"""
+        return StripeService.sync_subscription(
+            stripe_subscription, event_created, status="canceled"
         )
 
-        return subscription
+    @staticmethod
+    @transaction.atomic
+    def handle_invoice_payment_succeeded(
+        invoice: dict[str, Any], event_created: datetime | None = None
+    ) -> Payment:
+        """Handle invoice.payment_succeeded webhook: record the payment"""
+        customer = StripeCustomer.objects.filter(
+            stripe_customer_id=invoice["customer"]
+        ).first()
+        if customer is None:
+            raise ValueError(f"Unknown customer {invoice['customer']}")
+
+        # Newer API versions moved the subscription under "parent"
+        subscription_id = invoice.get("subscription") or (
+            ((invoice.get("parent") or {}).get("subscription_details") or {}).get(
+                "subscription"
+            )
+        )
+        subscription = None
+        if subscription_id:
+            subscription = (
+                Subscription.objects.select_related("plan")
+                .filter(stripe_subscription_id=subscription_id)
+                .first()
+            )
+
+        payment, created = Payment.objects.get_or_create(
+            stripe_payment_intent_id=invoice.get("payment_intent") or invoice["id"],
+            defaults={
+                "user_id": customer.user_id,
+                "subscription": subscription,
+                "amount": Decimal(invoice["amount_paid"]) / 100,
+                "currency": invoice["currency"].upper(),
+                "status": "succeeded",
+            },
+        )
+        if created:
+            Rollups.record_payment(
+                payment, subscription.plan.name if subscription else ""
+            )
+        return payment
 
     @staticmethod
-    def handle_subscription_updated(
+    @transaction.atomic
+    def sync_subscription(
         stripe_subscription: dict[str, Any],
+        event_created: datetime | None = None,
+        status: str | None = None,
     ) -> Subscription:
-        """Handle subscription.updated webhook"""
-        subscription = Subscription.objects.get(
-            stripe_subscription_id=stripe_subscription["id"]
+        """
+        Create or update the local copy of a Stripe subscription.
+
+        Stripe retries and reorders events, so any of them may arrive first.
+        ``event_created`` is the event's Stripe ``created`` time. An event
+        older than the last one applied to the subscription changes nothing.
+        """
+        subscription = (
+            Subscription.objects.select_for_update()
+            .filter(stripe_subscription_id=stripe_subscription["id"])
+            .first()
+        )
+        if subscription is None:
+            user_id = stripe_subscription["metadata"].get("user_id")
+            plan_id = stripe_subscription["metadata"].get("plan_id")
+            if not user_id or not plan_id:
+                raise ValueError("Missing user_id or plan_id in metadata")
+
+            subscription = Subscription(
+                user=User.objects.get(id=user_id),
+                plan=Plan.objects.get(id=plan_id),
+                stripe_subscription_id=stripe_subscription["id"],
+            )
+        elif (
+            event_created
+            and subscription.last_event_created
+            and event_created < subscription.last_event_created
+        ):
+            return subscription
+
+        previous_status = subscription.status if subscription.pk else None
+        StripeService._apply_state(
+            subscription, stripe_subscription, event_created, status
+        )
+        subscription.save()
+
+        Rollups.record_subscriptions([(subscription, previous_status)])
+        StripeService.refresh_entitlements(subscription)
+        return subscription
+
+    @staticmethod
+    @transaction.atomic
+    def sync_subscriptions(events: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """
+        Apply a burst of subscription events with a handful of bulk queries.
+
+        Events are coalesced per subscription: only the newest one is applied
+        (on a tie, the later one in ``events``), with the same staleness rule
+        as ``sync_subscription``. Returns the events that could not be
+        applied because a new subscription's user or plan is missing; the
+        caller should hand those to ``handle_event`` one by one.
+        """
+        latest = {}
+        for event in events:
+            subscription_id = event["data"]["object"]["id"]
+            current = latest.get(subscription_id)
+            if current is None or event["created"] >= current["created"]:
+                latest[subscription_id] = event
+
+        existing = Subscription.objects.select_for_update().in_bulk(
+            list(latest), field_name="stripe_subscription_id"
+        )
+
+        owners = {}  # subscription id -> (user id, plan id) of new subscriptions
+        for subscription_id, event in latest.items():
+            if subscription_id not in existing:
+                metadata = event["data"]["object"]["metadata"]
+                if metadata.get("user_id") and metadata.get("plan_id"):
+                    owners[subscription_id] = (
+                        int(metadata["user_id"]),
+                        int(metadata["plan_id"]),
+                    )
+        user_ids = set(
+            User.objects.filter(
+                id__in={user for user, _ in owners.values()}
+            ).values_list("id", flat=True)
+        )
+        plan_ids = set(
+            Plan.objects.filter(
+                id__in={plan for _, plan in owners.values()}
+            ).values_list("id", flat=True)
+        )
+
+        now = timezone.now()
+        unapplied, to_create, to_update = [], [], []
+        previous_status = {}
+        for subscription_id, event in latest.items():
+            event_created = timezone.datetime.fromtimestamp(
+                event["created"], tz=timezone.timezone.utc
+            )
+            subscription = existing.get(subscription_id)
+            if subscription is None:
+                user_id, plan_id = owners.get(subscription_id, (None, None))
+                if user_id not in user_ids or plan_id not in plan_ids:
+                    unapplied.append(event)
+                    continue
+                subscription = Subscription(
+                    user_id=user_id,
+                    plan_id=plan_id,
+                    stripe_subscription_id=subscription_id,
+                )
+                to_create.append(subscription)
+            elif (
+                subscription.last_event_created
+                and event_created < subscription.last_event_created
+            ):
+                continue
+            else:
+                previous_status[subscription_id] = subscription.status
+                subscription.updated_at = now
+                to_update.append(subscription)
+
+            StripeService._apply_state(
+                subscription,
+                event["data"]["object"],
+                event_created,
+                "canceled"
+                if event["type"] == "customer.subscription.deleted"
+                else None,
+            )
+
+        Subscription.objects.bulk_create(to_create)
+        Subscription.objects.bulk_update(
+            to_update,
+            [
+                "status",
+                "current_period_start",
+                "current_period_end",
+                "cancel_at_period_end",
+                "last_event_created",
+                "canceled_at",
+                "updated_at",
+            ],
         )
+        Rollups.record_subscriptions(
+            [
+                (s, previous_status.get(s.stripe_subscription_id))
+                for s in to_create + to_update
+            ]
+        )
+
+        changed = {subscription.user_id for subscription in to_create + to_update}
+        transaction.on_commit(lambda: entitlements.invalidate(changed))
+        return unapplied
 
-        subscription.status = stripe_subscription["status"]
+    @staticmethod
+    def _apply_state(
+        subscription: Subscription,
+        stripe_subscription: dict[str, Any],
+        event_created: datetime | None,
+        status: str | None,
+    ) -> None:
+        subscription.status = status or stripe_subscription["status"]
         subscription.current_period_start = timezone.datetime.fromtimestamp(
             stripe_subscription["current_period_start"], tz=timezone.timezone.utc
         )
@@ -118,23 +532,38 @@ class StripeService:
         subscription.cancel_at_period_end = stripe_subscription.get(
             "cancel_at_period_end", False
         )
-        subscription.save()
-
-        return subscription
+        if event_created:
+            subscription.last_event_created = event_created
+        if subscription.status == "canceled" and subscription.canceled_at is None:
+            canceled_at = stripe_subscription.get("canceled_at")
+            subscription.canceled_at = (
+                timezone.datetime.fromtimestamp(canceled_at, tz=timezone.timezone.utc)
+                if canceled_at
+                else timezone.now()
+            )
 
     @staticmethod
-    def handle_subscription_deleted(
-        stripe_subscription: dict[str, Any],
-    ) -> Subscription:
-        """Handle subscription.deleted webhook"""
-        subscription = Subscription.objects.get(
-            stripe_subscription_id=stripe_subscription["id"]
-        )
-
-        subscription.status = "canceled"
-        subscription.save()
+    def handle_event(event: dict[str, Any]) -> None:
+        """Apply a verified webhook event; types without a handler are ignored"""
+        handler = {
+            "checkout.session.completed": StripeService.handle_checkout_session_completed,
+            "customer.subscription.created": StripeService.handle_subscription_created,
+            "customer.subscription.updated": StripeService.handle_subscription_updated,
+            "customer.subscription.deleted": StripeService.handle_subscription_deleted,
+            "invoice.payment_succeeded": StripeService.handle_invoice_payment_succeeded,
+        }.get(event["type"])
+        if handler is not None:
+            handler(
+                event["data"]["object"],
+                timezone.datetime.fromtimestamp(
+                    event["created"], tz=timezone.timezone.utc
+                ),
+            )
 
-        return subscription
+    @staticmethod
+    def refresh_entitlements(subscription: Subscription) -> None:
+        """Recompute the user's cached entitlements once the change is committed"""
+        transaction.on_commit(lambda: entitlements.refresh(subscription.user_id))
 
     @staticmethod
     def cancel_subscription(user: User, subscription_id: str) -> dict[str, Any]:
@@ -165,14 +594,65 @@ class StripeService:
             }
 
     @staticmethod
-    def get_user_subscription(user: User) -> Subscription:
-        """Get user's current active subscription"""
+    async def acancel_subscription(user: User, subscription_id: str) -> dict[str, Any]:
+        """Async variant of ``cancel_subscription``"""
         try:
-            return Subscription.objects.get(
-                user=user, status__in=["active", "trialing"]
+            subscription = await Subscription.objects.aget(
+                user=user, stripe_subscription_id=subscription_id
+            )
+
+            await call_stripe(
+                stripe.Subscription,
+                "modify",
+                subscription_id,
+                cancel_at_period_end=True,
             )
+
+            subscription.cancel_at_period_end = True
+            await subscription.asave()
+
+            return {
+                "success": True,
+                "message": "Subscription will be canceled at the end of the current period",
+            }
+
         except Subscription.DoesNotExist:
-            return None
+            return {"success": False, "message": "Subscription not found"}
+        except Exception as e:
+            return {
+                "success": False,
+                "message": f"Error canceling subscription: {str(e)}",
+            }
+
+    @staticmethod
+    def get_user_subscription(user: User) -> Subscription | None:
+        """
+        Get user's current active subscription, with its plan.
+
+        The result is memoised on ``user``. Authentication hands every request
+        its own user instance, so this is one query per request however many
+        times it is called.
+        """
+        if not hasattr(user, "_active_subscription"):
+            try:
+                user._active_subscription = Subscription.objects.select_related(
+                    "plan"
+                ).get(user=user, status__in=Subscription.ACTIVE_STATUSES)
+            except Subscription.DoesNotExist:
+                user._active_subscription = None
+        return user._active_subscription
+
+    @staticmethod
+    async def aget_user_subscription(user: User) -> Subscription | None:
+        """Async variant of ``get_user_subscription``, sharing its memo"""
+        if not hasattr(user, "_active_subscription"):
+            try:
+                user._active_subscription = await Subscription.objects.select_related(
+                    "plan"
+                ).aget(user=user, status__in=Subscription.ACTIVE_STATUSES)
+            except Subscription.DoesNotExist:
+                user._active_subscription = None
+        return user._active_subscription
 
     @staticmethod
     def create_customer_portal_session(user: User, return_url: str) -> dict[str, Any]:
@@ -185,3 +665,19 @@ class StripeService:
         )
 
         return {"session_url": session.url}
+
+    @staticmethod
+    async def acreate_customer_portal_session(
+        user: User, return_url: str
+    ) -> dict[str, Any]:
+        """Async variant of ``create_customer_portal_session``"""
+        stripe_customer = await StripeService.aget_or_create_customer(user)
+
+        session = await call_stripe(
+            stripe.billing_portal.Session,
+            "create",
+            customer=stripe_customer.stripe_customer_id,
+            return_url=return_url,
+        )
+
+        return {"session_url": session.url}
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .catalog import bump_catalog_version
+from .models import Plan
+from .provisioning import schedule_customer_provisioning
+
+
+@receiver([post_save, post_delete], sender=Plan)
+def invalidate_plan_catalog(sender, **kwargs):
+    # After commit, so no process can rebuild from the old rows
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def provision_stripe_customer(sender, instance, created, **kwargs):
+    # Every sign-up path (/auth/register, /auth/social, admin) saves a new user
+    if created:
+        schedule_customer_provisioning(instance.pk)
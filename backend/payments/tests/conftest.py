@@ -0,0 +1,47 @@
+from types import SimpleNamespace
+
+import pytest
+import stripe
+
+
+@pytest.fixture
+def stripe_calls(monkeypatch):
+    """Record Stripe calls (sync and ``_async``) instead of making them"""
+    calls = []
+
+    def record(kind, result):
+        def call(*args, **kwargs):
+            calls.append((kind, kwargs))
+            return result
+
+        async def call_async(*args, **kwargs):
+            return call(*args, **kwargs)
+
+        return call, call_async
+
+    for resource, method, kind, result in (
+        (
+            stripe.checkout.Session,
+            "create",
+            "session",
+            SimpleNamespace(id="cs_1", url="https://checkout.stripe.com/cs_1"),
+        ),
+        (
+            stripe.checkout.Session,
+            "retrieve",
+            "retrieve",
+            SimpleNamespace(id="cs_1", status="open"),
+        ),
+        (stripe.Customer, "create", "customer", SimpleNamespace(id="cus_new")),
+        (
+            stripe.billing_portal.Session,
+            "create",
+            "portal",
+            SimpleNamespace(url="https://billing.stripe.com/p_1"),
+        ),
+        (stripe.Subscription, "modify", "modify", SimpleNamespace()),
+    ):
+        call, call_async = record(kind, result)
+        monkeypatch.setattr(resource, method, call)
+        monkeypatch.setattr(resource, f"{method}_async", call_async)
+    return calls
@@ -0,0 +1,51 @@
+from datetime import timedelta
+
+import factory
+from django.utils import timezone
+
+from payments.models import Payment, Plan, StripeCustomer, Subscription
+from users.tests.factories import UserAccountFactory
+
+
+class PlanFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Plan
+        django_get_or_create = ("name",)
+
+    name = "pro"
+    stripe_price_id = factory.LazyAttribute(lambda plan: f"price_{plan.name}")
+    price = "9.99"
+    description = factory.LazyAttribute(lambda plan: f"{plan.name} plan")
+    features = factory.LazyFunction(lambda: ["API access"])
+
+
+class StripeCustomerFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = StripeCustomer
+
+    user = factory.SubFactory(UserAccountFactory)
+    stripe_customer_id = factory.Sequence(lambda n: f"cus_{n}")
+
+
+class SubscriptionFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Subscription
+
+    user = factory.SubFactory(UserAccountFactory)
+    plan = factory.SubFactory(PlanFactory)
+    stripe_subscription_id = factory.Sequence(lambda n: f"sub_{n}")
+    status = "active"
+    current_period_start = factory.LazyFunction(timezone.now)
+    current_period_end = factory.LazyAttribute(
+        lambda sub: sub.current_period_start + timedelta(days=30)
+    )
+
+
+class PaymentFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Payment
+
+    user = factory.SubFactory(UserAccountFactory)
+    stripe_payment_intent_id = factory.Sequence(lambda n: f"pi_{n}")
+    amount = "9.99"
+    status = "succeeded"
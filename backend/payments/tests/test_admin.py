@@ -0,0 +1,121 @@
+import pytest
+from django.contrib import admin
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from payments.admin import EstimatedCountPaginator
+from payments.models import Payment
+
+from .factories import PaymentFactory, SubscriptionFactory
+
+CHANGELIST = "/admin/payments/payment/"
+
+
+@pytest.fixture(autouse=True)
+def static_storage(settings):
+    # No collectstatic manifest in tests
+    settings.STORAGES = {
+        **settings.STORAGES,
+        "staticfiles": {
+            "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"
+        },
+    }
+
+
+@pytest.fixture
+def per_page(monkeypatch):
+    monkeypatch.setattr(admin.site._registry[Payment], "list_per_page", 2)
+
+
+def listed(response) -> list[str]:
+    return [
+        payment.stripe_payment_intent_id
+        for payment in response.context["cl"].result_list
+    ]
+
+
+@pytest.mark.django_db
+class TestLargeTableAdmin:
+    def test_query_count_does_not_grow_with_rows(self, admin_client):
+        PaymentFactory()
+        SubscriptionFactory()
+        with CaptureQueriesContext(connection) as one_row:
+            admin_client.get(CHANGELIST)
+            admin_client.get("/admin/payments/subscription/")
+
+        PaymentFactory.create_batch(5)
+        SubscriptionFactory.create_batch(5)
+        with CaptureQueriesContext(connection) as more_rows:
+            admin_client.get(CHANGELIST)
+            admin_client.get("/admin/payments/subscription/")
+
+        assert len(more_rows) == len(one_row)
+
+    def test_keyset_pages(self, admin_client, per_page):
+        payments = PaymentFactory.create_batch(5)
+        ids = [p.stripe_payment_intent_id for p in reversed(payments)]
+
+        first = admin_client.get(CHANGELIST)
+        cl = first.context["cl"]
+        second = admin_client.get(CHANGELIST + cl.next_page_url())
+        third = admin_client.get(CHANGELIST + second.context["cl"].next_page_url())
+
+        assert listed(first) == ids[:2]
+        assert listed(second) == ids[2:4]
+        assert listed(third) == ids[4:]
+        assert third.context["cl"].next_cursor is None
+        assert b"Next page" in first.content
+        assert b"First page" in third.content
+
+    def test_filter_links_start_from_the_first_page(self, admin_client, per_page):
+        payments = PaymentFactory.create_batch(3)
+
+        response = admin_client.get(f"{CHANGELIST}?after={payments[-1].pk}")
+        cl = response.context["cl"]
+
+        assert "after" not in cl.get_query_string({"status__exact": "failed"})
+
+    def test_sorting_by_a_column_uses_numbered_pages(self, admin_client, per_page):
+        PaymentFactory.create_batch(3)
+
+        response = admin_client.get(f"{CHANGELIST}?o=2&p=2")
+
+        assert response.context["cl"].keyset_pagination is False
+        assert len(listed(response)) == 1
+
+    def test_invalid_cursor_shows_no_rows(self, admin_client):
+        PaymentFactory()
+
+        response = admin_client.get(f"{CHANGELIST}?after=abc")
+
+        assert response.status_code == 200
+        assert listed(response) == []
+
+
+@pytest.mark.django_db
+class TestEstimatedCountPaginator:
+    def test_exact_count_below_threshold(self, monkeypatch):
+        PaymentFactory.create_batch(3)
+        monkeypatch.setattr(EstimatedCountPaginator, "estimated_count", lambda self: 5)
+
+        assert EstimatedCountPaginator(Payment.objects.order_by("pk"), 2).count == 3
+
+    def test_estimate_above_threshold(
+        self, settings, monkeypatch, django_assert_num_queries
+    ):
+        settings.ADMIN_ESTIMATED_COUNT_THRESHOLD = 1000
+        monkeypatch.setattr(
+            EstimatedCountPaginator, "estimated_count", lambda self: 2_000_000
+        )
+
+        with django_assert_num_queries(0):
+            paginator = EstimatedCountPaginator(Payment.objects.order_by("pk"), 100)
+            assert paginator.count == 2_000_000
+
+    def test_no_estimate_outside_postgres(self):
+        if connection.vendor == "postgresql":
+            pytest.skip("SQLite and other backends only")
+
+        paginator = EstimatedCountPaginator(Payment.objects.order_by("pk"), 100)
+
+        assert paginator.estimated_count() is None
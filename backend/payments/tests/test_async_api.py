@@ -0,0 +1,159 @@
+import threading
+
+import pytest
+import stripe
+from asgiref.sync import sync_to_async
+from ninja_extra.testing import TestAsyncClient
+
+from payments import services
+from payments.api import AsyncPaymentsController
+from payments.models import StripeCustomer, Subscription
+from payments.services import call_stripe
+from users.authentication import token_cache, user_cache
+from users.services import SocialAuthService
+from users.tests.factories import UserAccountFactory
+
+from .factories import PlanFactory, StripeCustomerFactory, SubscriptionFactory
+
+CHECKOUT = {
+    "success_url": "https://example.com/success",
+    "cancel_url": "https://example.com/cancel",
+}
+
+
+@pytest.fixture(autouse=True)
+def clear_auth_caches():
+    token_cache.clear()
+    user_cache.clear()
+
+
+def auth_header(user):
+    access_token = SocialAuthService.generate_jwt_tokens(user)["access"]
+    return {"Authorization": f"Bearer {access_token}"}
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+class TestAsyncPaymentsController:
+    async def test_checkout(self, stripe_calls):
+        client = TestAsyncClient(AsyncPaymentsController)
+        plan = await sync_to_async(PlanFactory)()
+        user = await sync_to_async(UserAccountFactory)()
+        data = {"plan_id": plan.id, **CHECKOUT}
+
+        first = await client.post("/checkout", json=data, headers=auth_header(user))
+        second = await client.post("/checkout", json=data, headers=auth_header(user))
+
+        assert first.status_code == 200
+        assert (
+            first.json()
+            == second.json()
+            == {
+                "session_id": "cs_1",
+                "session_url": "https://checkout.stripe.com/cs_1",
+            }
+        )
+        assert [kind for kind, _ in stripe_calls] == ["customer", "session"]
+        assert stripe_calls[1][1]["customer"] == "cus_new"
+        assert await StripeCustomer.objects.filter(user=user).aexists()
+
+    async def test_checkout_checks_older_session_with_stripe(
+        self, stripe_calls, settings
+    ):
+        settings.STRIPE_CHECKOUT_VERIFY_AFTER = -1
+        client = TestAsyncClient(AsyncPaymentsController)
+        plan = await sync_to_async(PlanFactory)()
+        user = await sync_to_async(StripeCustomerFactory)()
+        data = {"plan_id": plan.id, **CHECKOUT}
+
+        await client.post("/checkout", json=data, headers=auth_header(user.user))
+        await client.post("/checkout", json=data, headers=auth_header(user.user))
+
+        assert [kind for kind, _ in stripe_calls] == ["session", "retrieve"]
+
+    async def test_checkout_with_active_subscription(self, stripe_calls):
+        client = TestAsyncClient(AsyncPaymentsController)
+        subscription = await sync_to_async(SubscriptionFactory)()
+
+        response = await client.post(
+            "/checkout",
+            json={"plan_id": subscription.plan_id, **CHECKOUT},
+            headers=auth_header(subscription.user),
+        )
+
+        assert response.json()["detail"] == "User already has an active subscription"
+        assert stripe_calls == []
+
+    async def test_cancel(self, stripe_calls):
+        client = TestAsyncClient(AsyncPaymentsController)
+        subscription = await sync_to_async(SubscriptionFactory)()
+
+        response = await client.post(
+            "/cancel",
+            json={"subscription_id": subscription.stripe_subscription_id},
+            headers=auth_header(subscription.user),
+        )
+
+        assert response.status_code == 200
+        assert response.json()["success"] is True
+        assert stripe_calls == [("modify", {"cancel_at_period_end": True})]
+        subscription = await Subscription.objects.aget(pk=subscription.pk)
+        assert subscription.cancel_at_period_end is True
+
+    async def test_portal(self, stripe_calls):
+        client = TestAsyncClient(AsyncPaymentsController)
+        customer = await sync_to_async(StripeCustomerFactory)()
+
+        response = await client.post(
+            "/portal",
+            json={"return_url": "https://example.com/account"},
+            headers=auth_header(customer.user),
+        )
+
+        assert response.json() == {"session_url": "https://billing.stripe.com/p_1"}
+        assert stripe_calls == [
+            (
+                "portal",
+                {
+                    "customer": customer.stripe_customer_id,
+                    "return_url": "https://example.com/account",
+                },
+            )
+        ]
+
+
+def test_stripe_uses_the_httpx_client():
+    assert isinstance(services.stripe_async_client, stripe.HTTPXClient)
+    assert stripe.default_http_client._async_fallback_client is (
+        services.stripe_async_client
+    )
+
+
+@pytest.mark.asyncio
+class TestCallStripe:
+    async def test_worker_thread_without_async_client(self, monkeypatch):
+        monkeypatch.setattr(services, "stripe_async_client", None)
+        threads = []
+
+        def create(**kwargs):
+            threads.append(threading.current_thread())
+            return kwargs
+
+        monkeypatch.setattr(stripe.Customer, "create", create)
+
+        assert await call_stripe(stripe.Customer, "create", email="a@b.c") == {
+            "email": "a@b.c"
+        }
+        assert threads != [threading.main_thread()]
+
+    async def test_async_method_with_async_client(self, monkeypatch):
+        monkeypatch.setattr(services, "stripe_async_client", object())
+
+        async def modify_async(subscription_id, **kwargs):
+            return subscription_id, kwargs
+
+        monkeypatch.setattr(stripe.Subscription, "modify_async", modify_async)
+
+        assert await call_stripe(
+            stripe.Subscription, "modify", "sub_1", cancel_at_period_end=True
+        ) == ("sub_1", {"cancel_at_period_end": True})
@@ -0,0 +1,80 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+from ninja_extra.testing import TestClient
+
+from payments.api import PaymentsController
+from payments.catalog import catalog_version
+from payments.models import Plan
+
+from .factories import PlanFactory
+
+
+@pytest.fixture
+def api_client():
+    return TestClient(PaymentsController)
+
+
+@pytest.mark.django_db
+class TestPlanCatalog:
+    def test_repeat_hits_make_no_queries(self, api_client, django_assert_num_queries):
+        PlanFactory(name="free", price="0")
+        PlanFactory(name="pro")
+        PlanFactory(name="enterprise", is_active=False)
+
+        first = api_client.get("/plans")
+        with django_assert_num_queries(0):
+            second = api_client.get("/plans")
+
+        assert [plan["name"] for plan in second.json()] == ["free", "pro"]
+        assert second.json()[1]["price"] == "9.99"
+        assert second["ETag"] == first["ETag"]
+        assert second["ETag"].startswith('"')
+        assert second["Cache-Control"] == "public, max-age=300"
+
+    def test_plan_change_bumps_version(
+        self, api_client, django_capture_on_commit_callbacks
+    ):
+        with django_capture_on_commit_callbacks(execute=True):
+            plan = PlanFactory(name="pro")
+        before = api_client.get("/plans")
+
+        with django_capture_on_commit_callbacks(execute=True):
+            plan.price = "19.99"
+            plan.save()
+        after = api_client.get("/plans")
+
+        assert after.json()[0]["price"] == "19.99"
+        assert after["ETag"] != before["ETag"]
+
+    def test_plan_delete_bumps_version(
+        self, api_client, django_capture_on_commit_callbacks
+    ):
+        with django_capture_on_commit_callbacks(execute=True):
+            plan = PlanFactory(name="pro")
+        assert len(api_client.get("/plans").json()) == 1
+
+        with django_capture_on_commit_callbacks(execute=True):
+            plan.delete()
+
+        assert api_client.get("/plans").json() == []
+
+    def test_create_plans_bumps_version(self):
+        version = catalog_version()
+
+        call_command("create_plans", stdout=StringIO())
+
+        assert catalog_version() != version
+
+    def test_change_from_another_process_is_picked_up(self, api_client, settings):
+        PlanFactory(name="pro")
+        assert api_client.get("/plans").json()[0]["price"] == "9.99"
+
+        # No signal fires in this process; the version check notices the change
+        Plan.objects.update(price="19.99", updated_at=timezone.now())
+        assert api_client.get("/plans").json()[0]["price"] == "9.99"
+
+        settings.PLAN_CATALOG_VERSION_TTL = 0
+        assert api_client.get("/plans").json()[0]["price"] == "19.99"
@@ -0,0 +1,176 @@
+from types import SimpleNamespace
+
+import pytest
+import stripe
+from django.contrib.auth import get_user_model
+from ninja_extra.testing import TestClient
+
+from payments import provisioning
+from payments.api import PaymentsController
+from payments.models import StripeCustomer
+from payments.provisioning import provision_customer
+from payments.services import StripeService
+from users.api import AuthController
+from users.authentication import token_cache, user_cache
+from users.services import SocialAuthService
+from users.tests.factories import UserAccountFactory
+
+from .factories import PlanFactory, StripeCustomerFactory
+
+User = get_user_model()
+
+SUCCESS_URL = "https://example.com/success"
+CANCEL_URL = "https://example.com/cancel"
+
+
+@pytest.fixture(autouse=True)
+def clear_auth_caches():
+    token_cache.clear()
+    user_cache.clear()
+
+
+def checkout(user, plan, success_url=SUCCESS_URL):
+    access_token = SocialAuthService.generate_jwt_tokens(user)["access"]
+    return TestClient(PaymentsController).post(
+        "/checkout",
+        json={"plan_id": plan.id, "success_url": success_url, "cancel_url": CANCEL_URL},
+        headers={"Authorization": f"Bearer {access_token}"},
+    )
+
+
+@pytest.mark.django_db
+class TestOpenCheckoutSessions:
+    def test_repeat_request_reuses_the_session(
+        self, stripe_calls, django_assert_num_queries
+    ):
+        plan = PlanFactory()
+        user = StripeCustomerFactory().user
+        first = checkout(user, plan)
+
+        # Only the active subscription check; no plan, customer or Stripe call
+        with django_assert_num_queries(1):
+            second = checkout(user, plan)
+
+        assert second.json() == first.json()
+        assert [kind for kind, _ in stripe_calls] == ["session"]
+        assert stripe_calls[0][1]["expires_at"] > 0
+
+    def test_different_urls_get_their_own_session(self, stripe_calls):
+        plan = PlanFactory()
+        user = StripeCustomerFactory().user
+
+        checkout(user, plan)
+        checkout(user, plan, success_url="https://example.com/other")
+
+        assert [kind for kind, _ in stripe_calls] == ["session", "session"]
+
+    def test_completed_session_is_not_reused(self, stripe_calls):
+        plan = PlanFactory()
+        user = StripeCustomerFactory().user
+        checkout(user, plan)
+
+        StripeService.handle_event(
+            {
+                "id": "evt_1",
+                "type": "checkout.session.completed",
+                "created": 1,
+                "data": {
+                    "object": {
+                        "id": "cs_1",
+                        "success_url": SUCCESS_URL,
+                        "cancel_url": CANCEL_URL,
+                        "metadata": {"user_id": str(user.id), "plan_id": str(plan.id)},
+                    }
+                },
+            }
+        )
+        checkout(user, plan)
+
+        assert [kind for kind, _ in stripe_calls] == ["session", "session"]
+
+    def test_older_session_is_checked_with_stripe(self, stripe_calls, settings):
+        settings.STRIPE_CHECKOUT_VERIFY_AFTER = -1
+        plan = PlanFactory()
+        user = StripeCustomerFactory().user
+        first = checkout(user, plan)
+
+        second = checkout(user, plan)
+
+        assert second.json() == first.json()
+        assert [kind for kind, _ in stripe_calls] == ["session", "retrieve"]
+
+    def test_session_completed_in_another_process_is_not_reused(
+        self, stripe_calls, settings, monkeypatch
+    ):
+        settings.STRIPE_CHECKOUT_VERIFY_AFTER = -1
+        plan = PlanFactory()
+        user = StripeCustomerFactory().user
+        checkout(user, plan)
+        # The worker's cache delete went to its own cache, not ours
+        monkeypatch.setattr(
+            stripe.checkout.Session,
+            "retrieve",
+            lambda session_id: SimpleNamespace(id=session_id, status="complete"),
+        )
+
+        checkout(user, plan)
+
+        assert [kind for kind, _ in stripe_calls] == ["session", "session"]
+
+
+@pytest.mark.django_db
+class TestCustomerProvisioning:
+    def test_sign_up_schedules_provisioning(
+        self, settings, monkeypatch, django_capture_on_commit_callbacks
+    ):
+        settings.STRIPE_SECRET_KEY = "sk_test_123"
+        submitted = []
+        monkeypatch.setattr(
+            provisioning.executor, "submit", lambda *args: submitted.append(args)
+        )
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = TestClient(AuthController).post(
+                "/register",
+                json={
+                    "email": "new@example.com",
+                    "password": "StrongPass123!",
+                    "re_password": "StrongPass123!",
+                    "first_name": "New",
+                    "last_name": "User",
+                },
+            )
+
+        assert response.status_code == 200
+        user = User.objects.get(email="new@example.com")
+        assert submitted == [(provision_customer, user.pk)]
+
+    def test_nothing_is_scheduled_without_stripe_key(
+        self, django_capture_on_commit_callbacks
+    ):
+        with django_capture_on_commit_callbacks() as callbacks:
+            UserAccountFactory()
+
+        assert callbacks == []
+
+    def test_customer_already_created_concurrently(self, stripe_calls):
+        user = UserAccountFactory()
+        with pytest.raises(StripeCustomer.DoesNotExist):
+            user.stripecustomer  # noqa: B018  (caches the miss)
+        StripeCustomer.objects.create(
+            user=User.objects.get(pk=user.pk), stripe_customer_id="cus_new"
+        )
+
+        customer = StripeService.get_or_create_customer(user)
+
+        assert customer.stripe_customer_id == "cus_new"
+        assert stripe_calls[0][1]["idempotency_key"] == f"customer-{user.id}"
+
+
+@pytest.mark.django_db(transaction=True)
+def test_provisioning_runs_on_the_executor(stripe_calls):
+    user = UserAccountFactory()
+
+    provisioning.executor.submit(provision_customer, user.pk).result(timeout=10)
+
+    assert StripeCustomer.objects.get(user=user).stripe_customer_id == "cus_new"
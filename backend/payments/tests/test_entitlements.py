@@ -0,0 +1,160 @@
+from datetime import timedelta
+
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from ninja_extra import api_controller, route
+from ninja_extra.testing import TestClient
+
+from payments import entitlements as entitlements_module
+from payments.entitlements import (
+    FEATURE_BITS,
+    compile_plans,
+    entitlements,
+    requires_feature,
+)
+from payments.services import StripeService
+from users.authentication import CachedJWTAuth, token_cache, user_cache
+from users.services import SocialAuthService
+from users.tests.factories import UserAccountFactory
+
+from .factories import PlanFactory, SubscriptionFactory
+
+
+@api_controller("/gated", auth=CachedJWTAuth())
+class GatedController:
+    @route.get("/api")
+    @requires_feature("api_access")
+    def api(self, request):
+        return {"ok": True}
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    entitlements.clear()
+    token_cache.clear()
+    user_cache.clear()
+
+
+def get_gated(user):
+    access_token = SocialAuthService.generate_jwt_tokens(user)["access"]
+    return TestClient(GatedController).get(
+        "/api", headers={"Authorization": f"Bearer {access_token}"}
+    )
+
+
+def stripe_subscription(subscription, **changes):
+    return {
+        "id": subscription.stripe_subscription_id,
+        "status": subscription.status,
+        "current_period_start": int(subscription.current_period_start.timestamp()),
+        "current_period_end": int(subscription.current_period_end.timestamp()),
+        "metadata": {},
+        **changes,
+    }
+
+
+def test_compile_plans_resolves_included_plans():
+    compiled = compile_plans(
+        {
+            "pro": ["API access", "Priority support"],
+            "enterprise": ["All pro features", "SLA guarantee", "Free coffee"],
+        }
+    )
+
+    assert (
+        compiled["pro"] == FEATURE_BITS["api_access"] | FEATURE_BITS["priority_support"]
+    )
+    assert compiled["enterprise"] == compiled["pro"] | FEATURE_BITS["sla_guarantee"]
+
+
+def test_unknown_feature_is_a_configuration_error():
+    with pytest.raises(ImproperlyConfigured):
+        requires_feature("teleportation")
+
+
+@pytest.mark.django_db
+class TestRequiresFeature:
+    def test_plan_with_feature_is_allowed(self):
+        subscription = SubscriptionFactory(plan=PlanFactory(features=["API access"]))
+
+        assert get_gated(subscription.user).status_code == 200
+
+    def test_plan_without_feature_is_forbidden(self):
+        subscription = SubscriptionFactory(
+            plan=PlanFactory(features=["Priority support"])
+        )
+
+        assert get_gated(subscription.user).status_code == 403
+
+    def test_no_subscription_is_forbidden(self):
+        assert get_gated(UserAccountFactory()).status_code == 403
+
+    def test_lapsed_period_is_forbidden(self):
+        start = timezone.now() - timedelta(days=31)
+        subscription = SubscriptionFactory(
+            plan=PlanFactory(features=["API access"]),
+            current_period_start=start,
+            current_period_end=start + timedelta(days=30),
+        )
+
+        assert get_gated(subscription.user).status_code == 403
+
+    def test_checks_do_not_touch_the_database(self, django_assert_num_queries):
+        subscription = SubscriptionFactory(plan=PlanFactory(features=["API access"]))
+        get_gated(subscription.user)
+
+        # The user comes from the auth cache, the entitlement from the local one
+        with django_assert_num_queries(0):
+            assert get_gated(subscription.user).status_code == 200
+
+    def test_shared_cache_serves_other_processes(self, django_assert_num_queries):
+        subscription = SubscriptionFactory(plan=PlanFactory(features=["API access"]))
+        entitlements.get(subscription.user_id)
+        entitlements.clear()
+
+        with django_assert_num_queries(0):
+            assert entitlements.get(subscription.user_id).plan == "pro"
+
+    @pytest.mark.parametrize("shared, timeout", [(True, 3600), (False, 60)])
+    def test_per_process_cache_keeps_entries_no_longer_than_local(
+        self, settings, monkeypatch, shared, timeout
+    ):
+        settings.ENTITLEMENT_CACHE_TTL = 60
+        settings.ENTITLEMENT_SHARED_CACHE_TTL = 3600
+        timeouts = []
+
+        class RecordingCache:
+            def set(self, key, value, ttl):
+                timeouts.append(ttl)
+
+        monkeypatch.setattr(entitlements_module, "cache", RecordingCache())
+        monkeypatch.setattr(entitlements_module, "is_shared", lambda: shared)
+        subscription = SubscriptionFactory()
+
+        entitlements.refresh(subscription.user_id)
+
+        assert timeouts == [timeout]
+
+    def test_webhook_refreshes_entitlement(self, django_capture_on_commit_callbacks):
+        subscription = SubscriptionFactory(plan=PlanFactory(features=["API access"]))
+        assert get_gated(subscription.user).status_code == 200
+
+        with django_capture_on_commit_callbacks(execute=True):
+            StripeService.handle_subscription_deleted(stripe_subscription(subscription))
+
+        assert get_gated(subscription.user).status_code == 403
+
+    def test_plan_change_invalidates_entitlements(
+        self, django_capture_on_commit_callbacks
+    ):
+        plan = PlanFactory(features=["Priority support"])
+        subscription = SubscriptionFactory(plan=plan)
+        assert get_gated(subscription.user).status_code == 403
+
+        with django_capture_on_commit_callbacks(execute=True):
+            plan.features = ["API access"]
+            plan.save()
+        entitlements.clear()  # as another process would after ENTITLEMENT_CACHE_TTL
+
+        assert get_gated(subscription.user).status_code == 200
@@ -0,0 +1,128 @@
+import pytest
+from django.contrib.auth import get_user_model
+from ninja_extra.testing import TestClient
+
+from payments.api import PaymentsController
+from payments.services import StripeService
+from users.authentication import token_cache, user_cache
+from users.services import SocialAuthService
+from users.tests.factories import UserAccountFactory
+
+from .factories import PlanFactory, StripeCustomerFactory, SubscriptionFactory
+
+User = get_user_model()
+
+CHECKOUT = {
+    "success_url": "https://example.com/success",
+    "cancel_url": "https://example.com/cancel",
+}
+
+
+@pytest.fixture(autouse=True)
+def clear_auth_caches():
+    token_cache.clear()
+    user_cache.clear()
+
+
+@pytest.fixture
+def api_client():
+    return TestClient(PaymentsController)
+
+
+def authenticated(api_client, user):
+    """Auth headers for ``user``, with the auth caches already warm"""
+    access_token = SocialAuthService.generate_jwt_tokens(user)["access"]
+    headers = {"Authorization": f"Bearer {access_token}"}
+    api_client.get("/subscription", headers=headers)
+    return headers
+
+
+@pytest.mark.django_db
+class TestQueryCounts:
+    def test_subscription_is_one_query(self, api_client, django_assert_num_queries):
+        subscription = SubscriptionFactory()
+        headers = authenticated(api_client, subscription.user)
+
+        with django_assert_num_queries(1):
+            response = api_client.get("/subscription", headers=headers)
+
+        assert response.json()["plan_name"] == "pro"
+        assert response.json()["subscription"]["plan"]["name"] == "pro"
+
+    def test_no_subscription_is_one_query(self, api_client, django_assert_num_queries):
+        headers = authenticated(api_client, UserAccountFactory())
+
+        with django_assert_num_queries(1):
+            response = api_client.get("/subscription", headers=headers)
+
+        assert response.json()["has_active_subscription"] is False
+
+    def test_checkout_for_existing_customer(
+        self, api_client, stripe_calls, django_assert_num_queries
+    ):
+        plan = PlanFactory()
+        customer = StripeCustomerFactory()
+        headers = authenticated(api_client, customer.user)
+
+        # Plan, active subscription, customer
+        with django_assert_num_queries(3):
+            response = api_client.post(
+                "/checkout", json={"plan_id": plan.id, **CHECKOUT}, headers=headers
+            )
+
+        assert response.json()["session_id"] == "cs_1"
+        assert stripe_calls[0][1]["customer"] == customer.stripe_customer_id
+
+    def test_checkout_for_new_customer(
+        self, api_client, stripe_calls, django_assert_num_queries
+    ):
+        plan = PlanFactory()
+        headers = authenticated(api_client, UserAccountFactory())
+
+        # Plan, active subscription, customer, customer insert in a savepoint
+        with django_assert_num_queries(6):
+            api_client.post(
+                "/checkout", json={"plan_id": plan.id, **CHECKOUT}, headers=headers
+            )
+
+        assert [kind for kind, _ in stripe_calls] == ["customer", "session"]
+        assert stripe_calls[1][1]["customer"] == "cus_new"
+
+
+@pytest.mark.django_db
+class TestMemoisation:
+    def test_subscription_is_looked_up_once_per_user(self, django_assert_num_queries):
+        user = SubscriptionFactory().user
+
+        with django_assert_num_queries(1):
+            first = StripeService.get_user_subscription(user)
+            second = StripeService.get_user_subscription(user)
+            first.plan.name  # noqa: B018
+
+        assert first is second
+
+    def test_missing_subscription_is_memoised(self, django_assert_num_queries):
+        user = UserAccountFactory()
+
+        with django_assert_num_queries(1):
+            assert StripeService.get_user_subscription(user) is None
+            assert StripeService.get_user_subscription(user) is None
+
+    def test_customer_is_looked_up_once_per_user(self, django_assert_num_queries):
+        user = User.objects.get(pk=StripeCustomerFactory().user_id)
+
+        with django_assert_num_queries(1):
+            first = StripeService.get_or_create_customer(user)
+            second = StripeService.get_or_create_customer(user)
+
+        assert first is second
+
+    def test_memoisation_does_not_leak_across_requests(self, api_client):
+        subscription = SubscriptionFactory()
+        headers = authenticated(api_client, subscription.user)
+
+        subscription.status = "canceled"
+        subscription.save()
+        response = api_client.get("/subscription", headers=headers)
+
+        assert response.json()["has_active_subscription"] is False
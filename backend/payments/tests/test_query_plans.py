@@ -0,0 +1,92 @@
+"""
+Query plans of the hot payments lookups.
+
+These tests only run against PostgreSQL, e.g. with a local database:
+DATABASE_URL=postgres://localhost/app pytest payments/tests/test_query_plans.py
+"""
+
+from datetime import timedelta
+
+import pytest
+from django.db import IntegrityError, connection
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from core.tests.explain import assert_no_seq_scan
+from payments.models import Payment, Subscription
+from users.models import UserAccount
+
+from .factories import SubscriptionFactory
+
+postgres_only = pytest.mark.skipif(
+    connection.vendor != "postgresql", reason="EXPLAIN checks need PostgreSQL"
+)
+
+
+@postgres_only
+@pytest.mark.django_db
+class TestQueryPlans:
+    @pytest.fixture(autouse=True)
+    def user(self):
+        return SubscriptionFactory().user
+
+    def test_active_subscription(self, user):
+        plan = assert_no_seq_scan(
+            Subscription.objects.select_related("plan").filter(
+                user=user, status__in=Subscription.ACTIVE_STATUSES
+            )
+        )
+
+        assert "subscription_user_status" in plan or (
+            "one_active_subscription_per_user" in plan
+        )
+
+    def test_subscription_by_stripe_id(self, user):
+        assert_no_seq_scan(Subscription.objects.filter(stripe_subscription_id="sub_1"))
+
+    def test_introspection_subscription_check(self, user):
+        assert_no_seq_scan(
+            UserAccount.objects.filter(id__in=[user.id]).annotate(
+                has_active_subscription=Exists(
+                    Subscription.objects.filter(
+                        user=OuterRef("pk"), status__in=Subscription.ACTIVE_STATUSES
+                    )
+                )
+            )
+        )
+
+    def test_recent_payments(self, user):
+        plan = assert_no_seq_scan(
+            Payment.objects.filter(user=user).order_by("-created_at")[:20]
+        )
+
+        assert "payment_user_created" in plan
+
+    @pytest.mark.parametrize(
+        "model, index",
+        [(Payment, "payment_created"), (Subscription, "subscription_created")],
+    )
+    def test_admin_date_drilldown(self, user, model, index):
+        start = timezone.now() - timedelta(days=30)
+        plan = assert_no_seq_scan(
+            model.objects.filter(
+                created_at__gte=start, created_at__lt=timezone.now()
+            ).datetimes("created_at", "day")
+        )
+
+        assert index in plan
+
+
+@pytest.mark.django_db
+class TestOneActiveSubscription:
+    def test_second_active_subscription_is_rejected(self):
+        subscription = SubscriptionFactory()
+
+        with pytest.raises(IntegrityError):
+            SubscriptionFactory(user=subscription.user, status="trialing")
+
+    def test_past_subscriptions_are_allowed(self):
+        subscription = SubscriptionFactory(status="canceled")
+
+        SubscriptionFactory(user=subscription.user, status="canceled")
+        SubscriptionFactory(user=subscription.user)
@@ -0,0 +1,241 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+import stripe
+from django.core.management import call_command
+from django.utils import timezone
+
+from payments import services  # noqa: F401  (configures stripe.default_http_client)
+from payments.entitlements import entitlements
+from payments.models import StripeCustomer, Subscription
+from users.tests.factories import UserAccountFactory
+
+from .factories import PlanFactory, StripeCustomerFactory, SubscriptionFactory
+
+PERIOD_START = 1_700_000_000
+PERIOD_END = PERIOD_START + 30 * 24 * 3600
+
+
+@pytest.fixture
+def stripe_api(monkeypatch):
+    """
+    Local stand-in for Stripe's list endpoints.
+
+    ``state["customers"]`` and ``state["subscriptions"]`` are served in pages
+    honouring ``limit`` and ``starting_after``. After ``fail_after`` list
+    requests, every request gets an API error. ``state["served_at"]`` records
+    when each request was answered.
+    """
+    state = {
+        "customers": [],
+        "subscriptions": [],
+        "requests": 0,
+        "fail_after": None,
+        "served_at": [],
+    }
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            objects = state[url.path.removeprefix("/v1/")]
+            state["requests"] += 1
+            state["served_at"].append(timezone.now())
+
+            if (
+                state["fail_after"] is not None
+                and state["requests"] > state["fail_after"]
+            ):
+                status, body = 400, {"error": {"type": "invalid_request_error"}}
+            else:
+                start = 0
+                if "starting_after" in query:
+                    ids = [obj["id"] for obj in objects]
+                    start = ids.index(query["starting_after"][0]) + 1
+                limit = int(query.get("limit", ["10"])[0])
+                status, body = (
+                    200,
+                    {
+                        "object": "list",
+                        "url": url.path,
+                        "data": objects[start : start + limit],
+                        "has_more": start + limit < len(objects),
+                    },
+                )
+
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(stripe, "api_base", f"http://127.0.0.1:{server.server_port}")
+    monkeypatch.setattr(stripe, "api_key", "sk_test_123")
+    yield state
+    server.shutdown()
+
+
+def stripe_customer(customer_id, user):
+    return {
+        "id": customer_id,
+        "object": "customer",
+        "metadata": {"user_id": str(user.id)},
+    }
+
+
+def stripe_subscription(subscription_id, customer_id, plan, status="active"):
+    return {
+        "id": subscription_id,
+        "object": "subscription",
+        "customer": customer_id,
+        "status": status,
+        "cancel_at_period_end": False,
+        "metadata": {},
+        "items": {
+            "object": "list",
+            "data": [
+                {
+                    "id": f"si_{subscription_id}",
+                    "object": "subscription_item",
+                    "price": {"id": plan.stripe_price_id, "object": "price"},
+                    "current_period_start": PERIOD_START,
+                    "current_period_end": PERIOD_END,
+                }
+            ],
+        },
+    }
+
+
+def reconcile(**options):
+    out = StringIO()
+    call_command("reconcile_stripe", stdout=out, **options)
+    return out.getvalue()
+
+
+@pytest.mark.django_db
+class TestReconcileStripe:
+    def test_missing_and_drifted_rows_are_repaired(self, stripe_api):
+        plan = PlanFactory()
+        customer = StripeCustomerFactory()
+        drifted = SubscriptionFactory(
+            user=customer.user, plan=plan, stripe_subscription_id="sub_drifted"
+        )
+        new_user = UserAccountFactory()
+        stripe_api["customers"] = [
+            stripe_customer(customer.stripe_customer_id, customer.user),
+            stripe_customer("cus_new", new_user),
+            {"id": "cus_orphan", "object": "customer", "metadata": {}},
+        ]
+        stripe_api["subscriptions"] = [
+            stripe_subscription(
+                "sub_drifted", customer.stripe_customer_id, plan, status="canceled"
+            ),
+            stripe_subscription("sub_new", "cus_new", plan),
+        ]
+
+        output = reconcile(chunk_size=2)
+
+        assert "customer cus_new: missing" in output
+        assert "subscription sub_drifted: status active -> canceled" in output
+        assert "subscription sub_new: missing" in output
+        assert (
+            "customers: 3 seen, 1 created, 0 updated, 1 unchanged, 1 skipped" in output
+        )
+        assert StripeCustomer.objects.get(stripe_customer_id="cus_new").user == new_user
+        drifted.refresh_from_db()
+        assert drifted.status == "canceled"
+        assert drifted.current_period_end.timestamp() == PERIOD_END
+        assert (
+            Subscription.objects.get(stripe_subscription_id="sub_new").user == new_user
+        )
+
+    def test_second_run_reports_nothing(self, stripe_api):
+        plan = PlanFactory()
+        user = UserAccountFactory()
+        stripe_api["customers"] = [stripe_customer("cus_1", user)]
+        stripe_api["subscriptions"] = [stripe_subscription("sub_1", "cus_1", plan)]
+        reconcile()
+
+        output = reconcile()
+
+        assert "missing" not in output
+        assert "subscriptions: 1 seen, 0 created, 0 updated, 1 unchanged" in output
+
+    def test_events_after_the_page_was_read_are_not_stale(self, stripe_api):
+        plan = PlanFactory()
+        user = UserAccountFactory()
+        stripe_api["customers"] = [stripe_customer("cus_1", user)]
+        stripe_api["subscriptions"] = [stripe_subscription("sub_1", "cus_1", plan)]
+
+        reconcile()
+
+        subscription = Subscription.objects.get(stripe_subscription_id="sub_1")
+        # Requests: customers page, then subscriptions page
+        assert subscription.last_event_created <= stripe_api["served_at"][1]
+
+    def test_written_subscriptions_invalidate_entitlements(
+        self, stripe_api, django_capture_on_commit_callbacks
+    ):
+        plan = PlanFactory()
+        customer = StripeCustomerFactory()
+        SubscriptionFactory(
+            user=customer.user, plan=plan, stripe_subscription_id="sub_1"
+        )
+        assert entitlements.get(customer.user_id).plan == plan.name
+        stripe_api["customers"] = [
+            stripe_customer(customer.stripe_customer_id, customer.user)
+        ]
+        stripe_api["subscriptions"] = [
+            stripe_subscription(
+                "sub_1", customer.stripe_customer_id, plan, status="canceled"
+            )
+        ]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            reconcile()
+
+        assert entitlements.get(customer.user_id).plan is None
+
+    def test_dry_run_writes_nothing(self, stripe_api):
+        stripe_api["customers"] = [stripe_customer("cus_new", UserAccountFactory())]
+
+        output = reconcile(dry_run=True)
+
+        assert "customer cus_new: missing" in output
+        assert not StripeCustomer.objects.exists()
+
+    def test_interrupted_run_resumes_from_checkpoint(self, stripe_api, tmp_path):
+        users = UserAccountFactory.create_batch(5)
+        stripe_api["customers"] = [
+            stripe_customer(f"cus_{i}", user) for i, user in enumerate(users)
+        ]
+        checkpoint = tmp_path / "reconcile.json"
+        # Pages of two: the third customers page fails
+        stripe_api["fail_after"] = 2
+
+        with pytest.raises(stripe.InvalidRequestError):
+            reconcile(chunk_size=2, checkpoint=str(checkpoint))
+
+        assert StripeCustomer.objects.count() == 4
+        assert json.loads(checkpoint.read_text())["last_id"] == {"customers": "cus_3"}
+
+        stripe_api["fail_after"] = None
+        stripe_api["requests"] = 0
+        output = reconcile(chunk_size=2, checkpoint=str(checkpoint))
+
+        assert "customers: 1 seen, 1 created" in output
+        assert StripeCustomer.objects.count() == 5
+        assert not checkpoint.exists()
@@ -0,0 +1,295 @@
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from ninja_extra.testing import TestClient
+
+from payments.api import FinanceController
+from payments.inbox import StripeEventInbox
+from payments.models import DailyRollup, Payment, PlanRollup
+from payments.rollups import Rollups
+from payments.services import StripeService
+from users.authentication import token_cache, user_cache
+from users.services import SocialAuthService
+from users.tests.factories import UserAccountFactory
+
+from .factories import PlanFactory, StripeCustomerFactory
+
+
+@pytest.fixture(autouse=True)
+def clear_auth_caches():
+    token_cache.clear()
+    user_cache.clear()
+
+
+def event(event_type, obj, event_id="evt_1", created=None):
+    return {
+        "id": event_id,
+        "type": event_type,
+        "created": created or int(time.time()),
+        "data": {"object": obj},
+    }
+
+
+def subscription_object(customer, plan, status="active"):
+    now = int(time.time())
+    return {
+        "id": f"sub_{customer.user_id}",
+        "customer": customer.stripe_customer_id,
+        "status": status,
+        "current_period_start": now,
+        "current_period_end": now + 30 * 24 * 3600,
+        "metadata": {"user_id": str(customer.user_id), "plan_id": str(plan.id)},
+    }
+
+
+def invoice_object(customer, invoice_id="in_1", amount_paid=999):
+    return {
+        "id": invoice_id,
+        "customer": customer.stripe_customer_id,
+        "amount_paid": amount_paid,
+        "currency": "usd",
+        "parent": {"subscription_details": {"subscription": f"sub_{customer.user_id}"}},
+    }
+
+
+def rollups():
+    daily = set(
+        DailyRollup.objects.values_list(
+            "day",
+            "plan",
+            "currency",
+            "revenue",
+            "payments",
+            "new_subscriptions",
+            "canceled_subscriptions",
+        )
+    )
+    plans = set(
+        PlanRollup.objects.values_list(
+            "plan", "currency", "active_subscriptions", "mrr"
+        )
+    )
+    return daily, plans
+
+
+@pytest.mark.django_db
+class TestIncrementalRollups:
+    def test_subscription_lifecycle(self):
+        plan = PlanFactory()
+        customer = StripeCustomerFactory()
+        today = timezone.localdate()
+
+        StripeService.handle_event(
+            event("customer.subscription.created", subscription_object(customer, plan))
+        )
+        assert PlanRollup.objects.get(plan="pro").active_subscriptions == 1
+        assert PlanRollup.objects.get(plan="pro").mrr == Decimal("9.99")
+
+        StripeService.handle_event(
+            event(
+                "customer.subscription.deleted",
+                subscription_object(customer, plan, status="canceled"),
+                "evt_2",
+            )
+        )
+
+        assert PlanRollup.objects.get(plan="pro").active_subscriptions == 0
+        assert PlanRollup.objects.get(plan="pro").mrr == 0
+        daily = DailyRollup.objects.get(day=today, plan="pro", currency="USD")
+        assert daily.new_subscriptions == 1
+        assert daily.canceled_subscriptions == 1
+
+    def test_status_change_within_active_statuses_is_not_counted(self):
+        plan = PlanFactory()
+        customer = StripeCustomerFactory()
+        obj = subscription_object(customer, plan, status="trialing")
+        StripeService.handle_event(event("customer.subscription.created", obj))
+
+        StripeService.handle_event(
+            event(
+                "customer.subscription.updated",
+                {**obj, "status": "active"},
+                "evt_2",
+            )
+        )
+
+        assert PlanRollup.objects.get(plan="pro").active_subscriptions == 1
+
+    def test_payment_is_recorded_once(self):
+        plan = PlanFactory()
+        customer = StripeCustomerFactory()
+        StripeService.handle_event(
+            event("customer.subscription.created", subscription_object(customer, plan))
+        )
+        paid = event("invoice.payment_succeeded", invoice_object(customer), "evt_2")
+
+        StripeService.handle_event(paid)
+        StripeService.handle_event(paid)
+
+        payment = Payment.objects.get()
+        assert payment.amount == Decimal("9.99")
+        assert payment.subscription.stripe_subscription_id == f"sub_{customer.user_id}"
+        daily = DailyRollup.objects.get(plan="pro")
+        assert (daily.revenue, daily.payments) == (Decimal("9.99"), 1)
+
+    def test_coalesced_batch_updates_rollups(self):
+        plan = PlanFactory()
+        customers = StripeCustomerFactory.create_batch(3)
+        for index, customer in enumerate(customers):
+            StripeEventInbox.store(
+                event(
+                    "customer.subscription.created",
+                    subscription_object(customer, plan),
+                    f"evt_{index}",
+                )
+            )
+
+        StripeEventInbox.process_batch(coalesce=True)
+
+        assert PlanRollup.objects.get(plan="pro").active_subscriptions == 3
+        assert DailyRollup.objects.get(plan="pro").new_subscriptions == 3
+
+    def test_batch_applies_increments_once_at_the_end(self):
+        plan = PlanFactory()
+        for index, customer in enumerate(StripeCustomerFactory.create_batch(3)):
+            StripeEventInbox.store(
+                event(
+                    "customer.subscription.created",
+                    subscription_object(customer, plan),
+                    f"evt_{index}",
+                )
+            )
+
+        with CaptureQueriesContext(connection) as queries:
+            StripeEventInbox.process_batch()
+
+        def writes(table):
+            return [
+                index
+                for index, query in enumerate(queries)
+                if table in query["sql"] and not query["sql"].startswith("SELECT")
+            ]
+
+        rollup_writes = writes("rollup")
+        # UPDATE, then INSERT as the row is new, once per rollup row
+        assert len(rollup_writes) == 4
+        assert min(rollup_writes) > max(writes('"payments_subscription"'))
+        assert PlanRollup.objects.get(plan="pro").active_subscriptions == 3
+        assert DailyRollup.objects.get(plan="pro").new_subscriptions == 3
+
+    def test_increments_of_a_failed_event_are_dropped(self, monkeypatch):
+        DailyRollup.objects.create(
+            day=timezone.localdate(), plan="pro", currency="USD", payments=1
+        )
+        StripeEventInbox.store(event("invoice.payment_succeeded", {}))
+
+        def fail(payload):
+            Rollups._increment(
+                DailyRollup,
+                day=timezone.localdate(),
+                plan="pro",
+                currency="USD",
+                payments=1,
+            )
+            raise ValueError
+
+        monkeypatch.setattr(StripeService, "handle_event", fail)
+
+        StripeEventInbox.process_batch()
+
+        assert DailyRollup.objects.get().payments == 1
+
+    def test_rebuild_matches_incremental(self):
+        pro = PlanFactory()
+        enterprise = PlanFactory(name="enterprise", price="29.99")
+        customers = StripeCustomerFactory.create_batch(4)
+        for index, customer in enumerate(customers):
+            plan = pro if index % 2 else enterprise
+            StripeService.handle_event(
+                event(
+                    "customer.subscription.created",
+                    subscription_object(customer, plan),
+                    f"evt_c{index}",
+                )
+            )
+            StripeService.handle_event(
+                event(
+                    "invoice.payment_succeeded",
+                    invoice_object(customer, f"in_{index}", 1000 + index),
+                    f"evt_p{index}",
+                )
+            )
+        StripeService.handle_event(
+            event(
+                "customer.subscription.deleted",
+                subscription_object(customers[0], enterprise, status="canceled"),
+                "evt_d",
+            )
+        )
+        incremental = rollups()
+
+        out = StringIO()
+        call_command("rebuild_rollups", stdout=out)
+
+        assert rollups() == incremental
+        assert "Rebuilt 2 daily rollup rows" in out.getvalue()
+
+    def test_rebuild_only_touches_the_range(self):
+        today = timezone.localdate()
+        old = today - timedelta(days=10)
+        DailyRollup.objects.create(day=old, plan="pro", currency="USD", payments=7)
+        DailyRollup.objects.create(day=today, plan="pro", currency="USD", payments=7)
+
+        call_command("rebuild_rollups", start=today.isoformat(), stdout=StringIO())
+
+        assert list(DailyRollup.objects.values_list("day", "payments")) == [(old, 7)]
+
+
+@pytest.mark.django_db
+class TestFinanceEndpoints:
+    def get(self, user, path):
+        access_token = SocialAuthService.generate_jwt_tokens(user)["access"]
+        return TestClient(FinanceController).get(
+            path, headers={"Authorization": f"Bearer {access_token}"}
+        )
+
+    def test_staff_reads_rollups(self, django_assert_num_queries):
+        today = timezone.localdate()
+        staff = UserAccountFactory(is_staff=True)
+        for days in range(30):
+            DailyRollup.objects.create(
+                day=today - timedelta(days=days), plan="pro", currency="USD"
+            )
+        PlanRollup.objects.create(
+            plan="pro", currency="USD", active_subscriptions=3, mrr="29.97"
+        )
+        self.get(staff, "/plans")
+
+        # The staff user comes from the auth cache; one query per endpoint
+        with django_assert_num_queries(1):
+            daily = self.get(
+                staff,
+                f"/daily?start={today - timedelta(days=6)}&end={today}",
+            )
+        with django_assert_num_queries(1):
+            plans = self.get(staff, "/plans")
+
+        assert len(daily.json()) == 7
+        assert plans.json() == [
+            {
+                "plan": "pro",
+                "currency": "USD",
+                "active_subscriptions": 3,
+                "mrr": "29.97",
+            }
+        ]
+
+    def test_requires_staff(self):
+        assert self.get(UserAccountFactory(), "/plans").status_code == 403
@@ -0,0 +1,350 @@
+import hashlib
+import hmac
+import json
+import time
+import warnings
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+from ninja_extra.testing import TestClient
+
+from payments.api import WebhooksController
+from payments.inbox import StripeEventInbox
+from payments.models import StripeEvent, Subscription
+from payments.services import StripeService
+
+from .factories import PlanFactory, SubscriptionFactory
+from users.tests.factories import UserAccountFactory
+
+WEBHOOK_SECRET = "whsec_test"
+
+
+@pytest.fixture(autouse=True)
+def webhook_secret(settings):
+    settings.STRIPE_WEBHOOK_SECRET = WEBHOOK_SECRET
+
+
+def subscription_event(
+    subscription_id, event_type, event_id="evt_1", created=None, **fields
+):
+    now = int(time.time())
+    return {
+        "id": event_id,
+        "object": "event",
+        "type": event_type,
+        "created": created or now,
+        "data": {
+            "object": {
+                "id": subscription_id,
+                "object": "subscription",
+                "status": "active",
+                "current_period_start": now,
+                "current_period_end": now + 30 * 24 * 3600,
+                "cancel_at_period_end": False,
+                "metadata": {},
+                **fields,
+            }
+        },
+    }
+
+
+def post_event(event, secret=WEBHOOK_SECRET):
+    payload = json.dumps(event)
+    timestamp = int(time.time())
+    signature = hmac.new(
+        secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256
+    ).hexdigest()
+    return TestClient(WebhooksController).post(
+        "/stripe",
+        data=payload,
+        content_type="application/json",
+        # Upper case: the test client does not normalise header names
+        headers={"STRIPE-SIGNATURE": f"t={timestamp},v1={signature}"},
+    )
+
+
+@pytest.mark.django_db
+class TestWebhook:
+    def test_event_is_stored_not_processed(self, django_assert_num_queries):
+        subscription = SubscriptionFactory()
+        event = subscription_event(
+            subscription.stripe_subscription_id,
+            "customer.subscription.deleted",
+        )
+
+        with django_assert_num_queries(1):
+            response = post_event(event)
+
+        assert response.status_code == 200
+        stored = StripeEvent.objects.get()
+        assert stored.stripe_event_id == "evt_1"
+        assert stored.status == StripeEvent.PENDING
+        assert stored.payload == event
+        subscription.refresh_from_db()
+        assert subscription.status == "active"
+
+    def test_payload_is_stored_as_sent(self):
+        event = subscription_event("sub_1", "customer.subscription.updated")
+        event["data"]["object"]["items"] = {"object": "list", "data": [{"id": "si_1"}]}
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", DeprecationWarning)
+            post_event(event)
+
+        assert StripeEvent.objects.get().payload == event
+
+    def test_redelivery_is_stored_once(self):
+        event = subscription_event("sub_1", "customer.subscription.updated")
+
+        post_event(event)
+        post_event(event)
+
+        assert StripeEvent.objects.count() == 1
+
+    def test_bad_signature_is_rejected(self):
+        response = post_event(
+            subscription_event("sub_1", "customer.subscription.updated"),
+            secret="whsec_other",
+        )
+
+        assert response.status_code == 400
+        assert not StripeEvent.objects.exists()
+
+
+@pytest.mark.django_db
+class TestProcessStripeEvents:
+    def test_events_are_applied(self):
+        user = UserAccountFactory()
+        plan = PlanFactory()
+        StripeEventInbox.store(
+            subscription_event(
+                "sub_new",
+                "customer.subscription.created",
+                metadata={"user_id": str(user.id), "plan_id": str(plan.id)},
+            )
+        )
+        StripeEventInbox.store(
+            subscription_event("sub_new", "checkout.session.completed", "evt_2")
+        )
+
+        call_command("process_stripe_events", once=True)
+
+        assert Subscription.objects.get(stripe_subscription_id="sub_new").user == user
+        assert set(StripeEvent.objects.values_list("status", flat=True)) == {
+            StripeEvent.PROCESSED
+        }
+
+    def test_failure_is_retried_with_backoff(self):
+        StripeEventInbox.store(
+            subscription_event("sub_missing", "customer.subscription.updated")
+        )
+        StripeEventInbox.store(
+            subscription_event(
+                SubscriptionFactory().stripe_subscription_id,
+                "customer.subscription.deleted",
+                "evt_2",
+            )
+        )
+
+        assert StripeEventInbox.process_batch() == 2
+
+        failed = StripeEvent.objects.get(stripe_event_id="evt_1")
+        assert failed.status == StripeEvent.PENDING
+        assert failed.attempts == 1
+        assert "Missing user_id" in failed.last_error
+        assert failed.next_attempt_at > timezone.now() + timedelta(seconds=25)
+        # The failing event did not roll back the rest of the batch
+        assert Subscription.objects.get().status == "canceled"
+        # Not due yet
+        assert StripeEventInbox.process_batch() == 0
+
+    def test_event_goes_dead_after_max_attempts(self, settings):
+        settings.STRIPE_EVENT_MAX_ATTEMPTS = 2
+        StripeEventInbox.store(
+            subscription_event("sub_missing", "customer.subscription.updated")
+        )
+
+        for _ in range(2):
+            StripeEvent.objects.update(next_attempt_at=timezone.now())
+            StripeEventInbox.process_batch()
+
+        event = StripeEvent.objects.get()
+        assert event.status == StripeEvent.DEAD
+        assert event.attempts == 2
+
+    def test_backoff_is_exponential_and_capped(self, settings):
+        settings.STRIPE_EVENT_RETRY_DELAY = 30
+        settings.STRIPE_EVENT_RETRY_MAX_DELAY = 100
+
+        delays = [StripeEventInbox.backoff(n).total_seconds() for n in (1, 2, 3, 4)]
+
+        assert delays == [30, 60, 100, 100]
+
+
+@pytest.mark.django_db
+class TestEventOrdering:
+    @pytest.fixture
+    def metadata(self):
+        return {
+            "user_id": str(UserAccountFactory().id),
+            "plan_id": str(PlanFactory().id),
+        }
+
+    def test_duplicate_created_event_is_harmless(self, metadata):
+        event = subscription_event(
+            "sub_1", "customer.subscription.created", metadata=metadata
+        )
+
+        StripeService.handle_event(event)
+        StripeService.handle_event(event)
+
+        assert Subscription.objects.count() == 1
+
+    def test_stale_update_is_ignored(self, metadata):
+        StripeService.handle_event(
+            subscription_event(
+                "sub_1",
+                "customer.subscription.updated",
+                created=2000,
+                status="past_due",
+                metadata=metadata,
+            )
+        )
+        StripeService.handle_event(
+            subscription_event(
+                "sub_1",
+                "customer.subscription.updated",
+                "evt_2",
+                created=1000,
+                status="active",
+                metadata=metadata,
+            )
+        )
+
+        subscription = Subscription.objects.get()
+        assert subscription.status == "past_due"
+        assert subscription.last_event_created.timestamp() == 2000
+
+    def test_created_after_deleted_keeps_it_canceled(self, metadata):
+        StripeService.handle_event(
+            subscription_event(
+                "sub_1",
+                "customer.subscription.deleted",
+                created=2000,
+                metadata=metadata,
+            )
+        )
+        StripeService.handle_event(
+            subscription_event(
+                "sub_1",
+                "customer.subscription.created",
+                "evt_2",
+                created=1000,
+                metadata=metadata,
+            )
+        )
+
+        assert Subscription.objects.get().status == "canceled"
+
+    def test_redelivery_skips_processing(self, metadata, django_assert_num_queries):
+        event = subscription_event(
+            "sub_1", "customer.subscription.created", metadata=metadata
+        )
+        post_event(event)
+        StripeEventInbox.process_batch()
+
+        # One INSERT that conflicts; nothing is queued again
+        with django_assert_num_queries(1):
+            assert post_event(event).status_code == 200
+        assert StripeEventInbox.process_batch() == 0
+
+
+@pytest.mark.django_db
+class TestCoalescedProcessing:
+    def store_updates(self, subscriptions, rounds):
+        for index in range(rounds):
+            for subscription in subscriptions:
+                StripeEventInbox.store(
+                    subscription_event(
+                        subscription.stripe_subscription_id,
+                        "customer.subscription.updated",
+                        f"evt_{subscription.pk}_{index}",
+                        created=1000 + index,
+                        status="past_due" if index % 2 else "active",
+                        cancel_at_period_end=index == rounds - 1,
+                    )
+                )
+
+    def test_latest_state_wins(self, django_assert_max_num_queries):
+        subscriptions = SubscriptionFactory.create_batch(5)
+        self.store_updates(subscriptions, rounds=4)
+
+        # Claim, lock, owners, bulk update, rollups, mark processed (+ savepoints)
+        with django_assert_max_num_queries(16):
+            assert StripeEventInbox.process_batch(100, coalesce=True) == 20
+
+        for subscription in subscriptions:
+            subscription.refresh_from_db()
+            assert subscription.status == "past_due"
+            assert subscription.cancel_at_period_end is True
+            assert subscription.last_event_created.timestamp() == 1003
+        assert set(StripeEvent.objects.values_list("status", "attempts")) == {
+            (StripeEvent.PROCESSED, 1)
+        }
+
+    def test_stale_events_are_ignored(self):
+        subscription = SubscriptionFactory(
+            status="canceled",
+            last_event_created=timezone.datetime.fromtimestamp(
+                5000, tz=timezone.timezone.utc
+            ),
+        )
+        self.store_updates([subscription], rounds=2)
+
+        StripeEventInbox.process_batch(coalesce=True)
+
+        subscription.refresh_from_db()
+        assert subscription.status == "canceled"
+
+    def test_new_subscriptions_are_created_in_bulk(self):
+        user = UserAccountFactory()
+        plan = PlanFactory()
+        metadata = {"user_id": str(user.id), "plan_id": str(plan.id)}
+        StripeEventInbox.store(
+            subscription_event(
+                "sub_new",
+                "customer.subscription.created",
+                created=1000,
+                metadata=metadata,
+            )
+        )
+        StripeEventInbox.store(
+            subscription_event(
+                "sub_new",
+                "customer.subscription.deleted",
+                "evt_2",
+                created=1001,
+                metadata=metadata,
+            )
+        )
+
+        StripeEventInbox.process_batch(coalesce=True)
+
+        subscription = Subscription.objects.get(stripe_subscription_id="sub_new")
+        assert subscription.user == user
+        assert subscription.status == "canceled"
+
+    def test_unresolvable_events_fall_back_to_one_by_one(self):
+        StripeEventInbox.store(
+            subscription_event("sub_missing", "customer.subscription.updated")
+        )
+        self.store_updates([SubscriptionFactory()], rounds=1)
+
+        StripeEventInbox.process_batch(coalesce=True)
+
+        failed = StripeEvent.objects.get(stripe_event_id="evt_1")
+        assert failed.status == StripeEvent.PENDING
+        assert "Missing user_id" in failed.last_error
+        assert StripeEvent.objects.filter(status=StripeEvent.PROCESSED).count() == 1
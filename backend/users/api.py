@@ -1,26 +1,61 @@
 from django.contrib.auth import get_user_model
-from django.db import transaction
+from django.db import IntegrityError, transaction
 from django.http import HttpResponse, JsonResponse
 from ninja_extra import api_controller, route
 from ninja_extra.exceptions import APIException
-from ninja_jwt.authentication import JWTAuth
 from ninja_jwt.controller import TokenObtainPairController
+from ninja_jwt.exceptions import AuthenticationFailed, TokenError
 from ninja_jwt.tokens import RefreshToken
 
 from core import settings
+from core.etag import etag
 
+from .authentication import AsyncClaimsJWTAuth, ClaimsJWTAuth
+from .keys import jwks
+from .revocation import revocation_list
 from .schemas import (
+    LoginSchema,
     MyTokenObtainPairSchema,
     SocialAuthSchema,
     TokenResponseSchema,
     UserCreateSchema,
     UserSchema,
 )
-from .services import SocialAuthService
+from .services import AuthService, SocialAuthService
+from .throttling import TokenBucketThrottle
+from .tokens import (
+    aaccess_token_for_refresh,
+    access_token_for_refresh,
+    arotate_refresh_token,
+    rotate_refresh_token,
+)
 
 User = get_user_model()
 
 
+def me_etag(request) -> str:
+    """Validator for /auth/me: the fields UserSchema renders"""
+    user = request.user
+    return f"{user.pk}:{user.email}:{user.first_name}:{user.last_name}"
+
+
+async def ame_etag(request) -> str:
+    return me_etag(request)
+
+
+def set_refresh_cookie(response, refresh_token):
+    """Set the refresh token in an HttpOnly cookie"""
+    response.set_cookie(
+        key=settings.REFRESH_COOKIE,
+        value=refresh_token,
+        max_age=settings.AUTH_COOKIE_MAX_AGE,
+        path=settings.AUTH_COOKIE_PATH,
+        secure=settings.AUTH_COOKIE_SECURE,
+        httponly=settings.AUTH_COOKIE_HTTP_ONLY,
+        samesite=settings.AUTH_COOKIE_SAMESITE,
+    )
+
+
 @api_controller("/auth", tags=["Auth"])
 class AuthController(TokenObtainPairController):
     @route.post(
@@ -28,6 +63,7 @@ class AuthController(TokenObtainPairController):
         response=TokenResponseSchema,
         url_name="login",
         auth=None,
+        throttle=TokenBucketThrottle("login"),
         operation_id="login",
     )
     def obtain_token(self, user_token: MyTokenObtainPairSchema):
@@ -40,15 +76,7 @@ class AuthController(TokenObtainPairController):
             }
         )
         # Set cookies refresh token in HttpOnly cookie
-        response.set_cookie(
-            key=settings.REFRESH_COOKIE,
-            value=token_data.refresh,
-            max_age=settings.AUTH_COOKIE_MAX_AGE,
-            path=settings.AUTH_COOKIE_PATH,
-            secure=settings.AUTH_COOKIE_SECURE,
-            httponly=settings.AUTH_COOKIE_HTTP_ONLY,
-            samesite=settings.AUTH_COOKIE_SAMESITE,
-        )
+        set_refresh_cookie(response, token_data.refresh)
 
         return response
 
@@ -64,26 +92,18 @@ class AuthController(TokenObtainPairController):
             refresh_token = request.COOKIES.get(settings.REFRESH_COOKIE)
             if not refresh_token:
                 raise APIException(detail="Refresh token not found", code=500)
-            # Create access token instance
-            refresh_token = RefreshToken(refresh_token)
+            # Revoke the presented token and issue a replacement
+            refresh_token = rotate_refresh_token(RefreshToken(refresh_token))
 
             # Generate new access token
-            access_token = str(refresh_token.access_token)
+            access_token = str(access_token_for_refresh(refresh_token))
 
             response = JsonResponse(
                 {"detail": "Token refreshed successfully", "access": access_token}
             )
 
             # Set cookies refresh token in HttpOnly cookie
-            response.set_cookie(
-                key=settings.REFRESH_COOKIE,
-                value=refresh_token,
-                max_age=settings.AUTH_COOKIE_MAX_AGE,
-                path=settings.AUTH_COOKIE_PATH,
-                secure=settings.AUTH_COOKIE_SECURE,
-                httponly=settings.AUTH_COOKIE_HTTP_ONLY,
-                samesite=settings.AUTH_COOKIE_SAMESITE,
-            )
+            set_refresh_cookie(response, refresh_token)
             return response
 
         except Exception as e:
@@ -91,7 +111,14 @@ class AuthController(TokenObtainPairController):
 
     @route.post("/logout", response={204: None}, auth=None, operation_id="logout")
     def logout(self, request):
-        """Logout user by clearing auth cookies"""
+        """Logout user by revoking the refresh token and clearing auth cookies"""
+        refresh_token = request.COOKIES.get(settings.REFRESH_COOKIE)
+        if refresh_token:
+            try:
+                revocation_list.revoke(RefreshToken(refresh_token))
+            except TokenError:
+                pass  # Invalid, expired or already revoked
+
         response = HttpResponse(status=204)
 
         # Delete refresh cookie
@@ -103,27 +130,45 @@ class AuthController(TokenObtainPairController):
 
         return response
 
-    @route.post("/register", response=UserSchema, auth=None, operation_id="register")
-    @transaction.atomic
+    @route.post(
+        "/register",
+        response=UserSchema,
+        auth=None,
+        throttle=TokenBucketThrottle("register"),
+        operation_id="register",
+    )
     def register(self, request, data: UserCreateSchema):
-        if User.objects.filter(email=data.email).exists():
+        # A single INSERT; the unique constraint on email rejects duplicates,
+        # including concurrent sign-ups for the same address
+        try:
+            with transaction.atomic():
+                user = User.objects.create_user(
+                    email=data.email,
+                    password=data.password,
+                    first_name=data.first_name,
+                    last_name=data.last_name,
+                    is_active=True,  # Set to false if we want to require activation
+                )
+        except IntegrityError:
             return self.create_response("Email already registered", status_code=400)
 
-        user = User.objects.create_user(
-            email=data.email,
-            password=data.password,
-            first_name=data.first_name,
-            last_name=data.last_name,
-            is_active=True,  # Set to false if we want to require activation
-        )
-
         return user
 
-    @route.get("/me", response={200: UserSchema}, auth=JWTAuth(), operation_id="me")
+    @route.get(
+        "/me", response={200: UserSchema}, auth=ClaimsJWTAuth(), operation_id="me"
+    )
+    @etag(me_etag)
     def get_user(self, request):
         """Get the current authenticated user's information"""
         return UserSchema.from_orm(request.user)
 
+    @route.get("/jwks.json", auth=None, operation_id="jwks")
+    def get_jwks(self, request):
+        """Public keys for verifying access tokens without calling this API"""
+        response = HttpResponse(jwks(), content_type="application/json")
+        response["Cache-Control"] = f"public, max-age={settings.JWT_JWKS_MAX_AGE}"
+        return response
+
     @route.post(
         "/social", response=TokenResponseSchema, auth=None, operation_id="social_auth"
     )
@@ -150,15 +195,139 @@ class AuthController(TokenObtainPairController):
             )
 
             # Set refresh token in cookie
-            response.set_cookie(
-                key=settings.REFRESH_COOKIE,
-                value=tokens["refresh"],
-                max_age=settings.AUTH_COOKIE_MAX_AGE,
-                path=settings.AUTH_COOKIE_PATH,
-                secure=settings.AUTH_COOKIE_SECURE,
-                httponly=settings.AUTH_COOKIE_HTTP_ONLY,
-                samesite=settings.AUTH_COOKIE_SAMESITE,
+            set_refresh_cookie(response, tokens["refresh"])
+
+            return response
+
+        except APIException:
+            raise
+        except Exception as e:
+            raise APIException(
+                detail=f"Social authentication failed: {str(e)}", code=400
+            ) from e
+
+
+@api_controller("/auth", tags=["Auth"])
+class AsyncAuthController(AuthController):
+    """
+    Async variant of ``AuthController`` for ASGI deployments.
+
+    Routes keep the same paths, payloads and operation ids, so only one of the
+    two controllers is registered (see ``AUTH_ASYNC_ROUTES``). Database access
+    goes through the async ORM and password hashing and Google key fetches run
+    in worker threads, so none of these routes occupy the thread that Django
+    uses for sync views.
+    """
+
+    @route.post(
+        "/login",
+        response=TokenResponseSchema,
+        url_name="login",
+        auth=None,
+        throttle=TokenBucketThrottle("login"),
+        operation_id="login",
+    )
+    async def obtain_token(self, data: LoginSchema):
+        user = await AuthService.aauthenticate(data.email, data.password)
+        if user is None:
+            raise AuthenticationFailed(
+                "No active account found with the given credentials"
+            )
+
+        tokens = SocialAuthService.generate_jwt_tokens(user)
+
+        response = JsonResponse(
+            {
+                "detail": "Token refreshed successfully",
+                "access": tokens["access"],
+            }
+        )
+        set_refresh_cookie(response, tokens["refresh"])
+
+        return response
+
+    @route.post(
+        "/refresh",
+        response={200: TokenResponseSchema, 401: TokenResponseSchema},
+        auth=None,
+        operation_id="refresh",
+    )
+    async def refresh_token(self, request):
+        """Refresh access token using refresh token from cookie"""
+        try:
+            refresh_token = request.COOKIES.get(settings.REFRESH_COOKIE)
+            if not refresh_token:
+                raise APIException(detail="Refresh token not found", code=500)
+            refresh_token = await arotate_refresh_token(RefreshToken(refresh_token))
+
+            response = JsonResponse(
+                {
+                    "detail": "Token refreshed successfully",
+                    "access": str(await aaccess_token_for_refresh(refresh_token)),
+                }
+            )
+            set_refresh_cookie(response, refresh_token)
+            return response
+
+        except Exception as e:
+            return 401, {"detail": str(e), "access": ""}
+
+    @route.post(
+        "/register",
+        response=UserSchema,
+        auth=None,
+        throttle=TokenBucketThrottle("register"),
+        operation_id="register",
+    )
+    async def register(self, request, data: UserCreateSchema):
+        try:
+            user = await AuthService.aregister(
+                email=data.email,
+                password=data.password,
+                first_name=data.first_name,
+                last_name=data.last_name,
+                is_active=True,  # Set to false if we want to require activation
+            )
+        except IntegrityError:
+            return self.create_response("Email already registered", status_code=400)
+
+        return user
+
+    @route.get(
+        "/me",
+        response={200: UserSchema},
+        auth=AsyncClaimsJWTAuth(),
+        operation_id="me",
+    )
+    @etag(ame_etag)
+    async def get_user(self, request):
+        """Get the current authenticated user's information"""
+        return UserSchema.from_orm(request.user)
+
+    @route.post(
+        "/social", response=TokenResponseSchema, auth=None, operation_id="social_auth"
+    )
+    async def social_auth(self, request, data: SocialAuthSchema):
+        """Authenticate with social providers (Google, Facebook, etc.)"""
+        try:
+            if data.provider == "google":
+                user = await SocialAuthService.aauthenticate_with_google(
+                    data.credential, request
+                )
+            else:
+                raise APIException(
+                    detail=f"Provider '{data.provider}' not supported", code=400
+                )
+
+            tokens = SocialAuthService.generate_jwt_tokens(user)
+
+            response = JsonResponse(
+                {
+                    "detail": "Authentication successful",
+                    "access": tokens["access"],
+                }
             )
+            set_refresh_cookie(response, tokens["refresh"])
 
             return response
 
@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class UsersConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "users"
+
+    def ready(self):
+        from django.conf import settings
+        from django.core import checks
+
+        from . import signals  # noqa: F401
+        from .keys import check_signing_key, install_key_ring
+
+        checks.register(check_signing_key, checks.Tags.security)
+        if settings.JWT_KEYS_DIR:
+            install_key_ring(settings.JWT_KEYS_DIR, settings.JWT_SIGNING_KID)
@@ -0,0 +1,180 @@
+import copy
+import hashlib
+import time
+from typing import Any
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpRequest
+from django.utils.translation import gettext_lazy as _
+from ninja_extra.security import AsyncHttpBearer
+from ninja_jwt.authentication import JWTAuth, JWTBaseAuthentication
+from ninja_jwt.exceptions import AuthenticationFailed, InvalidToken
+from ninja_jwt.settings import api_settings
+
+from core import metrics
+from core.cache import TTLCache
+
+from .tokens import has_user_claims
+
+# Fields loaded for cached users; the password hash is left out on purpose
+SLIM_USER_FIELDS = (
+    "id",
+    "email",
+    "first_name",
+    "last_name",
+    "is_active",
+    "is_staff",
+    "is_superuser",
+)
+
+# Per-process caches used by CachedJWTAuth, see users.signals for invalidation
+token_cache = TTLCache(settings.AUTH_CACHE_MAXSIZE, settings.AUTH_CACHE_TTL)
+user_cache = TTLCache(settings.AUTH_CACHE_MAXSIZE, settings.AUTH_CACHE_TTL)
+
+metrics.register("auth_token_cache", token_cache.stats)
+metrics.register("auth_user_cache", user_cache.stats)
+
+
+class AsyncJWTAuth(JWTBaseAuthentication, AsyncHttpBearer):
+    """
+    JWT authentication for async routes.
+
+    Token validation is pure CPU work and runs inline on the event loop; the
+    user lookup goes through Django's async ORM instead of a ``sync_to_async``
+    thread hop.
+    """
+
+    async def authenticate(self, request: HttpRequest, token: str) -> Any:
+        request.user = AnonymousUser()
+        validated_token = self.get_validated_token(token)
+        user = await self.aget_user(validated_token)
+        request.user = user
+        return user
+
+    async def aget_user(self, validated_token) -> Any:
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(
+                _("Token contained no recognizable user identification")
+            ) from e
+
+        try:
+            user = await self.user_model.objects.aget(
+                **{api_settings.USER_ID_FIELD: user_id}
+            )
+        except self.user_model.DoesNotExist as e:
+            raise AuthenticationFailed(_("User not found")) from e
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"))
+
+        return user
+
+
+class CachedJWTAuth(JWTAuth):
+    """
+    Drop-in replacement for ``JWTAuth`` that caches verified tokens and users.
+
+    Verified tokens are cached by the SHA-256 digest of the raw token until
+    they expire (at most AUTH_CACHE_TTL), and users by id as slim instances
+    without the password hash. User entries are dropped by the
+    ``post_save``/``post_delete`` signals of ``UserAccount``, so deactivation
+    takes effect immediately in the process that saved the user and within
+    AUTH_CACHE_TTL in every other process. ``QuerySet.update()`` does not
+    send these signals.
+    """
+
+    @classmethod
+    def get_validated_token(cls, raw_token):
+        key = hashlib.sha256(raw_token.encode()).digest()
+        validated_token = token_cache.get(key)
+        if validated_token is None:
+            validated_token = super().get_validated_token(raw_token)
+            token_cache.set(
+                key, validated_token, ttl=validated_token["exp"] - time.time()
+            )
+        return validated_token
+
+    def get_user(self, validated_token) -> Any:
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(
+                _("Token contained no recognizable user identification")
+            ) from e
+
+        user = user_cache.get(user_id)
+        if user is None:
+            try:
+                user = self.user_model.objects.only(*SLIM_USER_FIELDS).get(
+                    **{api_settings.USER_ID_FIELD: user_id}
+                )
+            except self.user_model.DoesNotExist as e:
+                raise AuthenticationFailed(_("User not found")) from e
+            user_cache.set(user_id, user)
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"))
+
+        # Hand every request its own copy so per-request state never leaks
+        return copy.copy(user)
+
+
+class AsyncCachedJWTAuth(AsyncJWTAuth):
+    """Async variant of ``CachedJWTAuth``, sharing its token and user caches"""
+
+    def get_validated_token(self, raw_token):
+        return CachedJWTAuth.get_validated_token(raw_token)
+
+    async def aget_user(self, validated_token) -> Any:
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(
+                _("Token contained no recognizable user identification")
+            ) from e
+
+        user = user_cache.get(user_id)
+        if user is None:
+            try:
+                user = await self.user_model.objects.only(*SLIM_USER_FIELDS).aget(
+                    **{api_settings.USER_ID_FIELD: user_id}
+                )
+            except self.user_model.DoesNotExist as e:
+                raise AuthenticationFailed(_("User not found")) from e
+            user_cache.set(user_id, user)
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"))
+
+        return copy.copy(user)
+
+
+class ClaimsJWTAuth(CachedJWTAuth):
+    """
+    JWT authentication that trusts the profile claims of the access token.
+
+    With AUTH_USER_CLAIMS enabled, ``request.user`` is a ``TokenUser`` built
+    from the verified token and no query is made. Its ``email``,
+    ``first_name`` and ``last_name`` can be up to ACCESS_TOKEN_LIFETIME old,
+    and a deactivated user keeps access until the token expires. Only use it
+    on routes that just read those claims; anything that needs a model
+    instance (e.g. to filter related rows) should keep using ``JWTAuth``.
+    Tokens without the claims fall back to the cached user lookup.
+    """
+
+    def get_user(self, validated_token) -> Any:
+        if settings.AUTH_USER_CLAIMS and has_user_claims(validated_token):
+            return api_settings.TOKEN_USER_CLASS(validated_token)
+        return super().get_user(validated_token)
+
+
+class AsyncClaimsJWTAuth(AsyncCachedJWTAuth):
+    """Async variant of ``ClaimsJWTAuth``"""
+
+    async def aget_user(self, validated_token) -> Any:
+        if settings.AUTH_USER_CLAIMS and has_user_claims(validated_token):
+            return api_settings.TOKEN_USER_CLASS(validated_token)
+        return await super().aget_user(validated_token)
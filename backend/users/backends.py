@@ -0,0 +1,37 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from .hashers import hash_password, verify_password
+
+UserModel = get_user_model()
+
+
+class HashingExecutorBackend(ModelBackend):
+    """
+    ``ModelBackend`` that checks passwords on the bounded hashing executor.
+
+    On a successful login, hashes made with another hasher or cost than the
+    configured one are re-hashed and saved.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Run the default password hasher once to reduce the timing
+            # difference between an existing and a nonexistent user (#20760).
+            hash_password(password)
+            return None
+
+        is_correct, must_update = verify_password(password, user.password)
+        if not (is_correct and self.user_can_authenticate(user)):
+            return None
+
+        if must_update:
+            user.password = hash_password(password)
+            user.save(update_fields=["password"])
+        return user
@@ -0,0 +1,140 @@
+import re
+import threading
+import time
+
+import jwt
+from django.conf import settings
+
+from core.http import http_client
+
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+
+MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+
+class GoogleJWKSCache:
+    """
+    Process-wide cache of Google's public signing keys.
+
+    Keys are fetched once, kept for as long as Google's Cache-Control allows
+    and refreshed in a background thread shortly before they expire, so the
+    request path never waits on Google once the cache is warm. A token signed
+    with an unknown ``kid`` triggers at most one synchronous refetch per
+    ``min_refetch_interval`` to pick up freshly rotated keys without letting
+    garbage tokens hammer Google.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        timeout: float = 5,
+        default_max_age: int = 3600,
+        refresh_margin: int = 300,
+        min_refetch_interval: int = 30,
+    ):
+        self.url = url
+        self.timeout = timeout
+        self.default_max_age = default_max_age
+        self.refresh_margin = refresh_margin
+        self.min_refetch_interval = min_refetch_interval
+
+        self._keys: dict[str, jwt.PyJWK] = {}
+        self._expires_at = 0.0
+        self._fetched_at = 0.0
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def get_signing_key(self, kid: str) -> jwt.PyJWK:
+        """Return the key for ``kid``, fetching or refreshing keys as needed"""
+        if not self._keys:
+            self.refresh()
+        elif time.monotonic() >= self._expires_at - self.refresh_margin:
+            self._refresh_in_background()
+
+        key = self._keys.get(kid)
+        if key is None and self._may_refetch():
+            self.refresh()
+            key = self._keys.get(kid)
+
+        if key is None:
+            raise jwt.InvalidTokenError(f"Unknown signing key: {kid}")
+
+        return key
+
+    def refresh(self) -> None:
+        """Fetch the current key set from Google and replace the cache"""
+        response = http_client.get(self.url, timeout=self.timeout)
+        response.raise_for_status()
+
+        keys = {
+            key.key_id: key
+            for key in jwt.PyJWKSet.from_dict(response.json()).keys
+            if key.key_id
+        }
+        max_age = self._parse_max_age(response.headers)
+
+        with self._lock:
+            now = time.monotonic()
+            self._keys = keys
+            self._fetched_at = now
+            self._expires_at = now + max_age
+
+    def clear(self) -> None:
+        with self._lock:
+            self._keys = {}
+            self._expires_at = 0.0
+            self._fetched_at = 0.0
+
+    def _may_refetch(self) -> bool:
+        with self._lock:
+            return time.monotonic() - self._fetched_at >= self.min_refetch_interval
+
+    def _refresh_in_background(self) -> None:
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        threading.Thread(target=self._background_refresh, daemon=True).start()
+
+    def _background_refresh(self) -> None:
+        try:
+            self.refresh()
+        except Exception:
+            # Keep serving the cached keys; the next request retries
+            pass
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _parse_max_age(self, headers) -> int:
+        match = MAX_AGE_RE.search(headers.get("Cache-Control", ""))
+        if not match:
+            return self.default_max_age
+
+        age = headers.get("Age", "0")
+        return max(int(match.group(1)) - (int(age) if age.isdigit() else 0), 0)
+
+
+google_jwks = GoogleJWKSCache(settings.GOOGLE_OAUTH2_CERTS_URL)
+
+
+def verify_google_id_token(credential: str) -> dict:
+    """
+    Verify a Google ID token locally and return its claims.
+
+    Checks the RS256 signature against Google's cached public keys as well
+    as the ``aud``, ``iss`` and ``exp`` claims. Raises ``jwt.InvalidTokenError``
+    when any check fails.
+    """
+    header = jwt.get_unverified_header(credential)
+    signing_key = google_jwks.get_signing_key(header.get("kid"))
+
+    return jwt.decode(
+        credential,
+        key=signing_key.key,
+        algorithms=["RS256"],
+        audience=settings.GOOGLE_OAUTH2_CLIENT_ID,
+        issuer=GOOGLE_ISSUERS,
+        options={"require": ["aud", "iss", "exp", "sub"]},
+    )
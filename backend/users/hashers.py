@@ -0,0 +1,62 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class TunablePBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 with the iteration count taken from PBKDF2_ITERATIONS"""
+
+    @property
+    def iterations(self):
+        return settings.PBKDF2_ITERATIONS or hashers.PBKDF2PasswordHasher.iterations
+
+
+class TunableArgon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """Argon2 with its cost parameters taken from the ARGON2_* settings"""
+
+    @property
+    def time_cost(self):
+        return settings.ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.ARGON2_PARALLELISM
+
+
+# PBKDF2 (hashlib) and Argon2 (argon2-cffi) release the GIL, so a small pool
+# hashes in parallel while bounding how many cores logins can occupy.
+executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASHING_WORKERS,
+    thread_name_prefix="password-hashing",
+)
+
+
+def hash_password(password: str | None) -> str:
+    """``make_password`` on the hashing executor"""
+    return executor.submit(hashers.make_password, password).result()
+
+
+async def ahash_password(password: str | None) -> str:
+    return await asyncio.wrap_future(executor.submit(hashers.make_password, password))
+
+
+def verify_password(password: str, encoded: str) -> tuple[bool, bool]:
+    """
+    Run ``django.contrib.auth.hashers.verify_password`` on the hashing executor.
+
+    Returns ``(is_correct, must_update)``; ``must_update`` is set when the hash
+    was made with another hasher or cost than the configured one.
+    """
+    return executor.submit(hashers.verify_password, password, encoded).result()
+
+
+async def averify_password(password: str, encoded: str) -> tuple[bool, bool]:
+    return await asyncio.wrap_future(
+        executor.submit(hashers.verify_password, password, encoded)
+    )
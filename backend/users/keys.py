@@ -0,0 +1,162 @@
+import json
+from os import getenv
+from pathlib import Path
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+from django.conf import settings
+from django.core.checks import Warning
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.translation import gettext_lazy as _
+from ninja_jwt import state
+from ninja_jwt.backends import TokenBackend
+from ninja_jwt.exceptions import TokenBackendError
+from ninja_jwt.settings import api_settings
+
+
+class SigningKey:
+    """A private key loaded from ``<kid>.pem`` and its public JWK"""
+
+    def __init__(self, kid: str, private_key):
+        if isinstance(private_key, ec.EllipticCurvePrivateKey) and isinstance(
+            private_key.curve, ec.SECP256R1
+        ):
+            self.algorithm = "ES256"
+            jwk = jwt.algorithms.ECAlgorithm.to_jwk(
+                private_key.public_key(), as_dict=True
+            )
+        elif isinstance(private_key, ed25519.Ed25519PrivateKey):
+            self.algorithm = "EdDSA"
+            jwk = jwt.algorithms.OKPAlgorithm.to_jwk(
+                private_key.public_key(), as_dict=True
+            )
+        else:
+            raise ImproperlyConfigured(
+                f"JWT key {kid!r} must be an EC P-256 (ES256) or Ed25519 (EdDSA) key"
+            )
+
+        self.kid = kid
+        self.private_key = private_key
+        self.public_key = private_key.public_key()
+        self.jwk = {**jwk, "kid": kid, "alg": self.algorithm, "use": "sig"}
+
+    @classmethod
+    def from_file(cls, path: Path) -> "SigningKey":
+        private_key = serialization.load_pem_private_key(
+            path.read_bytes(), password=None
+        )
+        return cls(path.stem, private_key)
+
+
+class KeyRingTokenBackend(TokenBackend):
+    """
+    ninja_jwt token backend signing with one of several asymmetric keys.
+
+    Tokens are signed by the active key and carry its ``kid`` header; any key
+    in the ring verifies. Rotation therefore overlaps: add the new key file
+    (it is published in the JWKS right away), make it active once verifiers
+    have picked it up, and delete the old file after REFRESH_TOKEN_LIFETIME.
+    A ring with more than one key needs an explicit ``active_kid``, so adding
+    a file never switches the signing key by itself.
+    """
+
+    def __init__(self, keys: list[SigningKey], active_kid: str | None = None):
+        if not keys:
+            raise ImproperlyConfigured("No JWT signing keys found")
+
+        self.keys = {key.kid: key for key in keys}
+        if active_kid is None:
+            if len(self.keys) > 1:
+                raise ImproperlyConfigured(
+                    "Several JWT signing keys found; set JWT_SIGNING_KID to "
+                    "the one that signs new tokens"
+                )
+            active_kid = keys[0].kid
+        if active_kid not in self.keys:
+            raise ImproperlyConfigured(f"Unknown JWT signing key {active_kid!r}")
+        self.active = self.keys[active_kid]
+
+        self.algorithm = self.active.algorithm
+        self.signing_key = self.active.private_key
+        self.verifying_key = self.active.public_key
+        self.audience = api_settings.AUDIENCE
+        self.issuer = api_settings.ISSUER
+        self.jwks_client = None
+        self.leeway = api_settings.LEEWAY
+        self.json_encoder = api_settings.JSON_ENCODER
+
+        # Served as-is by /auth/jwks.json
+        self.jwks = json.dumps({"keys": [key.jwk for key in keys]}).encode()
+
+    @classmethod
+    def from_directory(
+        cls, directory: str, active_kid: str | None = None
+    ) -> "KeyRingTokenBackend":
+        """Load every ``*.pem`` in ``directory``; file names are the kids"""
+        paths = sorted(Path(directory).glob("*.pem"))
+        return cls([SigningKey.from_file(path) for path in paths], active_kid)
+
+    def encode(self, payload: dict) -> str:
+        jwt_payload = payload.copy()
+        if self.audience is not None:
+            jwt_payload["aud"] = self.audience
+        if self.issuer is not None:
+            jwt_payload["iss"] = self.issuer
+
+        return jwt.encode(
+            jwt_payload,
+            self.active.private_key,
+            algorithm=self.active.algorithm,
+            headers={"kid": self.active.kid},
+            json_encoder=self.json_encoder,
+        )
+
+    def decode(self, token, verify=True) -> dict:
+        try:
+            key = self.keys.get(jwt.get_unverified_header(token).get("kid"))
+            if key is None:
+                raise TokenBackendError(_("Token is invalid or expired"))
+
+            return jwt.decode(
+                token,
+                key.public_key,
+                algorithms=[key.algorithm],
+                audience=self.audience,
+                issuer=self.issuer,
+                leeway=self.get_leeway(),
+                options={
+                    "verify_aud": self.audience is not None,
+                    "verify_signature": verify,
+                },
+            )
+        except jwt.InvalidTokenError as ex:
+            raise TokenBackendError(_("Token is invalid or expired")) from ex
+
+
+def install_key_ring(directory: str, active_kid: str | None = None) -> None:
+    """Make ninja_jwt sign and verify all tokens with the keys in ``directory``"""
+    state.token_backend = KeyRingTokenBackend.from_directory(directory, active_kid)
+
+
+def jwks() -> bytes:
+    """JWKS document of the current token backend (empty for HMAC signing)"""
+    return getattr(state.token_backend, "jwks", b'{"keys": []}')
+
+
+def check_signing_key(app_configs, **kwargs):
+    """Warn when HS256 tokens are signed with a per-process random SECRET_KEY"""
+    if (
+        settings.JWT_KEYS_DIR
+        or settings.DEVELOPMENT_MODE
+        or getenv("DJANGO_SECRET_KEY")
+    ):
+        return []
+    return [
+        Warning(
+            "JWTs are signed with a randomly generated SECRET_KEY",
+            hint="Set JWT_KEYS_DIR (or DJANGO_SECRET_KEY) so that all workers "
+            "sign and accept the same tokens.",
+            id="users.W001",
+        )
+    ]
@@ -0,0 +1,49 @@
+import os
+from pathlib import Path
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        "Write a new JWT signing key to JWT_KEYS_DIR. It is published in the "
+        "JWKS right away and signs tokens once JWT_SIGNING_KID names it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--algorithm", choices=["ES256", "EdDSA"], default="ES256")
+        parser.add_argument("--dir", default=settings.JWT_KEYS_DIR)
+        parser.add_argument("--kid", help="Key id (default: current UTC time)")
+
+    def handle(self, *args, **options):
+        if not options["dir"]:
+            raise CommandError("Set JWT_KEYS_DIR or pass --dir")
+
+        if options["algorithm"] == "ES256":
+            private_key = ec.generate_private_key(ec.SECP256R1())
+        else:
+            private_key = ed25519.Ed25519PrivateKey.generate()
+
+        kid = options["kid"] or timezone.now().strftime("%Y%m%d%H%M%S")
+        path = Path(options["dir"]) / f"{kid}.pem"
+        if path.exists():
+            raise CommandError(f"{path} already exists")
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        pem = private_key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption(),
+        )
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(pem)
+
+        self.stdout.write(f"Wrote {options['algorithm']} key {kid} to {path}")
+        self.stdout.write(
+            f"Set JWT_SIGNING_KID={kid} once verifiers have fetched the new JWKS"
+        )
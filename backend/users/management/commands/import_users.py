@@ -0,0 +1,177 @@
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from itertools import islice
+from pathlib import Path
+
+import django
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk import users from a CSV or NDJSON file with the columns email, "
+        "first_name, last_name and either password or password_hash"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV/NDJSON file, or - for stdin")
+        parser.add_argument(
+            "--format",
+            choices=["csv", "ndjson"],
+            help="Input format (default: guessed from the file extension)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Rows hashed and inserted per transaction",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Processes used to hash plain-text passwords (0 hashes inline)",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            help="File recording how many rows were imported, used by --resume",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Skip the rows recorded in --checkpoint by a previous run",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        checkpoint = Path(options["checkpoint"]) if options["checkpoint"] else None
+        if options["resume"] and not checkpoint:
+            raise CommandError("--resume requires --checkpoint")
+
+        done = 0
+        if options["resume"] and checkpoint.exists():
+            done = int(checkpoint.read_text().strip() or 0)
+            self.stdout.write(f"Resuming after row {done}")
+
+        pool = (
+            ProcessPoolExecutor(options["workers"], initializer=django.setup)
+            if options["workers"] > 0
+            else nullcontext()
+        )
+
+        source = (
+            nullcontext(sys.stdin)
+            if options["path"] == "-"
+            else open(options["path"], newline="")
+        )
+
+        created = skipped = 0
+        start = time.monotonic()
+        with source as stream, pool:
+            rows = islice(self.read_rows(stream, options), done, None)
+            while batch := list(islice(rows, batch_size)):
+                batch_created, batch_skipped = self.import_batch(batch, pool)
+                created += batch_created
+                skipped += batch_skipped
+                done += len(batch)
+
+                if checkpoint:
+                    checkpoint.write_text(str(done))
+
+                rate = (created + skipped) / max(time.monotonic() - start, 1e-9)
+                self.stdout.write(
+                    f"{done} rows processed: {created} created, "
+                    f"{skipped} skipped ({rate:.0f} rows/s)"
+                )
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Imported {created} users, skipped {skipped}")
+        )
+
+    def read_rows(self, stream, options):
+        fmt = options["format"] or (
+            "ndjson" if options["path"].endswith((".ndjson", ".jsonl")) else "csv"
+        )
+        if fmt == "csv":
+            yield from csv.DictReader(stream)
+        else:
+            for line in stream:
+                if line.strip():
+                    yield json.loads(line)
+
+    def import_batch(self, batch, pool):
+        """Hash and insert one batch; returns (created, skipped)"""
+        users = {}
+        skipped = 0
+        for row in batch:
+            email = (row.get("email") or "").strip()
+            if not email:
+                skipped += 1
+                continue
+            user = User(
+                email=User.objects.normalize_email(email),
+                first_name=row.get("first_name") or "",
+                last_name=row.get("last_name") or "",
+            )
+            # Keep the first occurrence of an email within the batch
+            if user.email in users:
+                skipped += 1
+                continue
+            users[user.email] = (user, row)
+
+        # Existing users are skipped before any hashing, which also makes
+        # re-running an interrupted import cheap
+        existing = set(
+            User.objects.filter(email__in=users).values_list("email", flat=True)
+        )
+        skipped += len(existing)
+        pending = [pair for email, pair in users.items() if email not in existing]
+
+        to_hash = []
+        for user, row in pending:
+            if row.get("password_hash"):
+                try:
+                    identify_hasher(row["password_hash"])
+                except ValueError as e:
+                    raise CommandError(
+                        f"Unrecognized password hash for {user.email}"
+                    ) from e
+                user.password = row["password_hash"]
+            else:
+                to_hash.append((user, row.get("password") or None))
+
+        passwords = [password for _, password in to_hash]
+        hashed = (
+            pool.map(make_password, passwords, chunksize=64)
+            if isinstance(pool, ProcessPoolExecutor)
+            else map(make_password, passwords)
+        )
+        for (user, _), password in zip(to_hash, hashed, strict=True):
+            user.password = password
+
+        # ignore_conflicts covers emails inserted concurrently by sign-ups
+        with transaction.atomic():
+            User.objects.bulk_create(
+                [user for user, _ in pending], ignore_conflicts=True
+            )
+
+        # Rows dropped as conflicts hold someone else's password (hashes are
+        # salted), so only rows with ours were created by this batch
+        passwords = {user.email: user.password for user, _ in pending}
+        created = sum(
+            passwords[email] == password
+            for email, password in User.objects.filter(email__in=passwords).values_list(
+                "email", "password"
+            )
+        )
+        return created, skipped + len(pending) - created
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from users.models import RevokedToken
+
+
+class Command(BaseCommand):
+    help = "Delete revoked refresh tokens that have expired anyway"
+
+    def handle(self, *args, **options):
+        deleted, _ = RevokedToken.objects.filter(
+            expires_at__lte=timezone.now()
+        ).delete()
+        self.stdout.write(f"Deleted {deleted} expired revoked tokens")
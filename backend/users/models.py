@@ -5,18 +5,38 @@ from django.contrib.auth.models import (
 )
 from django.db import models
 
+from .hashers import ahash_password, hash_password
+
 
 class UserAccountManager(BaseUserManager):
-    def create_user(self, email, password=None, **kwargs):
+    @classmethod
+    def normalize_email(cls, email):
+        """Emails are stored fully lowercased, not just the domain part"""
+        return super().normalize_email(email).lower()
+
+    def _new_user(self, email, **kwargs):
         if not email:
             raise ValueError("Users must have an email address")
 
         email = self.normalize_email(email)
-        email = email.lower()
 
-        user = self.model(email=email, **kwargs)
+        return self.model(email=email, **kwargs)
+
+    def build_user(self, email, password=None, **kwargs):
+        """Return an unsaved user with a normalized email and hashed password"""
+        user = self._new_user(email, **kwargs)
+        user.password = hash_password(password)
 
-        user.set_password(password)
+        return user
+
+    async def abuild_user(self, email, password=None, **kwargs):
+        user = self._new_user(email, **kwargs)
+        user.password = await ahash_password(password)
+
+        return user
+
+    def create_user(self, email, password=None, **kwargs):
+        user = self.build_user(email, password=password, **kwargs)
         user.save(using=self._db)
 
         return user
@@ -47,3 +67,14 @@ class UserAccount(AbstractBaseUser, PermissionsMixin):
 
     def __str__(self):
         return self.email
+
+
+class RevokedToken(models.Model):
+    """Refresh token ids (jti) that were rotated or logged out"""
+
+    jti = models.CharField(max_length=255, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.jti
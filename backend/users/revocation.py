@@ -0,0 +1,154 @@
+import hashlib
+import math
+import threading
+import time
+from datetime import UTC, datetime
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from ninja_jwt.exceptions import TokenError
+
+from .models import RevokedToken
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings using double hashing"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(capacity, 1)
+        self.size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hash_count = max(round(self.size / capacity * math.log(2)), 1)
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+
+class RevocationList:
+    """
+    Per-process view of the ``RevokedToken`` table.
+
+    ``is_revoked`` checks a Bloom filter built from the table and only asks
+    the database on a probable hit, so checking a token that was never
+    revoked is query-free. The filter picks up rows written by other
+    processes every REFRESH_REVOCATION_SYNC_INTERVAL seconds and is rebuilt
+    from the unexpired rows when it fills up.
+
+    The filter is an early reject only: ``revoke`` inserts the jti under a
+    unique constraint, so a rotated or logged-out token that another process
+    has not synced yet still fails when it is rotated again.
+    """
+
+    def __init__(self, sync_interval: float, capacity: int, error_rate: float):
+        self.sync_interval = sync_interval
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._filter = BloomFilter(capacity, error_rate)
+        self._count = 0
+        self._last_id = 0
+        self._synced_at = None
+        self._lock = threading.Lock()
+
+    def is_revoked(self, jti: str) -> bool:
+        if self._sync_due():
+            self.sync()
+        if jti not in self._filter:
+            return False
+        return RevokedToken.objects.filter(jti=jti).exists()
+
+    async def ais_revoked(self, jti: str) -> bool:
+        if self._sync_due():
+            await sync_to_async(self.sync)()
+        if jti not in self._filter:
+            return False
+        return await RevokedToken.objects.filter(jti=jti).aexists()
+
+    def revoke(self, token) -> None:
+        """Record ``token`` as revoked; raises TokenError if it already was"""
+        try:
+            with transaction.atomic():
+                RevokedToken.objects.create(
+                    jti=token["jti"], expires_at=_expires_at(token)
+                )
+        except IntegrityError as e:
+            raise TokenError("Token is revoked") from e
+        self._add(token["jti"])
+
+    async def arevoke(self, token) -> None:
+        try:
+            await RevokedToken.objects.acreate(
+                jti=token["jti"], expires_at=_expires_at(token)
+            )
+        except IntegrityError as e:
+            raise TokenError("Token is revoked") from e
+        self._add(token["jti"])
+
+    def sync(self) -> None:
+        """Load revocations recorded since the last sync, rebuilding if full"""
+        with self._lock:
+            rows = RevokedToken.objects.filter(id__gt=self._last_id).values_list(
+                "id", "jti"
+            )
+            for row_id, jti in rows:
+                self._add_locked(jti)
+                self._last_id = max(self._last_id, row_id)
+
+            if self._count > self.capacity:
+                self._rebuild_locked()
+
+            self._synced_at = time.monotonic()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._filter = BloomFilter(self.capacity, self.error_rate)
+            self._count = 0
+            self._last_id = 0
+            self._synced_at = None
+
+    def _rebuild_locked(self) -> None:
+        active = RevokedToken.objects.filter(expires_at__gt=timezone.now())
+        self.capacity = max(self.capacity, active.count() * 2)
+        self._filter = BloomFilter(self.capacity, self.error_rate)
+        self._count = 0
+        for jti in active.values_list("jti", flat=True).iterator():
+            self._add_locked(jti)
+
+    def _add(self, jti: str) -> None:
+        with self._lock:
+            self._add_locked(jti)
+
+    def _add_locked(self, jti: str) -> None:
+        self._filter.add(jti)
+        self._count += 1
+
+    def _sync_due(self) -> bool:
+        return (
+            self._synced_at is None
+            or time.monotonic() - self._synced_at >= self.sync_interval
+        )
+
+
+def _expires_at(token) -> datetime:
+    return datetime.fromtimestamp(token["exp"], tz=UTC)
+
+
+revocation_list = RevocationList(
+    sync_interval=settings.REFRESH_REVOCATION_SYNC_INTERVAL,
+    capacity=settings.REFRESH_REVOCATION_CAPACITY,
+    error_rate=settings.REFRESH_REVOCATION_ERROR_RATE,
+)
@@ -3,6 +3,8 @@ from ninja.errors import ValidationError
 from ninja_jwt.schema import TokenObtainPairInputSchema  # updated base class
 from pydantic import ValidationInfo, field_validator
 
+from .tokens import refresh_token_for_user
+
 
 class UserSchema(Schema):
     first_name: str
@@ -25,6 +27,11 @@ class UserCreateSchema(Schema):
         return value
 
 
+class LoginSchema(Schema):
+    email: str
+    password: str
+
+
 class SocialAuthSchema(Schema):
     """Schema for social authentication"""
 
@@ -39,6 +46,11 @@ class MyTokenObtainPairOutSchema(Schema):
 
 
 class MyTokenObtainPairSchema(TokenObtainPairInputSchema):
+    @classmethod
+    def get_token(cls, user) -> dict:
+        refresh = refresh_token_for_user(user)
+        return {"refresh": str(refresh), "access": str(refresh.access_token)}
+
     def output_schema(self):
         out_dict = self.get_response_schema_init_kwargs()
         out_dict.update(user=UserSchema.from_orm(self._user))
@@ -1,92 +1,190 @@
-import requests
+import jwt
 from allauth.socialaccount.models import SocialAccount
-from django.conf import settings
+from asgiref.sync import sync_to_async
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
 from ninja_extra.exceptions import APIException
-from ninja_jwt.tokens import RefreshToken
+
+from .google import verify_google_id_token
+from .hashers import ahash_password, averify_password
+from .tokens import refresh_token_for_user
 
 User = get_user_model()
 
 
+class AuthService:
+    """Service for password authentication and registration on async routes"""
+
+    @staticmethod
+    async def aauthenticate(email: str, password: str):
+        """
+        Async counterpart of ``django.contrib.auth.authenticate`` for email logins.
+
+        Password hashing runs on the hashing executor so it never blocks the
+        event loop, and outdated hashes are upgraded on success.
+        """
+        user = await User.objects.filter(email=email).afirst()
+
+        if user is None:
+            # Run the hasher anyway to reduce the timing difference between
+            # an existing and a nonexistent user (see ModelBackend.authenticate)
+            await ahash_password(password)
+            return None
+
+        is_correct, must_update = await averify_password(password, user.password)
+        if not (is_correct and user.is_active):
+            return None
+
+        if must_update:
+            user.password = await ahash_password(password)
+            await user.asave(update_fields=["password"])
+        return user
+
+    @staticmethod
+    async def aregister(email: str, password: str | None = None, **kwargs):
+        """Create a user without blocking the event loop on password hashing"""
+        user = await User.objects.abuild_user(email, password=password, **kwargs)
+        await user.asave()
+        return user
+
+
 class SocialAuthService:
     """Service for handling social authentication with allauth"""
 
+    @staticmethod
+    def get_google_user_data(credential: str) -> dict:
+        """Verify a Google ID token and extract the user information from it"""
+        # Verify the JWT token locally against Google's public keys
+        try:
+            token_info = verify_google_id_token(credential)
+        except jwt.InvalidTokenError as e:
+            raise APIException(detail="Invalid Google credential", code=400) from e
+
+        # Extract user information
+        user_data = {
+            "id": token_info.get("sub"),
+            "email": token_info.get("email"),
+            "given_name": token_info.get("given_name", ""),
+            "family_name": token_info.get("family_name", ""),
+            "picture": token_info.get("picture", ""),
+            "email_verified": token_info.get("email_verified", False),
+        }
+
+        if not user_data.get("email"):
+            raise APIException(detail="No email provided by Google", code=400)
+
+        return user_data
+
     @staticmethod
     def authenticate_with_google(credential: str, request=None):
         """
         Authenticate user with Google JWT credential (ID token)
+
+        Returning users are found with one query joining the social account to
+        its user; first logins go through ``link_google_account``.
         """
         try:
-            # Verify the JWT token with Google
-            response = requests.get(
-                f"https://www.googleapis.com/oauth2/v3/tokeninfo?id_token={credential}",
-                timeout=10,
+            user_data = SocialAuthService.get_google_user_data(credential)
+
+            account = (
+                SocialAccount.objects.select_related("user")
+                .filter(provider="google", uid=user_data["id"])
+                .first()
             )
+            if account is None:
+                return SocialAuthService.link_google_account(user_data)
 
-            if response.status_code != 200:
-                raise APIException(detail="Invalid Google credential", code=400)
+            if account.extra_data != user_data:
+                account.extra_data = user_data
+                account.save(update_fields=["extra_data"])
+            return account.user
 
-            token_info = response.json()
+        except Exception as e:
+            if isinstance(e, APIException):
+                raise
+            raise APIException(
+                detail=f"Google authentication failed: {str(e)}", code=400
+            ) from e
 
-            # Verify the token is for our app
-            if token_info.get("aud") != settings.GOOGLE_OAUTH2_CLIENT_ID:
-                raise APIException(detail="Invalid token audience", code=400)
+    @staticmethod
+    async def aauthenticate_with_google(credential: str, request=None):
+        """
+        Async variant of ``authenticate_with_google``.
 
-            # Extract user information
-            user_data = {
-                "id": token_info.get("sub"),
-                "email": token_info.get("email"),
-                "given_name": token_info.get("given_name", ""),
-                "family_name": token_info.get("family_name", ""),
-                "picture": token_info.get("picture", ""),
-                "email_verified": token_info.get("email_verified", False),
-            }
+        Verification may fetch Google's keys on a cold cache, so it runs in a
+        worker thread; the returning-user lookup uses the async ORM.
+        """
+        try:
+            user_data = await sync_to_async(
+                SocialAuthService.get_google_user_data, thread_sensitive=False
+            )(credential)
+
+            account = await (
+                SocialAccount.objects.select_related("user")
+                .filter(provider="google", uid=user_data["id"])
+                .afirst()
+            )
+            if account is None:
+                return await sync_to_async(SocialAuthService.link_google_account)(
+                    user_data
+                )
 
-            # Check if user exists by email
-            email = user_data.get("email")
-            if not email:
-                raise APIException(detail="No email provided by Google", code=400)
+            if account.extra_data != user_data:
+                account.extra_data = user_data
+                await account.asave(update_fields=["extra_data"])
+            return account.user
 
-            try:
-                # Try to get existing user
-                user = User.objects.get(email=email)
+        except Exception as e:
+            if isinstance(e, APIException):
+                raise
+            raise APIException(
+                detail=f"Google authentication failed: {str(e)}", code=400
+            ) from e
 
-                # Check if social account exists
-                social_account, created = SocialAccount.objects.get_or_create(
-                    user=user,
-                    provider="google",
-                    uid=user_data.get("id"),
-                    defaults={"extra_data": user_data},
-                )
+    @staticmethod
+    @transaction.atomic
+    def link_google_account(user_data: dict):
+        """
+        Attach a Google account to the user with its email, creating the user
+        if needed.
 
-            except User.DoesNotExist:
-                # Create new user
+        Both inserts rely on unique constraints (user email, provider + uid)
+        rather than a prior lookup, so concurrent first logins for the same
+        account converge on the same rows instead of failing.
+        """
+        try:
+            with transaction.atomic():
                 user = User.objects.create_user(
-                    email=email,
+                    email=user_data["email"],
                     first_name=user_data.get("given_name", ""),
                     last_name=user_data.get("family_name", ""),
                     is_active=True,
                 )
+        except IntegrityError:
+            # Existing (e.g. password) account, or a concurrent first login
+            user = User.objects.get(
+                email=User.objects.normalize_email(user_data["email"])
+            )
 
-                # Create social account
+        try:
+            with transaction.atomic():
                 SocialAccount.objects.create(
                     user=user,
                     provider="google",
-                    uid=user_data.get("id"),
+                    uid=user_data["id"],
                     extra_data=user_data,
                 )
+        except IntegrityError:
+            # A concurrent first login linked it first
+            account = SocialAccount.objects.select_related("user").get(
+                provider="google", uid=user_data["id"]
+            )
+            user = account.user
 
-            return user
-
-        except Exception as e:
-            if isinstance(e, APIException):
-                raise
-            raise APIException(
-                detail=f"Google authentication failed: {str(e)}", code=400
-            ) from e
+        return user
 
     @staticmethod
     def generate_jwt_tokens(user):
         """Generate JWT tokens for authenticated user"""
-        refresh = RefreshToken.for_user(user)
+        refresh = refresh_token_for_user(user)
         return {"access": str(refresh.access_token), "refresh": str(refresh)}
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import user_cache
+from .models import UserAccount
+
+
+@receiver([post_save, post_delete], sender=UserAccount)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """Drop the user from the CachedJWTAuth cache whenever it changes"""
+    user_cache.delete(instance.pk)
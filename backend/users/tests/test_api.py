@@ -1,9 +1,13 @@
 import pytest
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from ninja_extra.testing import TestClient
+from django.db.models import QuerySet
+from ninja_extra.testing import TestAsyncClient, TestClient
 
-from users.api import AuthController
+from users.api import AsyncAuthController, AuthController
+from users.authentication import token_cache, user_cache
+from users.services import SocialAuthService
 
 from .factories import UserAccountFactory
 
@@ -150,3 +154,116 @@ class TestAuthEndpoints:
         assert data["email"] == user.email
         assert data["first_name"] == user.first_name
         assert data["last_name"] == user.last_name
+
+
+@pytest.mark.django_db
+class TestClaimsBackedMe:
+    @pytest.fixture(autouse=True)
+    def enable_claims(self, settings):
+        settings.AUTH_USER_CLAIMS = True
+
+    def login(self, api_client, user):
+        return api_client.post(
+            "/login", json={"email": user.email, "password": "password"}
+        )
+
+    def test_me_makes_no_queries(self, api_client, django_assert_num_queries):
+        user = UserAccountFactory()
+        access_token = self.login(api_client, user).json()["access"]
+
+        with django_assert_num_queries(0):
+            response = api_client.get(
+                "/me", headers={"Authorization": f"Bearer {access_token}"}
+            )
+
+        assert response.status_code == 200
+        assert response.json() == {
+            "email": user.email,
+            "first_name": user.first_name,
+            "last_name": user.last_name,
+        }
+
+    def test_refresh_reloads_claims(self, api_client):
+        user = UserAccountFactory()
+        refresh_cookie = self.login(api_client, user).cookies[settings.REFRESH_COOKIE]
+
+        user.first_name = "Renamed"
+        user.save()
+
+        response = api_client.post(
+            "/refresh", COOKIES={settings.REFRESH_COOKIE: refresh_cookie.value}
+        )
+        access_token = response.json()["access"]
+
+        response = api_client.get(
+            "/me", headers={"Authorization": f"Bearer {access_token}"}
+        )
+        assert response.json()["first_name"] == "Renamed"
+
+    def test_refresh_rejects_inactive_user(self, api_client):
+        user = UserAccountFactory()
+        refresh_cookie = self.login(api_client, user).cookies[settings.REFRESH_COOKIE]
+
+        user.is_active = False
+        user.save()
+
+        response = api_client.post(
+            "/refresh", COOKIES={settings.REFRESH_COOKIE: refresh_cookie.value}
+        )
+        assert response.status_code == 401
+
+    def test_token_without_claims_falls_back_to_database(
+        self, api_client, settings, django_assert_num_queries
+    ):
+        user = UserAccountFactory()
+        settings.AUTH_USER_CLAIMS = False
+        access_token = self.login(api_client, user).json()["access"]
+        settings.AUTH_USER_CLAIMS = True
+
+        with django_assert_num_queries(1):
+            response = api_client.get(
+                "/me", headers={"Authorization": f"Bearer {access_token}"}
+            )
+
+        assert response.json()["email"] == user.email
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_async_me_without_claims_uses_the_auth_caches(settings, monkeypatch):
+    settings.AUTH_USER_CLAIMS = False
+    token_cache.clear()
+    user_cache.clear()
+    client = TestAsyncClient(AsyncAuthController)
+    user = await sync_to_async(UserAccountFactory)()
+    tokens = await sync_to_async(SocialAuthService.generate_jwt_tokens)(user)
+    headers = {"Authorization": f"Bearer {tokens['access']}"}
+    assert (await client.get("/me", headers=headers)).status_code == 200
+
+    async def no_queries(*args, **kwargs):
+        raise AssertionError("user was loaded from the database")
+
+    monkeypatch.setattr(QuerySet, "aget", no_queries)
+    response = await client.get("/me", headers=headers)
+
+    assert response.status_code == 200
+    assert response.json()["email"] == user.email
+
+
+@pytest.mark.django_db
+def test_register_duplicate_email_differing_in_case(api_client):
+    UserAccountFactory(email="exists@example.com")
+
+    response = api_client.post(
+        "/register",
+        json={
+            "email": "Exists@Example.com",
+            "password": "StrongPass123!",
+            "re_password": "StrongPass123!",
+            "first_name": "Test",
+            "last_name": "User",
+        },
+    )
+
+    assert response.status_code == 400
+    assert response.json() == "Email already registered"
@@ -0,0 +1,115 @@
+import pytest
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from ninja_extra.testing import TestAsyncClient
+
+from users.api import AsyncAuthController
+
+from .factories import UserAccountFactory
+
+User = get_user_model()
+
+
+@pytest.fixture
+def api_client():
+    return TestAsyncClient(AsyncAuthController)
+
+
+async def create_user(**kwargs):
+    return await sync_to_async(UserAccountFactory)(**kwargs)
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+class TestAsyncAuthEndpoints:
+    async def test_login_successful(self, api_client):
+        user = await create_user()
+
+        response = await api_client.post(
+            "/login", json={"email": user.email, "password": "password"}
+        )
+
+        assert response.status_code == 200
+        assert response.json()["access"]
+        assert response.cookies[settings.REFRESH_COOKIE]["httponly"]
+
+    async def test_login_invalid_credentials(self, api_client):
+        user = await create_user()
+
+        response = await api_client.post(
+            "/login", json={"email": user.email, "password": "wrongpass"}
+        )
+        assert response.status_code == 401
+
+        response = await api_client.post(
+            "/login", json={"email": "wrong@email.com", "password": "password"}
+        )
+        assert response.status_code == 401
+
+    async def test_login_inactive_user(self, api_client):
+        user = await create_user(is_active=False)
+
+        response = await api_client.post(
+            "/login", json={"email": user.email, "password": "password"}
+        )
+        assert response.status_code == 401
+
+    async def test_register_successful(self, api_client):
+        response = await api_client.post(
+            "/register",
+            json={
+                "email": "Test@Example.com",
+                "password": "StrongPass123!",
+                "re_password": "StrongPass123!",
+                "first_name": "Test",
+                "last_name": "User",
+            },
+        )
+
+        assert response.status_code == 200
+        user = await User.objects.aget(email="test@example.com")
+        assert user.check_password("StrongPass123!")
+
+    async def test_register_duplicate_email(self, api_client):
+        await create_user(email="exists@example.com")
+
+        response = await api_client.post(
+            "/register",
+            json={
+                "email": "exists@example.com",
+                "password": "StrongPass123!",
+                "re_password": "StrongPass123!",
+                "first_name": "Test",
+                "last_name": "User",
+            },
+        )
+        assert response.status_code == 400
+        assert response.json() == "Email already registered"
+
+    async def test_refresh_and_me(self, api_client):
+        user = await create_user()
+        login_response = await api_client.post(
+            "/login", json={"email": user.email, "password": "password"}
+        )
+        refresh_cookie = login_response.cookies[settings.REFRESH_COOKIE]
+
+        response = await api_client.post(
+            "/refresh", COOKIES={settings.REFRESH_COOKIE: refresh_cookie.value}
+        )
+        assert response.status_code == 200
+        access_token = response.json()["access"]
+
+        response = await api_client.get(
+            "/me", headers={"Authorization": f"Bearer {access_token}"}
+        )
+        assert response.status_code == 200
+        assert response.json()["email"] == user.email
+
+    async def test_refresh_token_without_cookie(self, api_client):
+        response = await api_client.post("/refresh")
+        assert response.status_code == 401
+
+    async def test_me_requires_authentication(self, api_client):
+        response = await api_client.get("/me")
+        assert response.status_code == 401
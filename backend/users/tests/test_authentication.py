@@ -0,0 +1,112 @@
+import time
+
+import pytest
+from ninja_extra.testing import TestClient
+
+from core.cache import TTLCache
+from core.metrics import MetricsController
+from users.api import AuthController
+from users.authentication import token_cache, user_cache
+from users.services import SocialAuthService
+
+from .factories import UserAccountFactory
+
+
+@pytest.fixture
+def api_client():
+    return TestClient(AuthController)
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    token_cache.clear()
+    user_cache.clear()
+
+
+def auth_header(user):
+    access_token = SocialAuthService.generate_jwt_tokens(user)["access"]
+    return {"Authorization": f"Bearer {access_token}"}
+
+
+@pytest.mark.django_db
+class TestCachedJWTAuth:
+    def test_repeat_requests_skip_the_database(
+        self, api_client, django_assert_num_queries
+    ):
+        user = UserAccountFactory()
+        headers = auth_header(user)
+        token_hits, user_hits = token_cache.hits, user_cache.hits
+
+        with django_assert_num_queries(1):
+            api_client.get("/me", headers=headers)
+        with django_assert_num_queries(0):
+            response = api_client.get("/me", headers=headers)
+
+        assert response.status_code == 200
+        assert response.json()["email"] == user.email
+        assert token_cache.hits == token_hits + 1
+        assert user_cache.hits == user_hits + 1
+
+    def test_deactivation_takes_effect_immediately(self, api_client):
+        user = UserAccountFactory()
+        headers = auth_header(user)
+        assert api_client.get("/me", headers=headers).status_code == 200
+
+        user.is_active = False
+        user.save()
+
+        assert api_client.get("/me", headers=headers).status_code == 401
+
+    def test_deleted_user_is_rejected(self, api_client):
+        user = UserAccountFactory()
+        headers = auth_header(user)
+        assert api_client.get("/me", headers=headers).status_code == 200
+
+        user.delete()
+
+        assert api_client.get("/me", headers=headers).status_code == 401
+
+    def test_invalid_token_is_not_cached(self, api_client):
+        response = api_client.get("/me", headers={"Authorization": "Bearer nope"})
+
+        assert response.status_code == 401
+        assert len(token_cache) == 0
+
+
+class TestTTLCache:
+    def test_evicts_least_recently_used(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.stats()["evictions"] == 1
+
+    def test_entries_expire(self):
+        cache = TTLCache(maxsize=10, ttl=60)
+        cache.set("a", 1, ttl=0.01)
+        time.sleep(0.02)
+
+        assert cache.get("a") is None
+        assert cache.stats()["misses"] == 1
+
+
+class TestMetricsEndpoint:
+    def test_requires_token(self, settings):
+        settings.METRICS_TOKEN = "scrape-me"
+        client = TestClient(MetricsController)
+
+        assert client.get("").status_code == 401
+        response = client.get("", headers={"Authorization": "Bearer scrape-me"})
+        assert response.status_code == 200
+        assert "hits" in response.json()["auth_user_cache"]
+
+    def test_closed_without_token_setting(self, settings):
+        settings.METRICS_TOKEN = None
+        client = TestClient(MetricsController)
+
+        response = client.get("", headers={"Authorization": "Bearer None"})
+        assert response.status_code == 401
@@ -0,0 +1,161 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from ninja_extra.testing import TestClient
+
+from users.api import AuthController
+from users.google import GoogleJWKSCache, google_jwks, verify_google_id_token
+
+CLIENT_ID = "test-client-id.apps.googleusercontent.com"
+
+
+def make_key(kid):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key(), as_dict=True)
+    jwk.update(kid=kid, alg="RS256", use="sig")
+    return private_key, jwk
+
+
+def make_id_token(private_key, kid, **claims):
+    now = int(time.time())
+    payload = {
+        "iss": "https://accounts.google.com",
+        "aud": CLIENT_ID,
+        "sub": "google-uid-1",
+        "email": "jane@example.com",
+        "email_verified": True,
+        "given_name": "Jane",
+        "family_name": "Doe",
+        "iat": now,
+        "exp": now + 3600,
+    }
+    payload.update(claims)
+    return jwt.encode(payload, private_key, algorithm="RS256", headers={"kid": kid})
+
+
+@pytest.fixture
+def jwks_server():
+    """Serve a local JWKS document in place of Google's certs endpoint"""
+    state = {"keys": [], "max_age": 3600, "requests": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            state["requests"] += 1
+            body = json.dumps({"keys": state["keys"]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Cache-Control", f"public, max-age={state['max_age']}")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    state["url"] = f"http://127.0.0.1:{server.server_port}/certs"
+    yield state
+    server.shutdown()
+
+
+@pytest.fixture
+def google_keys(jwks_server, settings, monkeypatch):
+    settings.GOOGLE_OAUTH2_CLIENT_ID = CLIENT_ID
+    private_key, jwk = make_key("kid-1")
+    jwks_server["keys"] = [jwk]
+    monkeypatch.setattr(google_jwks, "url", jwks_server["url"])
+    google_jwks.clear()
+    yield private_key
+    google_jwks.clear()
+
+
+class TestGoogleJWKSCache:
+    def test_keys_are_fetched_once_and_cached(self, jwks_server):
+        _, jwk = make_key("kid-1")
+        jwks_server["keys"] = [jwk]
+        cache = GoogleJWKSCache(jwks_server["url"])
+
+        cache.get_signing_key("kid-1")
+        cache.get_signing_key("kid-1")
+
+        assert jwks_server["requests"] == 1
+
+    def test_unknown_kid_refetches_once(self, jwks_server):
+        _, jwk = make_key("kid-1")
+        jwks_server["keys"] = [jwk]
+        cache = GoogleJWKSCache(jwks_server["url"], min_refetch_interval=0)
+        cache.get_signing_key("kid-1")
+
+        _, rotated = make_key("kid-2")
+        jwks_server["keys"] = [jwk, rotated]
+
+        assert cache.get_signing_key("kid-2").key_id == "kid-2"
+        assert jwks_server["requests"] == 2
+
+    def test_unknown_kid_refetch_is_rate_limited(self, jwks_server):
+        _, jwk = make_key("kid-1")
+        jwks_server["keys"] = [jwk]
+        cache = GoogleJWKSCache(jwks_server["url"], min_refetch_interval=60)
+        cache.get_signing_key("kid-1")
+
+        for _ in range(3):
+            with pytest.raises(jwt.InvalidTokenError):
+                cache.get_signing_key("bogus")
+
+        assert jwks_server["requests"] == 1
+
+    def test_expiring_keys_refresh_in_background(self, jwks_server):
+        _, jwk = make_key("kid-1")
+        jwks_server["keys"] = [jwk]
+        jwks_server["max_age"] = 10
+        cache = GoogleJWKSCache(jwks_server["url"], refresh_margin=60)
+        cache.get_signing_key("kid-1")
+
+        # Stale keys are still served while the refresh runs
+        assert cache.get_signing_key("kid-1").key_id == "kid-1"
+
+        deadline = time.monotonic() + 5
+        while jwks_server["requests"] < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert jwks_server["requests"] >= 2
+
+
+class TestVerifyGoogleIdToken:
+    def test_valid_token(self, google_keys):
+        claims = verify_google_id_token(make_id_token(google_keys, "kid-1"))
+        assert claims["email"] == "jane@example.com"
+
+    @pytest.mark.parametrize(
+        "claims",
+        [
+            {"aud": "someone-else"},
+            {"iss": "https://evil.example.com"},
+            {"exp": int(time.time()) - 60},
+        ],
+    )
+    def test_rejects_invalid_claims(self, google_keys, claims):
+        with pytest.raises(jwt.InvalidTokenError):
+            verify_google_id_token(make_id_token(google_keys, "kid-1", **claims))
+
+    def test_rejects_foreign_signature(self, google_keys):
+        forged_key, _ = make_key("kid-1")
+        with pytest.raises(jwt.InvalidTokenError):
+            verify_google_id_token(make_id_token(forged_key, "kid-1"))
+
+
+@pytest.mark.django_db
+def test_social_auth_with_local_verification(google_keys):
+    client = TestClient(AuthController)
+    response = client.post(
+        "/social",
+        json={"credential": make_id_token(google_keys, "kid-1"), "provider": "google"},
+    )
+
+    assert response.status_code == 200
+    assert response.json()["access"]
@@ -0,0 +1,80 @@
+import threading
+
+import pytest
+from asgiref.sync import sync_to_async
+from django.contrib.auth import hashers
+from ninja_extra.testing import TestAsyncClient, TestClient
+
+from users.api import AsyncAuthController, AuthController
+from users.hashers import hash_password, verify_password
+
+from .factories import UserAccountFactory
+
+
+def iterations(user):
+    user.refresh_from_db()
+    return int(user.password.split("$")[1])
+
+
+def test_hashing_runs_on_executor(monkeypatch):
+    threads = []
+    original = hashers.verify_password
+
+    def recording_verify(password, encoded):
+        threads.append(threading.current_thread().name)
+        return original(password, encoded)
+
+    monkeypatch.setattr(hashers, "verify_password", recording_verify)
+
+    assert verify_password("secret", hash_password("secret")) == (True, False)
+    assert threads[0].startswith("password-hashing")
+
+
+def test_iterations_are_tunable(settings):
+    settings.PBKDF2_ITERATIONS = 1000
+    encoded = hash_password("secret")
+
+    assert encoded.startswith("pbkdf2_sha256$1000$")
+    settings.PBKDF2_ITERATIONS = 2000
+    assert verify_password("secret", encoded) == (True, True)
+
+
+@pytest.mark.django_db
+class TestHashUpgrade:
+    def test_login_upgrades_hash(self, settings):
+        settings.PBKDF2_ITERATIONS = 1000
+        user = UserAccountFactory()
+        settings.PBKDF2_ITERATIONS = 2000
+
+        response = TestClient(AuthController).post(
+            "/login", json={"email": user.email, "password": "password"}
+        )
+
+        assert response.status_code == 200
+        assert iterations(user) == 2000
+
+    def test_failed_login_keeps_hash(self, settings):
+        settings.PBKDF2_ITERATIONS = 1000
+        user = UserAccountFactory()
+        settings.PBKDF2_ITERATIONS = 2000
+
+        response = TestClient(AuthController).post(
+            "/login", json={"email": user.email, "password": "wrong"}
+        )
+
+        assert response.status_code == 401
+        assert iterations(user) == 1000
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_async_login_upgrades_hash(self, settings):
+        settings.PBKDF2_ITERATIONS = 1000
+        user = await sync_to_async(UserAccountFactory)()
+        settings.PBKDF2_ITERATIONS = 2000
+
+        response = await TestAsyncClient(AsyncAuthController).post(
+            "/login", json={"email": user.email, "password": "password"}
+        )
+
+        assert response.status_code == 200
+        assert await sync_to_async(iterations)(user) == 2000
@@ -0,0 +1,98 @@
+import json
+from io import StringIO
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+
+from .factories import UserAccountFactory
+
+User = get_user_model()
+
+CSV = """email,first_name,last_name,password,password_hash
+Alice@Example.com,Alice,Smith,alicepass,
+bob@example.com,Bob,Jones,,{bob_hash}
+carol@example.com,Carol,White,carolpass,
+"""
+
+
+def import_users(path, *args):
+    out = StringIO()
+    call_command("import_users", str(path), "--workers", "0", *args, stdout=out)
+    return out.getvalue()
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    path = tmp_path / "users.csv"
+    path.write_text(CSV.format(bob_hash=make_password("bobpass")))
+    return path
+
+
+@pytest.mark.django_db
+class TestImportUsers:
+    def test_imports_csv(self, csv_file):
+        output = import_users(csv_file, "--batch-size", "2")
+
+        assert "Imported 3 users, skipped 0" in output
+        alice = User.objects.get(email="alice@example.com")
+        assert alice.first_name == "Alice"
+        assert alice.check_password("alicepass")
+        assert User.objects.get(email="bob@example.com").check_password("bobpass")
+
+    def test_imports_ndjson(self, tmp_path):
+        path = tmp_path / "users.ndjson"
+        path.write_text(
+            "\n".join(
+                json.dumps({"email": f"user{i}@example.com", "password": "pw"})
+                for i in range(3)
+            )
+        )
+
+        import_users(path)
+
+        assert User.objects.filter(email__startswith="user").count() == 3
+
+    def test_existing_users_are_skipped(self, csv_file):
+        existing = UserAccountFactory(email="carol@example.com")
+
+        output = import_users(csv_file)
+
+        assert "Imported 2 users, skipped 1" in output
+        existing.refresh_from_db()
+        assert existing.check_password("password")
+
+    def test_users_created_concurrently_are_not_counted(self, csv_file, monkeypatch):
+        bulk_create = User.objects.bulk_create
+
+        def sign_up_first(users, **kwargs):
+            # Carol signs up between the existence check and the insert
+            UserAccountFactory(email="carol@example.com")
+            return bulk_create(users, **kwargs)
+
+        monkeypatch.setattr(User.objects, "bulk_create", sign_up_first)
+
+        output = import_users(csv_file)
+
+        assert "Imported 2 users, skipped 1" in output
+        assert User.objects.get(email="carol@example.com").check_password("password")
+
+    def test_resume_from_checkpoint(self, csv_file, tmp_path):
+        checkpoint = tmp_path / "checkpoint"
+        checkpoint.write_text("2")
+
+        output = import_users(csv_file, "--checkpoint", str(checkpoint), "--resume")
+
+        assert "Imported 1 users" in output
+        assert list(User.objects.values_list("email", flat=True)) == [
+            "carol@example.com"
+        ]
+        assert checkpoint.read_text() == "3"
+
+
+@pytest.mark.django_db
+def test_import_with_process_pool(csv_file):
+    call_command("import_users", str(csv_file), "--workers", "2", stdout=StringIO())
+
+    assert User.objects.get(email="carol@example.com").check_password("carolpass")
@@ -0,0 +1,90 @@
+import jwt
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from ninja_extra.testing import TestClient
+from ninja_jwt import state
+from ninja_jwt.tokens import AccessToken
+
+from users.api import AuthController
+from users.keys import KeyRingTokenBackend
+from users.services import SocialAuthService
+
+from .factories import UserAccountFactory
+
+
+@pytest.fixture
+def keys_dir(tmp_path):
+    call_command("generate_jwt_key", dir=tmp_path, kid="2026-01", algorithm="ES256")
+    call_command("generate_jwt_key", dir=tmp_path, kid="2026-02", algorithm="EdDSA")
+    return tmp_path
+
+
+def use_key_ring(monkeypatch, keys_dir, active_kid=None):
+    backend = KeyRingTokenBackend.from_directory(keys_dir, active_kid)
+    monkeypatch.setattr(state, "token_backend", backend)
+    return backend
+
+
+@pytest.mark.django_db
+class TestKeyRing:
+    def test_tokens_are_signed_by_the_active_key(self, keys_dir, monkeypatch):
+        use_key_ring(monkeypatch, keys_dir, active_kid="2026-02")
+        user = UserAccountFactory()
+
+        access = SocialAuthService.generate_jwt_tokens(user)["access"]
+
+        assert jwt.get_unverified_header(access) == {
+            "alg": "EdDSA",
+            "kid": "2026-02",
+            "typ": "JWT",
+        }
+        response = TestClient(AuthController).get(
+            "/me", headers={"Authorization": f"Bearer {access}"}
+        )
+        assert response.status_code == 200
+
+    def test_tokens_from_previous_key_still_verify(self, keys_dir, monkeypatch):
+        use_key_ring(monkeypatch, keys_dir, active_kid="2026-01")
+        access = SocialAuthService.generate_jwt_tokens(UserAccountFactory())["access"]
+
+        use_key_ring(monkeypatch, keys_dir, active_kid="2026-02")
+
+        assert AccessToken(access)["token_type"] == "access"
+
+    def test_tokens_from_removed_key_are_rejected(self, keys_dir, monkeypatch):
+        use_key_ring(monkeypatch, keys_dir, active_kid="2026-01")
+        access = SocialAuthService.generate_jwt_tokens(UserAccountFactory())["access"]
+
+        (keys_dir / "2026-01.pem").unlink()
+        use_key_ring(monkeypatch, keys_dir)  # the only key left is active
+
+        response = TestClient(AuthController).get(
+            "/me", headers={"Authorization": f"Bearer {access}"}
+        )
+        assert response.status_code == 401
+
+    def test_new_key_is_not_activated_implicitly(self, keys_dir):
+        with pytest.raises(ImproperlyConfigured, match="JWT_SIGNING_KID"):
+            KeyRingTokenBackend.from_directory(keys_dir)
+
+    def test_jwks_allows_offline_verification(self, keys_dir, monkeypatch):
+        use_key_ring(monkeypatch, keys_dir, active_kid="2026-02")
+        access = SocialAuthService.generate_jwt_tokens(UserAccountFactory())["access"]
+
+        response = TestClient(AuthController).get("/jwks.json")
+
+        assert response.status_code == 200
+        assert response["Cache-Control"] == "public, max-age=300"
+        key_set = jwt.PyJWKSet.from_dict(response.json())
+        assert [key.key_id for key in key_set.keys] == ["2026-01", "2026-02"]
+
+        signing_key = key_set[jwt.get_unverified_header(access)["kid"]]
+        claims = jwt.decode(access, signing_key.key, algorithms=["ES256", "EdDSA"])
+        assert claims["token_type"] == "access"
+
+
+def test_jwks_is_empty_with_hmac_signing():
+    response = TestClient(AuthController).get("/jwks.json")
+
+    assert response.json() == {"keys": []}
@@ -0,0 +1,143 @@
+import pytest
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from ninja_extra.testing import TestAsyncClient, TestClient
+from ninja_jwt.tokens import RefreshToken
+
+from core.api import api
+from users.api import AsyncAuthController, AuthController
+from users.models import RevokedToken
+from users.revocation import BloomFilter, RevocationList, revocation_list
+
+from .factories import UserAccountFactory
+
+
+@pytest.fixture(autouse=True)
+def reset_revocation_list():
+    revocation_list.reset()
+
+
+@pytest.fixture
+def api_client():
+    return TestClient(AuthController)
+
+
+def login(api_client, user):
+    response = api_client.post(
+        "/login", json={"email": user.email, "password": "password"}
+    )
+    return response.cookies[settings.REFRESH_COOKIE].value
+
+
+def refresh(api_client, cookie):
+    return api_client.post("/refresh", COOKIES={settings.REFRESH_COOKIE: cookie})
+
+
+@pytest.mark.django_db
+class TestRefreshRotation:
+    def test_refresh_rotates_token(self, api_client):
+        cookie = login(api_client, UserAccountFactory())
+
+        response = refresh(api_client, cookie)
+
+        assert response.status_code == 200
+        new_cookie = response.cookies[settings.REFRESH_COOKIE].value
+        assert RefreshToken(new_cookie)["jti"] != RefreshToken(cookie)["jti"]
+        assert refresh(api_client, new_cookie).status_code == 200
+
+    def test_rotated_token_cannot_be_reused(self, api_client):
+        cookie = login(api_client, UserAccountFactory())
+        assert refresh(api_client, cookie).status_code == 200
+
+        response = refresh(api_client, cookie)
+
+        assert response.status_code == 401
+        assert response.json()["detail"] == "Token is revoked"
+
+    def test_reuse_is_rejected_before_filter_sync(self, api_client, monkeypatch):
+        cookie = login(api_client, UserAccountFactory())
+        assert refresh(api_client, cookie).status_code == 200
+        # Simulate a process whose filter has not seen the revocation yet
+        revocation_list.reset()
+        monkeypatch.setattr(revocation_list, "_sync_due", lambda: False)
+
+        assert refresh(api_client, cookie).status_code == 401
+
+    def test_logout_revokes_refresh_token(self, api_client):
+        cookie = login(api_client, UserAccountFactory())
+
+        response = api_client.post("/logout", COOKIES={settings.REFRESH_COOKIE: cookie})
+
+        assert response.status_code == 204
+        assert RevokedToken.objects.filter(jti=RefreshToken(cookie)["jti"]).exists()
+        assert refresh(api_client, cookie).status_code == 401
+
+    def test_logout_ignores_invalid_token(self, api_client):
+        response = api_client.post("/logout", COOKIES={settings.REFRESH_COOKIE: "nope"})
+
+        assert response.status_code == 204
+
+    def test_check_is_query_free_for_unrevoked_tokens(self, django_assert_num_queries):
+        revocation_list.sync()
+
+        with django_assert_num_queries(0):
+            assert not revocation_list.is_revoked("never-revoked")
+
+    def test_sync_loads_revocations_from_other_processes(self):
+        token = RefreshToken()
+        other_process = RevocationList(sync_interval=0, capacity=100, error_rate=0.01)
+        other_process.revoke(token)
+
+        revocation_list.sync()
+
+        assert revocation_list.is_revoked(token["jti"])
+
+    def test_revoked_token_is_rejected_on_every_refresh_path(self, client):
+        cookie = str(RefreshToken.for_user(UserAccountFactory()))
+        revocation_list.revoke(RefreshToken(cookie))
+        paths = [
+            path for path in api.get_openapi_schema()["paths"] if "refresh" in path
+        ]
+
+        client.cookies[settings.REFRESH_COOKIE] = cookie
+        responses = {
+            path: client.post(
+                path, {"refresh": cookie}, content_type="application/json"
+            ).status_code
+            for path in paths
+        }
+
+        assert responses == {"/api/auth/refresh": 401}
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_async_refresh_rotates_token(self):
+        client = TestAsyncClient(AsyncAuthController)
+        user = await sync_to_async(UserAccountFactory)()
+        cookie = str(RefreshToken.for_user(user))
+
+        first = await client.post("/refresh", COOKIES={settings.REFRESH_COOKIE: cookie})
+        second = await client.post(
+            "/refresh", COOKIES={settings.REFRESH_COOKIE: cookie}
+        )
+
+        assert first.status_code == 200
+        assert second.status_code == 401
+
+
+class TestBloomFilter:
+    def test_contains_added_items(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        items = [f"jti-{i}" for i in range(1000)]
+        for item in items:
+            bloom.add(item)
+
+        assert all(item in bloom for item in items)
+
+    def test_false_positive_rate_is_bounded(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        for i in range(1000):
+            bloom.add(f"jti-{i}")
+
+        false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+        assert false_positives < 200
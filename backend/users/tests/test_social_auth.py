@@ -0,0 +1,87 @@
+import pytest
+from allauth.socialaccount.models import SocialAccount
+from django.contrib.auth import get_user_model
+
+from users.services import SocialAuthService
+
+from .factories import UserAccountFactory
+
+User = get_user_model()
+
+GOOGLE_USER = {
+    "id": "google-uid-1",
+    "email": "Jane@Example.com",
+    "given_name": "Jane",
+    "family_name": "Doe",
+    "picture": "",
+    "email_verified": True,
+}
+
+
+@pytest.fixture
+def google_user(monkeypatch):
+    user_data = dict(GOOGLE_USER)
+    monkeypatch.setattr(
+        SocialAuthService, "get_google_user_data", lambda credential: dict(user_data)
+    )
+    return user_data
+
+
+@pytest.mark.django_db
+class TestGoogleLogin:
+    def test_first_login_creates_user_and_account(self, google_user):
+        user = SocialAuthService.authenticate_with_google("credential")
+
+        assert user.email == "jane@example.com"
+        assert user.first_name == "Jane"
+        account = SocialAccount.objects.get(provider="google", uid="google-uid-1")
+        assert account.user == user
+        assert account.extra_data == google_user
+
+    def test_first_login_links_existing_user(self, google_user):
+        existing = UserAccountFactory(email="jane@example.com")
+
+        user = SocialAuthService.authenticate_with_google("credential")
+
+        assert user == existing
+        assert SocialAccount.objects.get(uid="google-uid-1").user == existing
+
+    def test_returning_login_is_a_single_query(
+        self, google_user, django_assert_num_queries
+    ):
+        first = SocialAuthService.authenticate_with_google("credential")
+
+        with django_assert_num_queries(1):
+            user = SocialAuthService.authenticate_with_google("credential")
+
+        assert user == first
+
+    def test_changed_profile_updates_extra_data(
+        self, google_user, django_assert_num_queries
+    ):
+        SocialAuthService.authenticate_with_google("credential")
+        google_user["picture"] = "https://example.com/jane.png"
+
+        with django_assert_num_queries(2):
+            SocialAuthService.authenticate_with_google("credential")
+
+        account = SocialAccount.objects.get(uid="google-uid-1")
+        assert account.extra_data["picture"] == "https://example.com/jane.png"
+
+    def test_concurrent_first_login_converges(self, google_user):
+        # The second caller finds both rows already inserted by the first
+        first = SocialAuthService.link_google_account(google_user)
+        second = SocialAuthService.link_google_account(google_user)
+
+        assert first == second
+        assert User.objects.count() == 1
+        assert SocialAccount.objects.count() == 1
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_async_first_and_returning_login(self, google_user):
+        first = await SocialAuthService.aauthenticate_with_google("credential")
+        second = await SocialAuthService.aauthenticate_with_google("credential")
+
+        assert first == second
+        assert await SocialAccount.objects.acount() == 1
@@ -0,0 +1,154 @@
+import pytest
+from asgiref.sync import sync_to_async
+from django.contrib.auth import hashers
+from ninja_extra.testing import TestAsyncClient, TestClient
+
+from users import throttling
+from users.api import AsyncAuthController, AuthController
+from users.throttling import BucketStore, parse_rate
+
+from .factories import UserAccountFactory
+
+
+@pytest.fixture
+def api_client():
+    return TestClient(AuthController)
+
+
+@pytest.fixture
+def low_limits(settings):
+    settings.AUTH_THROTTLE_IP_RATE = "5/min"
+    settings.AUTH_THROTTLE_EMAIL_RATE = "2/min"
+
+
+def login(api_client, email, ip="10.0.0.1"):
+    return api_client.post(
+        "/login",
+        json={"email": email, "password": "wrong"},
+        META={"REMOTE_ADDR": ip},
+    )
+
+
+@pytest.mark.django_db
+class TestLoginThrottle:
+    def test_email_bucket_limits_attempts_across_ips(self, api_client, low_limits):
+        responses = [
+            login(api_client, "victim@example.com", ip=f"10.0.0.{i}") for i in range(3)
+        ]
+
+        assert [r.status_code for r in responses] == [401, 401, 429]
+        assert 0 < int(responses[-1]["Retry-After"]) <= 30
+
+    def test_email_is_normalised(self, api_client, low_limits):
+        login(api_client, "victim@example.com")
+        login(api_client, " Victim@Example.com")
+
+        assert login(api_client, "VICTIM@example.com").status_code == 429
+
+    def test_ip_bucket_limits_attempts_across_emails(self, api_client, low_limits):
+        responses = [login(api_client, f"user{i}@example.com") for i in range(6)]
+
+        assert responses[4].status_code == 401
+        assert responses[5].status_code == 429
+        assert login(api_client, "other@example.com", ip="10.0.0.2").status_code == 401
+
+    def test_forwarded_for_header_does_not_reset_the_ip_bucket(
+        self, api_client, low_limits
+    ):
+        responses = [
+            api_client.post(
+                "/login",
+                json={"email": f"user{i}@example.com", "password": "wrong"},
+                META={"REMOTE_ADDR": "10.0.0.1", "HTTP_X_FORWARDED_FOR": f"1.2.3.{i}"},
+            )
+            for i in range(6)
+        ]
+
+        assert responses[5].status_code == 429
+
+    @pytest.mark.parametrize(
+        "path, statuses",
+        [
+            ("/api/auth/login", [401] * 2 + [429] * 6),
+            # ninja_jwt's unthrottled password route is not mounted
+            ("/api/token/pair", [404] * 8),
+        ],
+    )
+    def test_password_routes_are_throttled(self, client, low_limits, path, statuses):
+        UserAccountFactory(email="victim@example.com")
+        payload = {"email": "victim@example.com", "password": "wrong"}
+
+        responses = [
+            client.post(path, payload, content_type="application/json")
+            for _ in range(8)
+        ]
+
+        assert [r.status_code for r in responses] == statuses
+        if responses[-1].status_code == 429:
+            assert int(responses[-1]["Retry-After"]) > 0
+
+    def test_rejects_before_hashing(self, api_client, low_limits, monkeypatch):
+        UserAccountFactory(email="victim@example.com")
+        for _ in range(2):
+            login(api_client, "victim@example.com")
+
+        def fail(*args, **kwargs):
+            raise AssertionError("password was hashed")
+
+        monkeypatch.setattr(hashers, "verify_password", fail)
+        monkeypatch.setattr(hashers, "make_password", fail)
+
+        assert login(api_client, "victim@example.com").status_code == 429
+
+    def test_register_is_throttled(self, api_client, low_limits):
+        payload = {
+            "email": "new@example.com",
+            "password": "StrongPass123!",
+            "re_password": "StrongPass123!",
+            "first_name": "New",
+            "last_name": "User",
+        }
+        statuses = [
+            api_client.post("/register", json=payload).status_code for _ in range(3)
+        ]
+
+        assert statuses == [200, 400, 429]
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_async_login_is_throttled(self, low_limits):
+        client = TestAsyncClient(AsyncAuthController)
+        user = await sync_to_async(UserAccountFactory)()
+        payload = {"email": user.email, "password": "wrong"}
+
+        statuses = [
+            (await client.post("/login", json=payload)).status_code for _ in range(3)
+        ]
+
+        assert statuses == [401, 401, 429]
+
+
+class TestBucketStore:
+    def test_refills_over_time(self):
+        store = BucketStore()
+        capacity, refill = parse_rate("2/s")
+
+        assert store.take("k", capacity, refill, now=100.0) == 0
+        assert store.take("k", capacity, refill, now=100.0) == 0
+        assert store.take("k", capacity, refill, now=100.0) == pytest.approx(0.5)
+        assert store.take("k", capacity, refill, now=100.5) == 0
+
+    def test_falls_back_when_cache_is_down(self, monkeypatch):
+        class DownCache:
+            def get(self, key):
+                raise ConnectionError
+
+            def set(self, key, value, timeout):
+                raise ConnectionError
+
+        monkeypatch.setattr(throttling, "caches", {"default": DownCache()})
+        store = BucketStore()
+
+        assert store.take("k", 1, 1, now=100.0) == 0
+        assert store.take("k", 1, 1, now=100.0) == pytest.approx(1)
+        assert store.stats()["fallbacks"] == 4
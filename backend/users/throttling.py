@@ -0,0 +1,145 @@
+import hashlib
+import json
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from ninja.throttling import BaseThrottle
+
+from core import metrics
+from core.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# ninja calls wait() right after a rejecting allow_request() on the same thread
+_last_wait = threading.local()
+
+_DURATIONS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_rate(rate: str) -> tuple[int, float]:
+    """Parse ``"10/min"`` into ``(capacity, tokens refilled per second)``"""
+    num, period = rate.split("/")
+    capacity = int(num)
+    return capacity, capacity / _DURATIONS[period[0]]
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Token buckets keyed by client IP and by the ``email`` in the JSON body.
+
+    A request takes one token from each of its buckets and is rejected while
+    any of them is empty, so credential stuffing is limited both per source
+    and per targeted account. Throttles run before the request body is
+    validated, i.e. before any password is hashed.
+
+    Buckets live in the AUTH_THROTTLE_CACHE cache so all workers share them.
+    Reads and writes are not atomic across workers, so concurrent requests
+    can overdraw a bucket by a few tokens. If the cache is unreachable the
+    buckets fall back to a per-process store rather than failing open.
+    """
+
+    def __init__(
+        self,
+        scope: str,
+        ip_rate: str | None = None,
+        email_rate: str | None = None,
+    ):
+        self.scope = scope
+        self.ip_rate = ip_rate
+        self.email_rate = email_rate
+
+    def allow_request(self, request) -> bool:
+        wait = 0.0
+        now = time.time()
+        for key, rate in self.get_buckets(request):
+            wait = max(wait, _buckets.take(key, *parse_rate(rate), now))
+
+        _last_wait.value = wait
+        if wait:
+            _buckets.rejected += 1
+            return False
+        _buckets.allowed += 1
+        return True
+
+    def wait(self) -> float | None:
+        return getattr(_last_wait, "value", None)
+
+    def get_buckets(self, request) -> list[tuple[str, str]]:
+        ip_rate = self.ip_rate or settings.AUTH_THROTTLE_IP_RATE
+        buckets = [(f"ip:{self.get_ident(request)}", ip_rate)]
+        email = _email_from_body(request)
+        if email:
+            digest = hashlib.sha256(email.encode()).hexdigest()
+            email_rate = self.email_rate or settings.AUTH_THROTTLE_EMAIL_RATE
+            buckets.append((f"email:{digest}", email_rate))
+        return [(f"throttle:{self.scope}:{key}", rate) for key, rate in buckets]
+
+
+class BucketStore:
+    """Token bucket state in a Django cache, with a per-process fallback"""
+
+    def __init__(self, fallback_maxsize: int = 100_000):
+        self.allowed = 0
+        self.rejected = 0
+        self.fallbacks = 0
+        self._fallback = TTLCache(maxsize=fallback_maxsize, ttl=86400)
+
+    def take(self, key: str, capacity: int, refill: float, now: float) -> float:
+        """Take a token; returns 0 on success or the seconds until one is free"""
+        tokens, updated = self._get(key) or (capacity, now)
+        tokens = min(capacity, tokens + (now - updated) * refill)
+
+        if tokens < 1:
+            wait = (1 - tokens) / refill
+        else:
+            tokens -= 1
+            wait = 0.0
+
+        # Keep the bucket until it would be full again
+        self._set(key, (tokens, now), math.ceil((capacity - tokens) / refill) + 1)
+        return wait
+
+    def _get(self, key: str):
+        try:
+            return caches[settings.AUTH_THROTTLE_CACHE].get(key)
+        except Exception:
+            self._fall_back()
+            return self._fallback.get(key)
+
+    def _set(self, key: str, state: tuple[float, float], ttl: int) -> None:
+        try:
+            caches[settings.AUTH_THROTTLE_CACHE].set(key, state, ttl)
+        except Exception:
+            self._fall_back()
+            self._fallback.set(key, state, ttl)
+
+    def _fall_back(self) -> None:
+        if not self.fallbacks:
+            logger.warning("Throttle cache unavailable, using per-process buckets")
+        self.fallbacks += 1
+
+    def stats(self) -> dict:
+        return {
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "fallbacks": self.fallbacks,
+            "fallback_size": len(self._fallback),
+        }
+
+
+def _email_from_body(request) -> str | None:
+    try:
+        email = json.loads(request.body).get("email")
+    except (ValueError, TypeError, AttributeError):
+        return None
+    if not isinstance(email, str):
+        return None
+    return email.strip().lower() or None
+
+
+_buckets = BucketStore()
+metrics.register("auth_throttle", _buckets.stats)
@@ -0,0 +1,100 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from ninja_jwt.exceptions import TokenError
+from ninja_jwt.settings import api_settings
+from ninja_jwt.tokens import AccessToken, RefreshToken
+
+from .revocation import revocation_list
+
+User = get_user_model()
+
+# Profile fields embedded in tokens when AUTH_USER_CLAIMS is enabled
+USER_CLAIMS = ("email", "first_name", "last_name")
+
+
+def has_user_claims(token) -> bool:
+    return all(claim in token for claim in USER_CLAIMS)
+
+
+def refresh_token_for_user(user) -> RefreshToken:
+    """
+    Issue a refresh token for ``user``.
+
+    With AUTH_USER_CLAIMS enabled the profile claims are added to the refresh
+    token and therefore copied into the access token derived from it.
+    """
+    refresh = RefreshToken.for_user(user)
+    if settings.AUTH_USER_CLAIMS:
+        for claim in USER_CLAIMS:
+            refresh[claim] = getattr(user, claim)
+    return refresh
+
+
+def rotate_refresh_token(refresh: RefreshToken) -> RefreshToken:
+    """
+    Revoke ``refresh`` and return a replacement with a new jti and lifetime.
+
+    Raises TokenError if ``refresh`` was already revoked, i.e. it was logged
+    out or has been rotated before.
+    """
+    if revocation_list.is_revoked(refresh["jti"]):
+        raise TokenError("Token is revoked")
+    revocation_list.revoke(refresh)
+    return _renew(refresh)
+
+
+async def arotate_refresh_token(refresh: RefreshToken) -> RefreshToken:
+    """Async variant of ``rotate_refresh_token``"""
+    if await revocation_list.ais_revoked(refresh["jti"]):
+        raise TokenError("Token is revoked")
+    await revocation_list.arevoke(refresh)
+    return _renew(refresh)
+
+
+def _renew(refresh: RefreshToken) -> RefreshToken:
+    refresh.set_jti()
+    refresh.set_exp()
+    refresh.set_iat()
+    return refresh
+
+
+def access_token_for_refresh(refresh: RefreshToken) -> AccessToken:
+    """
+    Derive a new access token from ``refresh``.
+
+    Profile claims are re-read from the database rather than copied from the
+    refresh token, so they are never older than ACCESS_TOKEN_LIFETIME.
+    """
+    access = refresh.access_token
+    if settings.AUTH_USER_CLAIMS:
+        access.payload.update(_load_claims(refresh))
+    return access
+
+
+async def aaccess_token_for_refresh(refresh: RefreshToken) -> AccessToken:
+    """Async variant of ``access_token_for_refresh``"""
+    access = refresh.access_token
+    if settings.AUTH_USER_CLAIMS:
+        access.payload.update(await _aload_claims(refresh))
+    return access
+
+
+def _claims_queryset(refresh: RefreshToken):
+    return User.objects.filter(
+        is_active=True,
+        **{api_settings.USER_ID_FIELD: refresh[api_settings.USER_ID_CLAIM]},
+    ).values(*USER_CLAIMS)
+
+
+def _load_claims(refresh: RefreshToken) -> dict:
+    claims = _claims_queryset(refresh).first()
+    if claims is None:
+        raise TokenError("User not found or inactive")
+    return claims
+
+
+async def _aload_claims(refresh: RefreshToken) -> dict:
+    claims = await _claims_queryset(refresh).afirst()
+    if claims is None:
+        raise TokenError("User not found or inactive")
+    return claims